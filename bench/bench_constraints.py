@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Micro benchmark for the any-order constraint table (constraints.py) on synthetically grown definitions.
+Run from the repo root:
+    python3 bench/bench_constraints.py
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import definition
+from bench_selection import grow
+from constraints import ConstraintTable
+
+# typical certification queries, starting from the channel or the country
+QUERIES = [
+    {'channel': '36'},
+    {'country': 'ALL', 'channel': '42'},
+    {'country': 'ALL', 'bw': '40MHz', 'core': 'MIMO'},
+    {'band': '5GHz', 'rate': 'MCS9', 'channel': '155'},
+]
+
+
+def main():
+    with open('system-definition.json') as json_file:
+        raw = json.load(json_file)
+
+    print(f"{'factor':>6} {'combinations':>13} {'rows':>8} {'build s':>8} {'remaining us':>13} {'count us':>9}")
+    for factor in (1, 5, 20, 50):
+        compiled = definition.from_dict(grow(raw, factor))
+        start = time.perf_counter()
+        table = ConstraintTable(compiled)
+        build = time.perf_counter() - start
+
+        repeat = 200
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for query in QUERIES:
+                table.remaining(**query)
+        remaining = (time.perf_counter() - start) / (repeat * len(QUERIES)) * 1e6
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for query in QUERIES:
+                table.count(**query)
+        count = (time.perf_counter() - start) / (repeat * len(QUERIES)) * 1e6
+        print(f"{factor:>6} {table.count():>13} {table.rows:>8} {build:>8.3f} {remaining:>13.1f} {count:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Micro benchmark: the old nested try/except validate cascade in TxMenu against the selection engine that the
+Tx tab runs (selection.AnySelection on a constraints.ConstraintTable).
+
+Both get the same walk in the fixed order of the cascade (down the combo boxes and back up), the engine also
+gets a walk in any order. The definition is grown synthetically (more rates and countries per level) to show
+how the cost per combo change scales with the size of the definition.
+
+What it shows: the engine is not faster. The cascade only follows one path down the tree, the engine looks up
+the options of all seven fields on every change, which is what lets the fields be chosen in any order. Its
+cost grows with the number of table rows that match two or more chosen values, so with the definition: about
+0.2 ms per change with the shipped definition, a few ms at 50 times its size. Run from the repo root:
+    python3 bench/bench_selection.py
+"""
+
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import definition
+from constraints import ConstraintTable
+from definition import LEVELS
+from selection import AnySelection
+
+
+def grow(tree, factor, depth=0):
+    """ Copy of tree with factor times more rates (depth 2) and countries (depth 5) """
+    if isinstance(tree, list):
+        return list(tree)
+    out = {}
+    for name, value in tree.items():
+        copies = range(factor) if depth in (2, 5) else range(1)
+        for k in copies:
+            out[name if k == 0 else f"{name}_{k}"] = grow(value, factor, depth + 1)
+    return out
+
+
+class Cascade:
+    """ The pre selection-engine TxMenu.validate, with the combo box updates replaced by the value lists """
+
+    def __init__(self, data):
+        self.data = data
+        self.band = self.standard = self.rate = self.bw = self.core = self.country = self.channel = ''
+
+    def select(self, level, value):
+        i = LEVELS.index(level)
+        setattr(self, level, value)
+        for below in LEVELS[i + 1:]:
+            setattr(self, below, '')
+        self.validate()
+
+    def validate(self):
+        data = self.data
+        try:
+            if(self.channel in list(data[self.band][self.standard][self.rate][self.bw][self.core][self.country])):
+                pass
+            else:
+                self.values = data[self.band][self.standard][self.rate][self.bw][self.core][self.country]
+        except:
+            try:
+                if(self.country in list(data[self.band][self.standard][self.rate][self.bw][self.core].keys())):
+                    self.values = data[self.band][self.standard][self.rate][self.bw][self.core][self.country]
+                else:
+                    self.values = list(data[self.band][self.standard][self.rate][self.bw][self.core].keys())
+            except:
+                try:
+                    if(self.core in list(data[self.band][self.standard][self.rate][self.bw].keys())):
+                        self.values = list(data[self.band][self.standard][self.rate][self.bw][self.core].keys())
+                    else:
+                        self.values = list(data[self.band][self.standard][self.rate][self.bw].keys())
+                except:
+                    try:
+                        if(self.bw in list(data[self.band][self.standard][self.rate].keys())):
+                            self.values = list(data[self.band][self.standard][self.rate][self.bw].keys())
+                        else:
+                            self.values = list(data[self.band][self.standard][self.rate].keys())
+                    except:
+                        try:
+                            if(self.rate in list(data[self.band][self.standard].keys())):
+                                self.values = list(data[self.band][self.standard][self.rate].keys())
+                            else:
+                                self.values = list(data[self.band][self.standard].keys())
+                        except:
+                            try:
+                                if(self.standard in list(data[self.band].keys())):
+                                    self.values = list(data[self.band][self.standard].keys())
+                                else:
+                                    self.values = list(data[self.band].keys())
+                            except:
+                                pass
+
+
+def random_walks(compiled, count, seed=1):
+    """ A list of (level, value) changes, like a user walking down the combo boxes and going back up """
+    rnd = random.Random(seed)
+    steps = []
+    path = []
+    for _ in range(count):
+        i = min(rnd.randrange(len(path) + 1), len(LEVELS) - 1)
+        value = rnd.choice(compiled.options(*path[:i]))
+        path = path[:i] + [value]
+        steps.append((LEVELS[i], value))
+    return steps
+
+
+def any_order_walks(table, count, seed=1):
+    """ A list of (level, value) changes in any order, every value valid with the others or a cleared field """
+    rnd = random.Random(seed)
+    steps = []
+    selection = AnySelection(table)
+    for _ in range(count):
+        i = rnd.randrange(len(LEVELS))
+        options = selection.options[i]
+        value = rnd.choice(options) if options and rnd.random() > 0.1 else ''
+        selection.select(LEVELS[i], value)
+        steps.append((LEVELS[i], value))
+    return steps
+
+
+def timeit(engine, steps, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for level, value in steps:
+            engine.select(level, value)
+        best = min(best, time.perf_counter() - start)
+    return best / len(steps) * 1e6
+
+
+def main():
+    with open('system-definition.json') as json_file:
+        raw = json.load(json_file)
+
+    print(f"{'factor':>6} {'nodes':>9} {'rows':>8} {'cascade us':>11} {'engine us':>10} {'ratio':>8} {'any order us':>13}")
+    for factor in (1, 5, 20, 50):
+        tree = grow(raw, factor)
+        compiled = definition.from_dict(tree)
+        table = ConstraintTable(compiled)
+        steps = random_walks(compiled, 2000)
+        cascade = timeit(Cascade(tree), steps)
+        engine = timeit(AnySelection(table), steps)
+        any_order = timeit(AnySelection(table), any_order_walks(table, 2000))
+        nodes = compiled.stats()['expanded_nodes']
+        print(f"{factor:>6} {nodes:>9} {table.rows:>8} {cascade:>11.2f} {engine:>10.2f} {engine / cascade:>7.1f}x "
+              f"{any_order:>13.2f}")
+
+
+if __name__ == '__main__':
+    main()
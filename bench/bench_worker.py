@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark: a new python3 process per DUT command against the persistent DUT worker (dut_worker.py),
+both with the mock DUT backend. Run from the repo root:
+    python3 bench/bench_worker.py [--commands 200] [--connect 0.2] [--latency 0.001]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from dut import WorkerControl
+
+WORKER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dut_worker.py')
+STEP = dict(band='5GHz', standard='11ac', rate='MCS9', bw='80MHz', core='MIMO', country='ALL', channel='42')
+
+
+def spawn_per_command(count, latency, connect):
+    """ Like calling a control script per command: interpreter start, imports and DUT connect every time """
+    request = json.dumps({'id': 1, 'cmd': 'tx_start', 'args': STEP}) + '\n'
+    cmd = [sys.executable, WORKER, '--backend', 'mock', '--ip', '10.0.0.1', '--latency', str(latency)]
+    start = time.perf_counter()
+    for _ in range(count):
+        subprocess.run(cmd, input=request, capture_output=True, text=True, check=True,
+                       env={**os.environ, 'WTT_MOCK_CONNECT': str(connect)})
+    return time.perf_counter() - start
+
+
+def persistent(count, latency, connect, pipelined):
+    control = WorkerControl(ip='10.0.0.1', backend='mock', worker_args=['--latency', str(latency)])
+    control.request('ping').result()  # start-up and connect once, not part of the measurement
+    start = time.perf_counter()
+    if pipelined:
+        jobs = [control.tx_start(**STEP) for _ in range(count)]
+        for job in jobs:
+            job.result()
+    else:
+        for _ in range(count):
+            control.tx_start(**STEP).result()
+    elapsed = time.perf_counter() - start
+    control.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--commands', type=int, default=200)
+    parser.add_argument('--connect', type=float, default=0.2, help='mock DUT connect time in seconds')
+    parser.add_argument('--latency', type=float, default=0.001, help='mock DUT command time in seconds')
+    args = parser.parse_args()
+
+    os.environ['WTT_MOCK_CONNECT'] = str(args.connect)
+    spawn_count = max(1, args.commands // 10)  # slow, run fewer and scale
+    results = [
+        ('process per command', spawn_per_command(spawn_count, args.latency, args.connect) / spawn_count),
+        ('worker, one at a time', persistent(args.commands, args.latency, args.connect, False) / args.commands),
+        ('worker, pipelined', persistent(args.commands, args.latency, args.connect, True) / args.commands),
+    ]
+    print(f"{'mode':<24} {'ms/command':>10} {'commands/s':>11}")
+    for name, seconds in results:
+        print(f"{name:<24} {seconds * 1e3:>10.2f} {1 / seconds:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
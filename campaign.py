@@ -0,0 +1,90 @@
+"""
+Incremental certification runs: only the combinations that need it are run again, the passing results of
+earlier runs are reused for the rest.
+
+A step of the plan is run when its combination is (in this order)
+
+    new       not in the system definition of the last run
+    changed   in both definitions, but its channel list (band ... country entry) has changed
+    untested  no result for the firmware of this run (type and image checksum, see firmware.py)
+    failed    the newest result did not pass
+    stale     the newest result is older than max_age
+
+The results and the definition of the last run come from the results store (see results.py). A changed
+firmware image never matches the old results, so it re-runs everything.
+
+    python3 sweep.py --incremental --max-age 30d --fw MFG --tx "band=2.4GHz,5GHz standard=11ac"
+"""
+
+import time
+from collections import Counter
+
+from definition import LEVELS
+
+REASONS = ('new', 'changed', 'untested', 'failed', 'stale')
+
+# the path of the channel list of a combination
+PATH = LEVELS[:-1]
+
+
+def step_key(step):
+    """ The key of a step in ResultStore.latest() """
+    return (step.get('mode'), *(step.get(level) for level in LEVELS))
+
+
+class Campaign:
+
+    def __init__(self, data, latest, previous=None, max_age=None, now=None):
+        """
+        data: the current SystemDefinition, previous: the one of the last run (None if there was none).
+        latest: ResultStore.latest() for the firmware of this run. max_age: seconds, None for no limit
+        """
+        self.data = data
+        self.latest = latest
+        self.previous = previous
+        self.max_age = max_age
+        self.now = time.time() if now is None else now
+        self._old_channels = {}
+
+    def definition_change(self, step):
+        """ 'new', 'changed' or None for a Tx step, compared with the definition of the last run """
+        if self.previous is None or step.get('mode') != 'tx':
+            return None
+        path = tuple(step[level] for level in PATH)
+        if path not in self._old_channels:
+            try:
+                self._old_channels[path] = self.previous.options(*path)
+            except KeyError:
+                self._old_channels[path] = None
+        old = self._old_channels[path]
+        if old is None or step['channel'] not in old:
+            return 'new'
+        if old != self.data.options(*path):
+            return 'changed'
+        return None
+
+    def reason(self, step):
+        """ Why the step has to run, None if its earlier result can be reused """
+        change = self.definition_change(step)
+        if change:
+            return change
+        latest = self.latest.get(step_key(step))
+        if latest is None:
+            return 'untested'
+        status, when = latest
+        if status != 'ok':
+            return 'failed'
+        if self.max_age is not None and self.now - when > self.max_age:
+            return 'stale'
+        return None
+
+    def select(self, steps):
+        """ Returns (the steps to run, Counter of the reasons incl. 'reused') """
+        selected = []
+        reasons = Counter()
+        for step in steps:
+            reason = self.reason(step)
+            reasons[reason or 'reused'] += 1
+            if reason:
+                selected.append(step)
+        return selected, reasons
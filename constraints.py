@@ -0,0 +1,238 @@
+"""
+Constraint table with one code column per field, so the fields can be chosen in any order.
+
+Every valid band -> standard -> rate -> bw -> core -> country path is enumerated once into a row. A row
+also points to the channel list (leaf node) of its path, so a row stands for all its channels. That keeps
+the table a channel list length (10-25x) smaller than one row per 7-tuple, without losing anything: a
+channel can only be once in a channel list.
+The rows are kept as numpy columns of value codes (uint8/uint16, the index in table.values[field]). Every
+value also keeps the sorted numbers of its rows, and every channel list a boolean row of the channels in it.
+Every pair of fields also gets a co-occurrence matrix, so a field whose options depend on one choice is a
+matrix row lookup. With more choices the rows of the most selective one are filtered by the others and the
+options of a field are the codes that are left in its column (a bincount):
+
+    table = ConstraintTable(definition.load())
+    table.remaining(channel='36', country='ALL')  --> {'band': ('5GHz',), 'standard': ('11n', '11ac', '11a'), ...}
+
+The options of a field are computed without the field's own choice, so a chosen field still shows its
+alternatives (like a faceted search). The cost depends on the number of rows that are left after two or
+more choices, not on the size of the definition: see bench/bench_constraints.py.
+"""
+
+from array import array
+from itertools import compress
+
+import numpy as np
+
+from definition import LEVELS
+
+# the fields that have a column, the channel is given by the leaf column
+PATH = LEVELS[:-1]
+
+NO_ROWS = np.empty(0, dtype=np.int32)
+
+
+def _dtype(count):
+    return np.uint8 if count <= 0x100 else np.uint16
+
+
+def _groups(column, count):
+    """ The sorted row numbers of every code of column (a stable sort keeps the rows of a code in order) """
+    order = np.argsort(column, kind='stable').astype(np.int32)
+    bounds = np.concatenate(([0], np.cumsum(np.bincount(column, minlength=count))))
+    return [order[bounds[code]:bounds[code + 1]] for code in range(count)]
+
+
+class ConstraintTable:
+
+    def __init__(self, definition):
+        self.definition = definition
+        self.fields = LEVELS
+        self.values = {field: [] for field in PATH}
+        self.codes = {field: {} for field in PATH}
+        columns = {field: array('H') for field in PATH}
+        leaf_column = array('I')
+        self.leaves = []          # leaf node ids, index is the code in leaf_column
+        self.rows = self._enumerate(definition, columns, leaf_column)
+
+        self.columns = {}
+        self.value_rows = {}      # {field: [sorted row numbers per code]}
+        for field in PATH:
+            self.values[field] = tuple(self.values[field])
+            count = len(self.values[field])
+            self.columns[field] = np.frombuffer(columns[field], dtype=np.uint16).astype(_dtype(count))
+            self.value_rows[field] = _groups(self.columns[field], count)
+        self.leaf_column = np.frombuffer(leaf_column, dtype=np.uint32).astype(np.int32)
+        self.leaf_rows = _groups(self.leaf_column, len(self.leaves))
+
+        # channels: a boolean row per channel list, a channel has the rows of all the lists that contain it
+        self.leaf_channels = [definition.keys[leaf] for leaf in self.leaves]
+        channels = {}
+        for channel_list in self.leaf_channels:
+            for channel in channel_list:
+                channels.setdefault(channel, len(channels))
+        self.values['channel'] = tuple(channels)
+        self.codes['channel'] = channels
+        self.leaf_matrix = np.zeros((len(self.leaves), len(channels)), dtype=bool)
+        for leaf, channel_list in enumerate(self.leaf_channels):
+            self.leaf_matrix[leaf, [channels[channel] for channel in channel_list]] = True
+        self.leaf_sizes = self.leaf_matrix.sum(axis=1)
+        self.channel_rows = {} # built on first use, see _value_rows()
+
+        self.sizes = {field: [len(rows) for rows in self.value_rows[field]] for field in PATH}
+        leaf_counts = np.array([len(rows) for rows in self.leaf_rows], dtype=np.int64)
+        self.sizes['channel'] = list(leaf_counts @ self.leaf_matrix) if len(self.leaves) else []
+
+        # {(field, other): boolean matrix [code of field, code of other]}, True if they are together in a row
+        self.pairs = {}
+        leaf_count = len(self.leaves)
+        leaf_matrix = self.leaf_matrix.astype(np.int32)
+        for i, field in enumerate(PATH):
+            count = len(self.values[field])
+            code = self.columns[field].astype(np.int64)
+            for other in PATH[i + 1:]:
+                other_count = len(self.values[other])
+                pair = np.bincount(code * other_count + self.columns[other], minlength=count * other_count)
+                self._pair(field, other, pair.reshape(count, other_count) > 0)
+            leaves = np.bincount(code * leaf_count + self.leaf_column, minlength=count * leaf_count)
+            self._pair(field, 'channel', (leaves.reshape(count, leaf_count) > 0) @ leaf_matrix > 0)
+
+    def _pair(self, field, other, matrix):
+        self.pairs[field, other] = matrix
+        self.pairs[other, field] = np.ascontiguousarray(matrix.T)
+
+    def _code(self, field, value):
+        codes = self.codes[field]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self.values[field])
+            if code > 0xffff:
+                raise ValueError(f"too many different values for {field}")
+            self.values[field].append(value)
+        return code
+
+    def _enumerate(self, definition, columns, leaf_column):
+        """ Fill the columns in definition order. The number of rows below a node is computed once per unique node """
+        keys, kids = definition.keys, definition.kids
+        size = {}
+        leaf_code = {}
+
+        def rows_below(node):
+            if node not in size:
+                size[node] = sum(rows_below(kid) if kids[kid] else 1 for kid in kids[node])
+            return size[node]
+
+        def walk(node, depth):
+            column = columns[PATH[depth]]
+            for name, kid in zip(keys[node], kids[node]):
+                if kids[kid]:
+                    column.extend(array('H', [self._code(PATH[depth], name)]) * rows_below(kid))
+                    walk(kid, depth + 1)
+                else:
+                    column.append(self._code(PATH[depth], name))
+                    if kid not in leaf_code:
+                        leaf_code[kid] = len(self.leaves)
+                        self.leaves.append(kid)
+                    leaf_column.append(leaf_code[kid])
+
+        walk(definition.root, 0)
+        return rows_below(definition.root)
+
+    def _chosen(self, chosen):
+        """ {field: value} --> {field: code}, -1 for a value that is not in the table. Empty values are not chosen """
+        codes = {}
+        for field, value in chosen.items():
+            if field not in self.codes:
+                raise KeyError(field)
+            if value not in ('', None):
+                codes[field] = self.codes[field].get(value, -1)
+        return codes
+
+    def _value_rows(self, field, code):
+        if code < 0:
+            return NO_ROWS
+        if field != 'channel':
+            return self.value_rows[field][code]
+        rows = self.channel_rows.get(code)
+        if rows is None:
+            rows = [self.leaf_rows[leaf] for leaf in np.flatnonzero(self.leaf_matrix[:, code])]
+            rows = self.channel_rows[code] = np.sort(np.concatenate(rows)) if rows else NO_ROWS
+        return rows
+
+    def _rows(self, codes):
+        """ The sorted row numbers that match all {field: code}, None for all rows """
+        if not codes:
+            return None
+        order = sorted(codes.items(), key=lambda item: self.sizes[item[0]][item[1]] if item[1] >= 0 else 0)
+        rows = self._value_rows(*order[0])
+        for field, code in order[1:]:
+            if not rows.size:
+                break
+            if field == 'channel':
+                rows = rows[self.leaf_matrix[self.leaf_column[rows], code]]
+            else:
+                rows = rows[self.columns[field][rows] == code]
+        return rows
+
+    def _options(self, field, codes, rows=None):
+        """ The options of field in the rows that match {other field: code}. rows: those rows if they are known """
+        values = self.values[field]
+        if not codes:
+            return values
+        if len(codes) == 1:
+            (other, code), = codes.items()
+            return tuple(compress(values, self.pairs[other, field][code])) if code >= 0 else ()
+        if rows is None:
+            rows = self._rows(codes)
+        if not rows.size:
+            return ()
+        if field == 'channel':
+            leaves = np.flatnonzero(np.bincount(self.leaf_column[rows], minlength=len(self.leaves)))
+            present = self.leaf_matrix[leaves].any(axis=0)
+        else:
+            present = np.bincount(self.columns[field][rows], minlength=len(values)) > 0
+        return tuple(compress(values, present))
+
+    def match(self, **chosen):
+        """ The sorted numbers of the rows that match all chosen values, None for all rows. An unknown value matches nothing """
+        return self._rows(self._chosen(chosen))
+
+    def count(self, **chosen):
+        """ Number of valid 7-tuples that match the chosen values """
+        codes = self._chosen(chosen)
+        rows = self._rows(codes)
+        if 'channel' in codes:
+            return len(rows)
+        return int(self.leaf_sizes[self.leaf_column if rows is None else self.leaf_column[rows]].sum())
+
+    def remaining(self, **chosen):
+        """
+        Valid options for every field given the other chosen fields, e.g. remaining(country='US', channel='36').
+        The rows for a field are filtered by all chosen fields except the field itself.
+        """
+        codes = self._chosen(chosen)
+        rows = self._rows(codes) if len(codes) > 1 else None # the same for all fields that are not chosen
+        out = {}
+        for field in self.fields:
+            if field in codes:
+                out[field] = self._options(field, {other: code for other, code in codes.items() if other != field})
+            else:
+                out[field] = self._options(field, codes, rows)
+        return out
+
+    def row(self, index):
+        """ The path of a row and its channel list """
+        path = tuple(self.values[field][self.columns[field][index]] for field in PATH)
+        return path, self.leaf_channels[self.leaf_column[index]]
+
+    def combinations(self, **chosen):
+        """ Yield the valid 7-tuples (in LEVELS order) that match the chosen values """
+        rows = self.match(**chosen)
+        channel = chosen.get('channel')
+        for index in range(self.rows) if rows is None else rows.tolist():
+            path, channels = self.row(index)
+            if channel in ('', None):
+                for c in channels:
+                    yield path + (c,)
+            else:
+                yield path + (channel,)
@@ -0,0 +1,394 @@
+"""
+Compiled look-up index for the system definition ("system-definition.json").
+
+The json file is a tree: band -> standard -> rate -> bw -> core -> country -> [channels]
+Most of the sub trees are identical. The channel list for a country is the same under core0, core1 and MIMO
+and a whole bw/core/country block is often repeated for every rate. Instead of keeping the raw nested dicts
+the tree is hash-consed while it is parsed: every unique sub tree is stored once in a flat node table and
+identical sub trees share the same node id. Memory and look-up cost therefore grow with the number of
+unique nodes and not with the total number of leaves.
+
+A node is just an index into two flat tables:
+    keys[node] -> tuple with the (interned) option names at this level, e.g. ('20MHz', '40MHz')
+    kids[node] -> tuple with the child node ids, in the same order as keys. Empty for the channel lists
+The channel list is the last node on every path, its keys are the channels.
+
+The definition can also be written as rules (channel sets per band/bw/country, rate tables per standard and
+exclusions), see rules.py. It is compiled to the same node tables.
+
+The node tables only contain tuples, strings and ints, so they are stored in a marshal cache file
+(./cache/<name>-<hash of the absolute path>.cache) the first time a definition is compiled. The next start
+loads the cache instead of parsing the json. The cache is keyed on the mtime/size and the sha256 of the json
+file and is rebuilt automatically when the json changes.
+"""
+
+import hashlib
+import json
+import logging
+import marshal
+import os
+import sys
+from collections import namedtuple
+
+# Order of the levels in the tree. The channel is the last level (the leaf node keys)
+LEVELS = ('band', 'standard', 'rate', 'bw', 'core', 'country', 'channel')
+
+# Bump this if the node tables change layout, old cache files are then rebuilt
+CACHE_VERSION = 1
+CACHE_DIR = './cache'
+
+logger = logging.getLogger('wltrx-gui')
+
+
+class DefinitionError(Exception):
+    pass
+
+
+class SystemDefinition:
+    """
+    Read-only view of a compiled definition.
+    Use options(band, standard, ...) to get the valid values on the next level. A path that is not valid
+    raises KeyError, the same way data[band][standard]... did on the raw json dicts.
+    """
+
+    def __init__(self, keys, kids, root):
+        self.keys = keys
+        self.kids = kids
+        self.root = root
+        # one position look-up dict per unique keys tuple, shared by all nodes with the same options
+        pos_cache = {}
+        self.pos = [pos_cache.setdefault(k, {name: i for i, name in enumerate(k)}) for k in keys]
+        self._sizes = {}  # number of combinations below a node, filled in by count()
+
+    def node(self, *path):
+        """ Node id of the given path. Raises KeyError if the path is not valid """
+        node = self.root
+        keys, kids, pos = self.keys, self.kids, self.pos
+        for name in path:
+            child = kids[node]
+            if not child:
+                raise KeyError(name)  # walked past the channel level
+            node = child[pos[node][name]]
+        return node
+
+    def options(self, *path):
+        """ Valid values one level below path, e.g. options('2.4GHz') --> ('11b', '11g', '11n', '11ac') """
+        return self.keys[self.node(*path)]
+
+    def child(self, node, name):
+        """ Child node id of node, or None if name is not a valid option there """
+        i = self.pos[node].get(name)
+        if i is None or not self.kids[node]:
+            return None
+        return self.kids[node][i]
+
+    def is_valid(self, *path):
+        """ True if path is a valid prefix. A full 7 element path means a valid channel """
+        try:
+            if len(path) == len(LEVELS):
+                return path[-1] in self.pos[self.node(*path[:-1])]
+            self.node(*path)
+            return True
+        except (KeyError, TypeError):
+            return False
+
+    def combinations(self, **filters):
+        """
+        Lazily yield every valid (band, standard, rate, bw, core, country, channel) tuple that matches the filters.
+        A filter is given per level and can be a value, a collection of values or a predicate, e.g.
+            combinations(band='5GHz', bw='80MHz', core='MIMO', country={'US', 'ALL'}, channel=lambda c: int(c) > 100)
+        Nothing is materialized, the tuples are generated in definition order while walking the index.
+        """
+        matchers = _matchers(filters)
+        keys, kids = self.keys, self.kids
+        last = len(LEVELS) - 1
+
+        def walk(node, depth, prefix):
+            match = matchers[depth]
+            if depth == last:
+                for channel in keys[node]:
+                    if match is None or match(channel):
+                        yield prefix + (channel,)
+                return
+            for name, kid in zip(keys[node], kids[node]):
+                if match is None or match(name):
+                    yield from walk(kid, depth + 1, prefix + (name,))
+
+        return walk(self.root, 0, ())
+
+    def count(self, **filters):
+        """
+        Number of combinations that match the filters (same filters as combinations), without generating them.
+        The size of an unfiltered sub tree is computed once per unique node and kept, and filtered sub trees are
+        counted once per unique node and call, so the cost follows the number of unique nodes.
+        """
+        matchers = _matchers(filters)
+        keys, kids = self.keys, self.kids
+        # deepest level with a filter, everything below it is counted from the cached sub tree sizes
+        deepest = max((depth for depth, match in enumerate(matchers) if match is not None), default=-1)
+        sizes = self._sizes
+        counted = {}
+
+        def size(node):
+            if node not in sizes:
+                sizes[node] = sum(size(kid) for kid in kids[node]) if kids[node] else len(keys[node])
+            return sizes[node]
+
+        def walk(node, depth):
+            if depth > deepest:
+                return size(node)
+            if node not in counted:
+                match = matchers[depth]
+                if not kids[node]:
+                    counted[node] = sum(1 for channel in keys[node] if match is None or match(channel))
+                else:
+                    counted[node] = sum(walk(kid, depth + 1) for name, kid in zip(keys[node], kids[node])
+                                        if match is None or match(name))
+            return counted[node]
+
+        return walk(self.root, 0)
+
+    def to_dict(self, node=None):
+        """ Expand (a part of) the index back to the nested json structure """
+        node = self.root if node is None else node
+        if not self.kids[node]:
+            return list(self.keys[node])
+        return {name: self.to_dict(kid) for name, kid in zip(self.keys[node], self.kids[node])}
+
+    def stats(self):
+        """ Size of the index compared to the expanded tree """
+        total = {}
+
+        def expanded(node):
+            if node not in total:
+                kids = self.kids[node]
+                total[node] = 1 + sum(expanded(kid) for kid in kids) if kids else 1
+            return total[node]
+
+        return {'unique_nodes': len(self.keys), 'expanded_nodes': expanded(self.root)}
+
+
+# a difference between two definitions: the options below path were added, removed or only reordered
+Change = namedtuple('Change', ['path', 'added', 'removed'])
+
+
+def diff(old, new):
+    """
+    The structural differences between two definitions, [Change] for every path whose options differ.
+    Every unique sub tree of both definitions gets a signature once, identical sub trees (most of them after a
+    small edit) are then skipped without walking them. The cost follows the number of unique nodes
+    """
+    signatures = {} # (keys, kid signatures) -> signature, shared by both definitions
+
+    def signer(definition):
+        memo = {}
+
+        def sign(node):
+            if node not in memo:
+                kids = tuple(sign(kid) for kid in definition.kids[node])
+                memo[node] = signatures.setdefault((definition.keys[node], kids), len(signatures))
+            return memo[node]
+        return sign
+
+    old_sign, new_sign = signer(old), signer(new)
+    changes = []
+
+    def walk(old_node, new_node, path):
+        if old_sign(old_node) == new_sign(new_node):
+            return
+        old_keys, new_keys = old.keys[old_node], new.keys[new_node]
+        if old_keys != new_keys:
+            changes.append(Change(path, tuple(k for k in new_keys if k not in old.pos[old_node]),
+                                  tuple(k for k in old_keys if k not in new.pos[new_node])))
+        if old.kids[old_node] and new.kids[new_node]:
+            for name in new_keys:
+                old_kid = old.child(old_node, name)
+                if old_kid is not None:
+                    walk(old_kid, new.child(new_node, name), path + (name,))
+
+    walk(old.root, new.root, ())
+    return changes
+
+
+def _matchers(filters):
+    """ One match function (or None for 'anything') per level from the keyword filters """
+    unknown = set(filters) - set(LEVELS)
+    if unknown:
+        raise KeyError(f"unknown level(s): {', '.join(sorted(unknown))}")
+    matchers = []
+    for level in LEVELS:
+        value = filters.get(level)
+        if value is None:
+            matchers.append(None)
+        elif callable(value):
+            matchers.append(value)
+        elif isinstance(value, str):
+            matchers.append(value.__eq__)
+        else:
+            matchers.append(frozenset(value).__contains__)
+    return matchers
+
+
+class _Node(int):
+    """ A node id made by the builder, so that a number in the json is never taken for a node """
+    __slots__ = ()
+
+
+# an empty json object, rejected by the object that contains it (it knows the name)
+_EMPTY = object()
+
+
+class _Builder:
+    """ Hash-conses the json objects while they are parsed (used as json object_pairs_hook) """
+
+    def __init__(self):
+        self.keys = []
+        self.kids = []
+        self.nodes = {}       # (keys, kids) -> node id
+        self.tuples = {}      # interned key tuples
+
+    def add(self, keys, kids):
+        keys = self.tuples.setdefault(keys, keys)
+        kids = self.tuples.setdefault(kids, kids) if kids else ()
+        node = self.nodes.get((keys, kids))
+        if node is None:
+            node = self.nodes[(keys, kids)] = len(self.keys)
+            self.keys.append(keys)
+            self.kids.append(kids)
+        return _Node(node)
+
+    def leaf(self, channels):
+        if not channels:
+            raise DefinitionError("empty channel list")
+        if not all(isinstance(c, str) for c in channels):
+            raise DefinitionError(f"channel lists must only contain strings: {channels}")
+        return self.add(tuple(sys.intern(c) for c in channels), ())
+
+    def object_pairs_hook(self, pairs):
+        if not pairs:
+            return _EMPTY
+        keys = []
+        kids = []
+        for name, value in pairs:
+            if isinstance(value, list):
+                if not value:
+                    raise DefinitionError(f"'{name}' has no channels")
+                value = self.leaf(value)
+            elif value is _EMPTY:
+                raise DefinitionError(f"'{name}' has no options")
+            elif type(value) is not _Node:
+                raise DefinitionError(f"unexpected value for '{name}': {value!r}")
+            keys.append(sys.intern(name))
+            kids.append(int(value)) # plain ints in the node tables, they are marshalled
+        return self.add(tuple(keys), tuple(kids))
+
+    def build(self, root):
+        if root is _EMPTY:
+            raise DefinitionError("the definition is empty")
+        if type(root) is not _Node:
+            raise DefinitionError("the definition must be a json object")
+        definition = SystemDefinition(self.keys, self.kids, int(root))
+        self.check_depth(definition)
+        return definition
+
+    def check_depth(self, definition):
+        # all paths must be exactly band -> ... -> country -> [channels]
+        depth = {}
+
+        def walk(node):
+            if node not in depth:
+                kids = definition.kids[node]
+                found = {walk(kid) + 1 for kid in kids} if kids else {1}
+                if len(found) != 1:
+                    raise DefinitionError("the definition tree does not have the same depth everywhere")
+                depth[node] = found.pop()
+            return depth[node]
+
+        if walk(definition.root) != len(LEVELS):
+            raise DefinitionError(f"the definition must have the levels {' -> '.join(LEVELS)}")
+
+
+def loads(text):
+    """ Compile a json string, a full tree or a rule definition (see rules.py) """
+    builder = _Builder()
+    try:
+        root = json.loads(text, object_pairs_hook=builder.object_pairs_hook)
+    except DefinitionError:
+        # a rule definition fails at its first string value, long before a full tree would be parsed
+        rules = json.loads(text)
+        if isinstance(rules, dict) and 'rules' in rules:
+            import rules as rule_format
+            return rule_format.compile_rules(rules)
+        raise
+    return builder.build(root)
+
+
+def from_dict(tree):
+    """ Compile an already parsed (nested dict) definition """
+    builder = _Builder()
+
+    def walk(obj):
+        return builder.object_pairs_hook([(k, walk(v) if isinstance(v, dict) else v) for k, v in obj.items()])
+
+    return builder.build(walk(tree))
+
+
+def cache_path(path, cache_dir=CACHE_DIR):
+    """ One cache file per definition file, two files with the same name in different directories do not share one """
+    key = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:12]
+    return os.path.join(cache_dir, f"{os.path.basename(path)}-{key}.cache")
+
+
+def _read_cache(cache_file):
+    try:
+        with open(cache_file, 'rb') as f:
+            cached = marshal.load(f)
+        if cached[0] != CACHE_VERSION:
+            return None
+        return cached
+    except FileNotFoundError:
+        return None
+    except (EOFError, ValueError, TypeError, IndexError, OSError) as e:
+        logger.warning(f"ignoring broken definition cache {cache_file}: {e}")
+        return None
+
+
+def _write_cache(cache_file, stat, digest, definition):
+    cached = (CACHE_VERSION, stat.st_mtime_ns, stat.st_size, digest, definition.keys, definition.kids, definition.root)
+    tmp = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_file) or '.', exist_ok=True)
+        with open(tmp, 'wb') as f:
+            marshal.dump(cached, f)
+        os.replace(tmp, cache_file)  # atomic, a second instance never sees a half written cache
+    except OSError as e:
+        logger.warning(f"could not write definition cache {cache_file}: {e}")
+
+
+def load(path='system-definition.json', cache_dir=CACHE_DIR):
+    """
+    Load and compile a definition file. cache_dir=None disables the marshal cache.
+    Fast path: same mtime and size as when the cache was written -> no need to even read the json.
+    Slow path: the json is read and hashed. Same hash (e.g. the file was touched or checked out again) -> the
+    cache is still used and gets a new mtime. Otherwise the json is compiled and the cache is rewritten.
+    """
+    if cache_dir is None:
+        with open(path, 'rb') as json_file:
+            return loads(json_file.read())
+
+    cache_file = cache_path(path, cache_dir)
+    stat = os.stat(path)
+    cached = _read_cache(cache_file)
+    if cached and cached[1] == stat.st_mtime_ns and cached[2] == stat.st_size:
+        return SystemDefinition(list(cached[4]), list(cached[5]), cached[6])
+
+    with open(path, 'rb') as json_file:
+        text = json_file.read()
+    digest = hashlib.sha256(text).hexdigest()
+    if cached and cached[3] == digest:
+        definition = SystemDefinition(list(cached[4]), list(cached[5]), cached[6])
+    else:
+        logger.debug(f"compiling {path}")
+        definition = loads(text)
+    _write_cache(cache_file, stat, digest, definition)
+    return definition
@@ -0,0 +1,484 @@
+"""
+DUT control layer. The chip specific control scripts in ./dut-control do the real work (they can not be
+supplied in this repo), this module only knows how to call them. It does not import any GUI modules so it
+can be used from the headless sweep runner (sweep.py) as well as from the GUI.
+
+The scripts are called as 'python3 ./dut-control/<script> --key value ...'. SCRIPTS maps the actions to the
+script names, change it if the control scripts for a chip are named differently.
+
+All calls run in the background on a CommandExecutor (a thread pool), never on the caller's thread. Every
+action returns a Job: its output is streamed line by line to the logger while it runs, it can be cancelled,
+has an optional timeout and job.result() / job.add_done_callback() give the exit status.
+
+WorkerControl has the same actions but sends them to a persistent dut_worker.py process, which keeps the
+control module loaded and the DUT connection open between commands.
+
+tx_start only sends the parameters that differ from what the DUT already has (see DutState), e.g.
+'tx_start.py --channel 40' when only the channel changed. All parameters are sent when the state is not
+known: at start, after a firmware load, after an Rx start or after a failed command.
+"""
+
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+
+logger = logging.getLogger('wltrx-gui')
+
+CONTROL_DIR = './dut-control'
+CONFIG = './dut-control/config.ini'
+
+SCRIPTS = {
+    'load_fw': {'MFG': 'load_mfg_fw.py', 'STD': 'load_std_fw.py'},
+    'tx_start': 'tx_start.py',
+    'tx_stop': 'tx_stop.py',
+    'rx_start': 'rx_start.py',
+    'rx_stop': 'rx_stop.py',
+    'rx_counters': 'rx_counters.py', # see rx.py
+    'fw_info': 'fw_info.py', # optional, see firmware.py
+    'tx_telemetry': 'tx_telemetry.py', # optional, see telemetry.py
+}
+
+# returncode is None if the command timed out or was cancelled
+CommandResult = namedtuple('CommandResult', ['returncode', 'output', 'elapsed'])
+
+# seconds between terminate and kill when a command is cancelled or times out
+KILL_GRACE = 3
+
+
+class DutError(Exception):
+    pass
+
+
+def set_ip(ip, config=CONFIG):
+    """
+    The config.ini contains a line with 'IP =  10.8.17.121' that needs to be replaced with the new IP. Use regexp
+    """
+    with open(config, 'r+') as f:
+        file = f.read()
+        file = re.sub(r'(?<=IP = ).*$', ip, file, flags=re.MULTILINE) # change everything after 'IP = ' to the new ip argument
+        f.seek(0)
+        f.write(file)
+        f.truncate()
+
+
+def script_args(**params):
+    """ {'band': '5GHz', 'bw': '80MHz'} --> ['--band', '5GHz', '--bw', '80MHz'] """
+    args = []
+    for key, value in params.items():
+        if value is not None:
+            args += [f"--{key}", str(value)]
+    return args
+
+
+TX_PARAMS = ('band', 'standard', 'rate', 'bw', 'core', 'country', 'channel')
+
+
+class DutState:
+    """ Mirror of the Tx parameters that were last applied to the DUT. None means not known """
+
+    def __init__(self):
+        self.values = None
+        self.lock = threading.Lock()
+
+    def delta(self, **params):
+        """ Store params as the new state and return the ones that changed (all of them if the state was not known) """
+        with self.lock:
+            if self.values is None:
+                changed = dict(params)
+                self.values = dict(params)
+            else:
+                changed = {key: value for key, value in params.items() if self.values.get(key) != value}
+                self.values.update(changed)
+            return changed
+
+    def invalidate(self):
+        with self.lock:
+            self.values = None
+
+    def invalidate_on_error(self, job):
+        """ Forget the state if the job fails, the DUT may then have any of the old or new values """
+        def check(job):
+            try:
+                failed = job.result().returncode != 0
+            except Exception:
+                failed = True
+            if failed:
+                self.invalidate()
+        job.add_done_callback(check)
+        return job
+
+
+class Job:
+    """ A control script call that runs in the background, see CommandExecutor.submit """
+
+    def __init__(self, cmd, timeout=None, name=None, env=None):
+        self.cmd = cmd
+        self.env = env
+        self.timeout = timeout
+        self.name = name or cmd[-1]
+        self.proc = None
+        self.cancelled = False
+        self.timed_out = False
+        self.future = None
+        self.lock = threading.Lock()
+
+    def cancel(self):
+        """ Stop the command. A job that has not started yet will never start """
+        with self.lock:
+            self.cancelled = True
+            proc = self.proc
+        if proc:
+            self._stop(proc)
+
+    def _timeout(self):
+        self.timed_out = True
+        self._stop(self.proc)
+
+    def _stop(self, proc):
+        # never wait here, cancel() is called from the Tk thread
+        if proc.poll() is None:
+            proc.terminate()
+            timer = threading.Timer(KILL_GRACE, lambda: proc.poll() is None and proc.kill())
+            timer.daemon = True
+            timer.start()
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        """ Wait for the job and return its CommandResult """
+        return self.future.result(timeout)
+
+    def add_done_callback(self, fn):
+        """ fn(job) is called when the job is done. Note: it is called on the executor thread, not the Tk thread """
+        self.future.add_done_callback(lambda future: fn(self))
+
+
+class CommandExecutor:
+    """ Runs the control script commands on a thread pool and streams their output to the logger """
+
+    def __init__(self, max_workers=4):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='dut')
+
+    def submit(self, cmd, timeout=None, name=None, env=None):
+        """ env: extra environment variables for the command """
+        job = Job(cmd, timeout, name, env)
+        job.future = self.pool.submit(self._run, job)
+        return job
+
+    def _run(self, job):
+        logger.debug(' '.join(job.cmd))
+        start = time.monotonic()
+        lines = []
+        with job.lock:
+            if job.cancelled:
+                return CommandResult(None, '', 0.0)
+            env = {**os.environ, **job.env} if job.env else None
+            job.proc = subprocess.Popen(job.cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                                        errors='replace', bufsize=1, env=env)
+        timer = None
+        if job.timeout is not None:
+            timer = threading.Timer(job.timeout, job._timeout)
+            timer.daemon = True
+            timer.start()
+        try:
+            for line in job.proc.stdout:
+                line = line.rstrip('\n')
+                lines.append(line)
+                logger.info(f"{job.name}: {line}")
+            returncode = job.proc.wait()
+        finally:
+            if timer:
+                timer.cancel()
+            job.proc.stdout.close()
+
+        elapsed = time.monotonic() - start
+        if job.timed_out:
+            logger.error(f"{job.name} timed out after {job.timeout} s")
+            returncode = None
+        elif job.cancelled:
+            logger.warning(f"{job.name} was cancelled")
+            returncode = None
+        elif returncode != 0:
+            logger.error(f"{job.name} failed with exit status {returncode}")
+        return CommandResult(returncode, '\n'.join(lines), elapsed)
+
+    def shutdown(self, wait=False):
+        self.pool.shutdown(wait=wait, cancel_futures=True)
+
+
+_executor = None
+
+
+def default_executor():
+    global _executor
+    if _executor is None:
+        _executor = CommandExecutor()
+    return _executor
+
+
+class DutControl:
+    """ Runs the control scripts for one DUT. All actions return a Job """
+
+    def __init__(self, ip=None, control_dir=CONTROL_DIR, config=CONFIG, executor=None):
+        self.ip = ip
+        self.control_dir = control_dir
+        self.config = config
+        self.executor = executor or default_executor()
+        self.state = DutState()
+
+    def run(self, script, *args, timeout=None):
+        """ Start a control script in the background. WTT_DUT_CONFIG tells the script which config file to use """
+        cmd = [sys.executable, f"{self.control_dir}/{script}", *args]
+        name = f"{self.ip} {script}" if self.ip else script
+        return self.executor.submit(cmd, timeout=timeout, name=name, env={'WTT_DUT_CONFIG': self.config})
+
+    def connect(self):
+        """ Point the control scripts to this DUT """
+        if self.ip:
+            set_ip(self.ip, self.config)
+
+    def load_fw(self, fw='MFG', timeout=None):
+        if fw not in SCRIPTS['load_fw']:
+            raise DutError(f"unknown firmware type {fw}")
+        self.state.invalidate()
+        return self.state.invalidate_on_error(self.run(SCRIPTS['load_fw'][fw], timeout=timeout))
+
+    def tx_start(self, band, standard, rate, bw, core, country, channel, timeout=None):
+        params = self.state.delta(band=band, standard=standard, rate=rate, bw=bw, core=core, country=country, channel=channel)
+        logger.debug(f"{self.ip or 'DUT'}: tx_start sends {params or 'no changes'}")
+        return self.state.invalidate_on_error(self.run(SCRIPTS['tx_start'], *script_args(**params), timeout=timeout))
+
+    def tx_stop(self, timeout=None):
+        return self.run(SCRIPTS['tx_stop'], timeout=timeout)
+
+    def rx_start(self, band, core, channel, packets=None, timeout=None):
+        self.state.invalidate() # the Rx set-up reprograms the radio
+        args = script_args(band=band, core=core, channel=channel, packets=packets)
+        return self.run(SCRIPTS['rx_start'], *args, timeout=timeout)
+
+    def rx_stop(self, timeout=None):
+        return self.run(SCRIPTS['rx_stop'], timeout=timeout)
+
+    def rx_counters(self, timeout=None):
+        """ The Rx packet counters as json, see rx.py """
+        return self.run(SCRIPTS['rx_counters'], timeout=timeout)
+
+    def fw_info(self, timeout=None):
+        """ Probe the running firmware, the script prints a json object (see firmware.py) """
+        if not os.path.exists(f"{self.control_dir}/{SCRIPTS['fw_info']}"):
+            raise DutError(f"there is no {SCRIPTS['fw_info']} to probe the firmware")
+        return self.run(SCRIPTS['fw_info'], timeout=timeout)
+
+    def tx_telemetry(self, timeout=None):
+        """ The Tx read back (output power, EVM, temperature) as json, see telemetry.py """
+        if not os.path.exists(f"{self.control_dir}/{SCRIPTS['tx_telemetry']}"):
+            raise DutError(f"there is no {SCRIPTS['tx_telemetry']} to read the Tx telemetry")
+        return self.run(SCRIPTS['tx_telemetry'], timeout=timeout)
+
+
+class WorkerJob(Job):
+    """ A command sent to a dut_worker.py process. The result is filled in by the reply reader """
+
+    def __init__(self, cmd, timeout=None):
+        super().__init__([cmd], timeout, cmd)
+        self.future = Future()
+        self.start = time.monotonic()
+
+    def cancel(self):
+        # a command that is running in the worker can not be interrupted, its reply is just ignored
+        self.cancelled = True
+        self.finish(None, 'cancelled')
+
+    def finish(self, returncode, output):
+        if not self.future.done():
+            self.future.set_result(CommandResult(returncode, output, time.monotonic() - self.start))
+
+
+class WorkerControl:
+    """
+    Same actions as DutControl, sent as json lines to a persistent dut_worker.py process.
+    The worker is started on the first command and connects to the DUT first. If it dies or a command times out
+    (the worker is then considered hung and is killed) the pending jobs fail and the next command starts a new
+    worker. A failed connect fails the commands after it the same way, the next command connects again.
+    """
+
+    def __init__(self, ip=None, backend='chip_control', control_dir=CONTROL_DIR, config=CONFIG, worker_args=()):
+        self.ip = ip
+        self.backend = backend
+        self.control_dir = control_dir
+        self.config = config
+        self.worker_args = list(worker_args)
+        self.proc = None
+        self.pending = {}
+        self.next_id = 0
+        self.lock = threading.Lock()
+        self.state = DutState()
+
+    @property
+    def name(self):
+        return f"dut worker {self.ip}" if self.ip else "dut worker"
+
+    def _start_worker(self):
+        worker = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dut_worker.py')
+        cmd = [sys.executable, worker, '--backend', self.backend, '--control-dir', self.control_dir,
+               '--config', self.config, *self.worker_args]
+        logger.debug(' '.join(cmd))
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                text=True, errors='replace', bufsize=1)
+        # every worker has its own pending dict, a dying old worker must not fail the jobs of a new one
+        self.pending = {}
+        threading.Thread(target=self._read_replies, args=(proc, self.pending), name='dut-worker-replies', daemon=True).start()
+        threading.Thread(target=self._read_log, args=(proc,), name='dut-worker-log', daemon=True).start()
+        return proc
+
+    def _read_replies(self, proc, pending):
+        for line in proc.stdout:
+            try:
+                reply = json.loads(line)
+            except ValueError:
+                logger.warning(f"{self.name}: bad reply {line.strip()}")
+                continue
+            with self.lock:
+                job = pending.pop(reply.get('id'), None)
+            if job is None:
+                continue
+            if reply.get('ok'):
+                job.finish(0, json.dumps(reply.get('result')))
+            else:
+                logger.error(f"{self.name}: {job.name} failed: {reply.get('error')}")
+                job.finish(1, reply.get('error', ''))
+                if job.name == 'connect':
+                    self._not_connected(proc, pending, reply.get('error', ''))
+
+        # the worker is gone, nothing pending will get a reply
+        proc.wait()
+        with self.lock:
+            if self.proc is proc:
+                self.proc = None
+                self.state.invalidate() # the next worker knows nothing about what the DUT was set to
+            failed = [job for job in pending.values() if not job.done()]
+            pending.clear()
+        for job in failed:
+            job.finish(None, f"worker exited with status {proc.returncode}")
+        if failed:
+            logger.error(f"{self.name} exited with status {proc.returncode}")
+
+    def _not_connected(self, proc, pending, error):
+        """
+        The commands are run in order, so the ones that are still pending were sent after the failed connect and
+        would run against a DUT that is not connected. They fail and the worker is stopped
+        """
+        with self.lock:
+            if self.proc is proc:
+                self.proc = None
+                self.state.invalidate()
+            failed = list(pending.values())
+            pending.clear()
+        for job in failed:
+            job.finish(1, f"not connected: {error}")
+        proc.kill()
+
+    def _read_log(self, proc):
+        for line in proc.stderr:
+            logger.info(f"{self.name}: {line.rstrip()}")
+
+    def _timeout(self, job):
+        if not job.done():
+            logger.error(f"{self.name}: {job.name} timed out after {job.timeout} s, restarting the worker")
+            job.timed_out = True
+            job.finish(None, 'timeout')
+            # The worker runs one command at a time and a backend call can not be interrupted, so every command
+            # behind a hung one would hang too. Only a new worker (with a new connection) gets the DUT back, the
+            # jobs that are still pending fail when this one exits (see _read_replies)
+            self.close(kill=True)
+
+    def request(self, cmd, timeout=None, **args):
+        """ Send a command to the worker (started if needed) and return a Job for the reply """
+        job = WorkerJob(cmd, timeout)
+        with self.lock:
+            if self.proc is None:
+                self.proc = self._start_worker()
+                if self.ip and cmd != 'connect':
+                    # a job like any other, if it fails the commands after it fail too (see _not_connected)
+                    self._submit(WorkerJob('connect'), 'connect', {'ip': self.ip, 'config': self.config})
+            self._submit(job, cmd, args)
+        if timeout is not None:
+            timer = threading.Timer(timeout, self._timeout, args=(job,))
+            timer.daemon = True
+            timer.start()
+            job.add_done_callback(lambda job: timer.cancel())
+        return job
+
+    def _submit(self, job, cmd, args):
+        """ Register job for the reply and send its command. Called with self.lock held """
+        request_id = self._id()
+        self.pending[request_id] = job
+        try:
+            self._send({'id': request_id, 'cmd': cmd, 'args': args})
+        except OSError as e:
+            self.pending.pop(request_id, None)
+            job.finish(None, f"worker not running: {e}")
+
+    def _id(self):
+        self.next_id += 1
+        return self.next_id
+
+    def _send(self, message):
+        self.proc.stdin.write(json.dumps(message) + '\n')
+        self.proc.stdin.flush()
+
+    def close(self, kill=False):
+        with self.lock:
+            proc, self.proc = self.proc, None
+        self.state.invalidate()
+        if proc is None:
+            return
+        if kill:
+            proc.kill()
+            return
+        try:
+            proc.stdin.write(json.dumps({'id': None, 'cmd': 'shutdown'}) + '\n')
+            proc.stdin.close()
+            proc.wait(KILL_GRACE)
+        except (OSError, subprocess.TimeoutExpired):
+            proc.kill()
+
+    def connect(self):
+        """ (Re)connect the worker to self.ip """
+        return self.request('connect', ip=self.ip, config=self.config).result()
+
+    def load_fw(self, fw='MFG', timeout=None):
+        self.state.invalidate()
+        return self.state.invalidate_on_error(self.request('load_fw', timeout=timeout, fw=fw))
+
+    def tx_start(self, band, standard, rate, bw, core, country, channel, timeout=None):
+        params = self.state.delta(band=band, standard=standard, rate=rate, bw=bw, core=core, country=country, channel=channel)
+        logger.debug(f"{self.name}: tx_start sends {params or 'no changes'}")
+        return self.state.invalidate_on_error(self.request('tx_start', timeout=timeout, **params))
+
+    def tx_stop(self, timeout=None):
+        return self.request('tx_stop', timeout=timeout)
+
+    def rx_start(self, band, core, channel, packets=None, timeout=None):
+        self.state.invalidate()
+        return self.request('rx_start', timeout=timeout, band=band, core=core, channel=channel, packets=packets)
+
+    def rx_stop(self, timeout=None):
+        return self.request('rx_stop', timeout=timeout)
+
+    def rx_counters(self, timeout=None):
+        return self.request('rx_counters', timeout=timeout)
+
+    def fw_info(self, timeout=None):
+        return self.request('fw_info', timeout=timeout)
+
+    def tx_telemetry(self, timeout=None):
+        return self.request('tx_telemetry', timeout=timeout)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Long-lived DUT control worker. Spawning a python3 control script for every command pays interpreter
+start-up, imports and the DUT connection every time. The worker loads the chip control module once, keeps
+its connection to the DUT open and executes newline delimited json commands from stdin:
+
+    -> {"id": 1, "cmd": "tx_start", "args": {"band": "5GHz", ..., "channel": "42"}}
+    <- {"id": 1, "ok": true, "result": null}
+    <- {"id": 2, "ok": false, "error": "..."}
+
+stdout is reserved for the replies, anything the backend prints goes to stderr (the client logs it).
+The special commands are "ping" and "shutdown".
+
+The backend is a module in ./dut-control (default 'chip_control', it is chip specific and not supplied
+here) with the functions connect(ip, config), load_fw(fw), tx_start(...), tx_stop(), rx_start(...),
+rx_stop(), rx_counters() (see rx.py) and optionally fw_info() (a dict, see firmware.py) and tx_telemetry()
+(a dict, see telemetry.py). '--backend mock' uses MockDut, a fake DUT with configurable latencies, so the worker can be
+tried and benchmarked without hardware (see bench/bench_worker.py). WTT_MOCK_CONNECT sets its connect time.
+
+    python3 dut_worker.py --backend mock --ip 192.168.1.10
+"""
+
+import argparse
+import importlib
+import json
+import math
+import os
+import random
+import sys
+import time
+
+COMMANDS = ('connect', 'load_fw', 'tx_start', 'tx_stop', 'rx_start', 'rx_stop', 'rx_counters', 'fw_info', 'tx_telemetry')
+
+
+class MockDut:
+    """ Fake DUT. The latencies (seconds) mimic connection set-up and command round trips """
+
+    def __init__(self, connect_latency=0.2, command_latency=0.001, fw_latency=1.0, reprogram_latency=0.0,
+                 packet_rate=1000, per=0.01, rssi=-55.0):
+        self.connect_latency = connect_latency
+        self.command_latency = command_latency
+        self.fw_latency = fw_latency
+        self.reprogram_latency = reprogram_latency # per changed Tx parameter
+        self.packet_rate = packet_rate # received packets per second during Rx
+        self.per = per
+        self.rssi = rssi
+        self.random = random.Random(0)
+        self.good = self.bad = 0 # Rx packet counters
+        self.ip = None
+        self.fw = None
+        self.config = {}
+        self.tx = None
+        self.rx = None
+        self.booted = time.time()
+
+    def connect(self, ip=None, config=None):
+        time.sleep(self.connect_latency)
+        self.ip = ip
+
+    def load_fw(self, fw='MFG'):
+        time.sleep(self.fw_latency)
+        self.fw = fw
+        self.config = {}
+        self.tx = self.rx = None
+
+    def tx_start(self, **params):
+        # only the changed parameters are sent, the rest is kept from the last tx_start
+        time.sleep(self.command_latency + self.reprogram_latency * len(params))
+        self.config.update(params)
+        self.tx = dict(self.config)
+        self.tx_started = time.time()
+
+    def tx_stop(self):
+        time.sleep(self.command_latency)
+        self.tx = None
+
+    def rx_start(self, **params):
+        time.sleep(self.command_latency)
+        self.config = {}
+        self.rx = params
+        self.rx_started = time.time()
+        self.rx_counted = 0
+        self.good = self.bad = 0
+
+    def rx_stop(self):
+        time.sleep(self.command_latency)
+        self.rx = None
+
+    def rx_counters(self):
+        time.sleep(self.command_latency)
+        if self.rx is None:
+            return {'good': self.good, 'bad': self.bad, 'rssi': None}
+        # the packets since the last call, up to the requested number
+        wanted = int((time.time() - self.rx_started) * self.packet_rate)
+        if self.rx.get('packets'):
+            wanted = min(wanted, int(self.rx['packets']))
+        for _ in range(wanted - self.rx_counted):
+            if self.random.random() < self.per:
+                self.bad += 1
+            else:
+                self.good += 1
+        self.rx_counted = wanted
+        return {'good': self.good, 'bad': self.bad, 'rssi': round(self.random.gauss(self.rssi, 1.5), 1)}
+
+    def fw_info(self):
+        time.sleep(self.command_latency)
+        return {'fw': self.fw, 'uptime': time.time() - self.booted}
+
+    def tx_telemetry(self):
+        time.sleep(self.command_latency)
+        if self.tx is None:
+            return {'power': None, 'evm': None, 'temp': round(self.random.gauss(35.0, 0.2), 1)}
+        # the chip warms up towards 60 C while it transmits, the power drifts down a bit with it
+        heat = 1.0 - math.exp(-(time.time() - self.tx_started) / 120.0)
+        return {'power': round(self.random.gauss(18.0 - 0.5 * heat, 0.15), 2),
+                'evm': round(self.random.gauss(-35.0 + 2.0 * heat, 0.5), 2),
+                'temp': round(self.random.gauss(35.0 + 25.0 * heat, 0.2), 1)}
+
+
+def load_backend(name, control_dir, latency=None):
+    if name == 'mock':
+        mock = MockDut(connect_latency=float(os.environ.get('WTT_MOCK_CONNECT', 0.2)))
+        if latency is not None:
+            mock.command_latency = latency
+        return mock
+    sys.path.insert(0, control_dir)
+    return importlib.import_module(name)
+
+
+def serve(backend, requests, replies):
+    """ Execute requests (an iterable of json lines) and write the replies. Returns when stdin closes or on shutdown """
+    for line in requests:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+            cmd = request.get('cmd')
+        except (ValueError, AttributeError) as e:
+            replies.write(json.dumps({'id': None, 'ok': False, 'error': f"bad request: {e}"}) + '\n')
+            replies.flush()
+            continue
+
+        reply = {'id': request.get('id'), 'ok': True, 'result': None}
+        if cmd == 'shutdown':
+            replies.write(json.dumps(reply) + '\n')
+            replies.flush()
+            return
+        try:
+            if cmd == 'ping':
+                reply['result'] = 'pong'
+            elif cmd in COMMANDS:
+                reply['result'] = getattr(backend, cmd)(**(request.get('args') or {}))
+            else:
+                raise ValueError(f"unknown command {cmd!r}")
+            json.dumps(reply)  # the result must be json
+        except Exception as e:
+            reply = {'id': request.get('id'), 'ok': False, 'error': f"{type(e).__name__}: {e}"}
+        replies.write(json.dumps(reply) + '\n')
+        replies.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Persistent DUT control worker (json lines on stdin/stdout)')
+    parser.add_argument('--backend', default='chip_control', help="control module in the control dir, or 'mock'")
+    parser.add_argument('--control-dir', default='./dut-control')
+    parser.add_argument('--ip', help='connect to this DUT at start')
+    parser.add_argument('--config', help='control script config file')
+    parser.add_argument('--latency', type=float, help='mock backend command latency in seconds')
+    args = parser.parse_args(argv)
+
+    # the replies own stdout, prints from the backend go to stderr
+    replies = sys.stdout
+    sys.stdout = sys.stderr
+
+    backend = load_backend(args.backend, args.control_dir, args.latency)
+    if args.ip:
+        backend.connect(ip=args.ip, config=args.config)
+    serve(backend, sys.stdin, replies)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+A pool of DUTs keyed by IP, so a bench of identical boards can be driven from one session.
+
+Every DUT gets its own config file (a copy of ./dut-control/config.ini with its IP, in ./dut-control/duts)
+and its own control session (DutControl, or WorkerControl with a persistent worker). The control scripts get
+the path of their DUT's config in the WTT_DUT_CONFIG environment variable. With a single DUT the shared
+config.ini is updated as well, as before, for control scripts that do not know about WTT_DUT_CONFIG.
+
+Single actions fan out with run() (one Job per DUT). Longer sequences (firmware load + sweep) run per DUT on
+a bounded thread pool with map(), an exception on one DUT never stops the others.
+"""
+
+import logging
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import dut
+import firmware
+from dut import CONFIG, CONTROL_DIR, CommandExecutor, DutControl, WorkerControl
+
+logger = logging.getLogger('wltrx-gui')
+
+DUT_CONFIG_DIR = './dut-control/duts'
+
+
+def parse_ips(text):
+    """ '10.0.0.1, 10.0.0.2 10.0.0.3' --> ['10.0.0.1', '10.0.0.2', '10.0.0.3'] (duplicates removed) """
+    return list(dict.fromkeys(ip for ip in text.replace(',', ' ').split()))
+
+
+class DutPool:
+
+    def __init__(self, max_workers=8, worker=None, config=CONFIG, config_dir=DUT_CONFIG_DIR, control_dir=CONTROL_DIR):
+        """ worker: None to call the control scripts, or the backend name for persistent workers (see dut_worker.py) """
+        self.max_workers = max_workers
+        self.worker = worker
+        self.config = config
+        self.config_dir = config_dir
+        self.control_dir = control_dir
+        self.duts = {}
+        self.executor = CommandExecutor(max_workers)  # control script calls, shared by all DUTs
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='dut-pool')
+
+    def __len__(self):
+        return len(self.duts)
+
+    def __iter__(self):
+        return iter(self.duts.values())
+
+    def __getitem__(self, ip):
+        return self.duts[ip]
+
+    def ips(self):
+        return list(self.duts)
+
+    def config_path(self, ip):
+        return os.path.join(self.config_dir, f"{ip}.ini")
+
+    def add(self, ip):
+        if ip in self.duts:
+            return self.duts[ip]
+        config = self.config_path(ip)
+        os.makedirs(self.config_dir, exist_ok=True)
+        shutil.copyfile(self.config, config)
+        dut.set_ip(ip, config)
+        if self.worker:
+            control = WorkerControl(ip, backend=self.worker, control_dir=self.control_dir, config=config)
+        else:
+            control = DutControl(ip, control_dir=self.control_dir, config=config, executor=self.executor)
+        self.duts[ip] = control
+        return control
+
+    def remove(self, ip, wait=False):
+        """
+        Remove a DUT. Closing a worker can take up to dut.KILL_GRACE seconds, it is done on a background thread
+        unless wait, so that the GUI does not hang when the DUT list changes
+        """
+        control = self.duts.pop(ip)
+        if not isinstance(control, WorkerControl):
+            return
+        if wait:
+            control.close()
+        else:
+            threading.Thread(target=control.close, name=f"close {ip}", daemon=True).start()
+
+    def set_ips(self, ips):
+        """ Make the pool contain exactly these DUTs, keeping the sessions of the ones that are already there """
+        for ip in [ip for ip in self.duts if ip not in ips]:
+            self.remove(ip)
+        for ip in ips:
+            self.add(ip)
+        if len(ips) == 1:
+            dut.set_ip(ips[0], self.config)
+
+    def run(self, action, *args, **kwargs):
+        """ Start the same action on all DUTs, e.g. run('tx_stop'). Returns {ip: Job} """
+        return {ip: getattr(control, action)(*args, **kwargs) for ip, control in self.duts.items()}
+
+    def ensure_fw(self, fw, force=False, timeout=None):
+        """ Load fw on the DUTs that do not run it already (see firmware.py). Returns {ip: Job} """
+        return {ip: firmware.ensure_fw(control, fw, force=force, timeout=timeout) for ip, control in self.duts.items()}
+
+    def map(self, fn, ips=None):
+        """ Run fn(control) for every DUT on the pool threads. Returns {ip: Future}, failures stay in their future """
+        ips = self.ips() if ips is None else ips
+
+        def call(ip):
+            try:
+                return fn(self.duts[ip])
+            except Exception:
+                logger.exception(f"{ip}: failed")
+                raise
+
+        return {ip: self.pool.submit(call, ip) for ip in ips}
+
+    def close(self):
+        for ip in list(self.duts):
+            self.remove(ip, wait=True)
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.executor.shutdown()
@@ -0,0 +1,242 @@
+"""
+Firmware state per DUT, so that 'Load FW' is skipped when the DUT already runs the selected firmware.
+
+Every successful load is recorded in ./cache/firmware.json: {ip: {fw, checksum, loaded_at}}, with the
+firmware type (MFG/STD), the sha256 of the image that was loaded (if the image is found in FW_IMAGES) and
+the wall clock time of the load. The DUT without an IP (the control scripts' default) is recorded as LOCAL.
+A skipped load is recorded too, the first time the probe shows that the DUT runs the image.
+
+Before a load the DUT is probed. The probe is the 'fw_info' action: the fw_info.py control script (or the
+fw_info() function of a worker backend) prints a json object as its last output line, with any of
+
+    {"fw": "MFG", "checksum": "<sha256 of the running image>", "uptime": 1234.5}
+
+The load is skipped when the probe shows that the selected image runs. If the probe does not report the
+image, the record of the last load is used, as long as the uptime shows that the DUT has not rebooted since.
+A DUT without a probe, or a probe that fails, is always loaded. force=True always loads.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future
+
+from dut import CommandResult, DutError, Job
+
+logger = logging.getLogger('wltrx-gui')
+
+FW_STATE = './cache/firmware.json'
+LOCAL = 'local' # the key of the DUT without an IP
+
+# the firmware images, only used for their checksum. Change it if the images of a chip are elsewhere
+FW_IMAGES = {
+    'MFG': './dut-control/fw/mfg.bin',
+    'STD': './dut-control/fw/std.bin',
+}
+
+PROBE_TIMEOUT = 30 # seconds
+
+# seconds between the recorded load time and the boot time from the DUT uptime that do not count as a reboot
+REBOOT_SLACK = 5
+
+FirmwareRecord = namedtuple('FirmwareRecord', ['fw', 'checksum', 'loaded_at'])
+
+_checksums = {}
+
+
+def image_checksum(fw, images=FW_IMAGES):
+    """ sha256 of the image for this firmware type, None if it is not found. Cached on mtime and size """
+    path = images.get(fw)
+    try:
+        st = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    key = (path, st.st_mtime_ns, st.st_size)
+    if key not in _checksums:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        _checksums[key] = digest.hexdigest()
+    return _checksums[key]
+
+
+def parse_probe(output):
+    """ The last line of the probe output that is a json object, None if there is none """
+    for line in reversed(output.splitlines()):
+        line = line.strip()
+        if line.startswith('{'):
+            try:
+                return json.loads(line)
+            except ValueError:
+                continue
+    return None
+
+
+def needs_load(fw, checksum, record, probe, now=None):
+    """ Why the firmware has to be loaded, None if the DUT already runs it """
+    if probe is None:
+        return "the DUT could not be probed"
+    running = probe.get('fw')
+    if running is not None and running != fw:
+        return f"the DUT runs {running}"
+    if checksum and probe.get('checksum'):
+        return None if probe['checksum'] == checksum else "the DUT runs another image"
+    if running == fw and not checksum:
+        return None # there is no image to compare with, the type is all that can be checked
+
+    # the probe can not tell which image runs, go by the last load
+    if record is None:
+        return "no earlier load is recorded"
+    if record.fw != fw:
+        return f"{record.fw} was loaded last"
+    if checksum and record.checksum != checksum:
+        return "the image has changed since the last load"
+    uptime = probe.get('uptime')
+    if uptime is None:
+        return "the DUT does not report its uptime"
+    now = time.time() if now is None else now
+    if now - float(uptime) > record.loaded_at + REBOOT_SLACK:
+        return "the DUT has rebooted since the last load"
+    return None
+
+
+class FirmwareCache:
+    """ The firmware records, saved to a json file after every change """
+
+    def __init__(self, path=FW_STATE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.records = {}
+        try:
+            with open(path) as f:
+                self.records = {ip: FirmwareRecord(**record) for ip, record in json.load(f).items()}
+        except FileNotFoundError:
+            pass
+        except (ValueError, TypeError, AttributeError) as e:
+            logger.warning(f"ignoring the firmware records in {path}: {e}")
+
+    def get(self, ip):
+        with self.lock:
+            return self.records.get(ip or LOCAL)
+
+    def set(self, ip, record):
+        with self.lock:
+            self.records[ip or LOCAL] = record
+            self._save()
+
+    def forget(self, ip):
+        with self.lock:
+            if self.records.pop(ip or LOCAL, None) is not None:
+                self._save()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({ip: record._asdict() for ip, record in self.records.items()}, f, indent=1)
+        os.replace(tmp, self.path)
+
+
+_cache = None
+
+
+def default_cache():
+    global _cache
+    if _cache is None:
+        _cache = FirmwareCache()
+    return _cache
+
+
+class FirmwareJob(Job):
+    """ Probe, then load if needed. Behaves like the Job of a plain load, skipped tells if the load was skipped """
+
+    def __init__(self, name, timeout=None):
+        super().__init__([name], timeout, name)
+        self.future = Future()
+        self.start = time.monotonic()
+        self.step = None # the probe or load job that runs now
+        self.skipped = False
+        self.reason = None
+
+    def cancel(self):
+        with self.lock:
+            self.cancelled = True
+            step = self.step
+        if step:
+            step.cancel()
+        self.finish(None, 'cancelled')
+
+    def run(self, start):
+        """ Start the next step (start() returns its job), unless the job was cancelled """
+        with self.lock:
+            if self.cancelled:
+                return None
+            self.step = start()
+            return self.step
+
+    def finish(self, returncode, output):
+        if not self.future.done():
+            self.future.set_result(CommandResult(returncode, output, time.monotonic() - self.start))
+
+
+def ensure_fw(control, fw, force=False, timeout=None, cache=None, images=FW_IMAGES):
+    """ Load fw on the DUT unless it already runs it. Returns a Job, like control.load_fw() """
+    cache = cache or default_cache()
+    name = f"{control.ip} load {fw}" if control.ip else f"load {fw}"
+    job = FirmwareJob(name, timeout)
+    checksum = image_checksum(fw, images)
+
+    def load(reason):
+        logger.info(f"{name}: {reason}")
+        job.reason = reason
+        cache.forget(control.ip)
+        try:
+            loading = job.run(lambda: control.load_fw(fw, timeout=timeout))
+        except DutError as e:
+            logger.error(f"{name}: {e}")
+            job.finish(1, str(e))
+            return
+        if loading:
+            loading.add_done_callback(loaded)
+
+    def loaded(loading):
+        result = loading.result()
+        if result.returncode == 0:
+            cache.set(control.ip, FirmwareRecord(fw, checksum, time.time()))
+        job.finish(result.returncode, result.output)
+
+    def probed(probing):
+        try:
+            result = probing.result()
+            probe = parse_probe(result.output) if result.returncode == 0 else None
+            reason = needs_load(fw, checksum, cache.get(control.ip), probe)
+        except Exception as e:
+            logger.exception(f"{name}: probe failed")
+            reason = f"the probe failed: {e}"
+        if reason:
+            load(reason)
+        else:
+            logger.info(f"{name}: already running, load skipped")
+            # keep the load time of a record that is still right, it tells when the DUT was loaded
+            record = cache.get(control.ip)
+            if record is None or (record.fw, record.checksum) != (fw, checksum):
+                cache.set(control.ip, FirmwareRecord(fw, checksum, time.time()))
+            job.skipped = True
+            job.reason = 'already running'
+            job.finish(0, 'already running')
+
+    if force:
+        load("forced reload")
+        return job
+    try:
+        probing = job.run(lambda: control.fw_info(timeout=PROBE_TIMEOUT))
+    except DutError as e:
+        load(str(e))
+        return job
+    probing.add_done_callback(probed)
+    return job
@@ -0,0 +1,51 @@
+"""
+Icon cache: the .ico files in ./assets are decoded and scaled once and kept as small PNG files in ./cache/icons,
+so a start only reads a few tiny PNGs instead of decoding every .ico (several sizes each) with PIL.
+
+A cached file is named <icon>-<w>x<h>-<key>.png, the key is made of the path, mtime and size of the source
+file: a changed asset gets a new cache file and the old one is removed.
+
+    image = icons.load('./assets/settings.ico', (20, 20), scale=2) # a 40x40 PIL image
+"""
+
+import glob
+import hashlib
+import os
+
+from PIL import Image
+
+ICON_CACHE = './cache/icons'
+
+# {(path, size): PIL image}, icons used by several widgets are read once
+_loaded = {}
+
+
+def cache_path(path, size, cache_dir=ICON_CACHE):
+    stat = os.stat(path)
+    key = hashlib.sha1(f"{os.path.abspath(path)}:{stat.st_mtime_ns}:{stat.st_size}".encode()).hexdigest()[:12]
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, f"{name}-{size[0]}x{size[1]}-{key}.png")
+
+
+def load(path, size, scale=1.0, cache_dir=ICON_CACHE):
+    """ The icon as a PIL image of size * scale pixels (scale: the display scaling, so it stays sharp) """
+    pixels = (round(size[0] * scale), round(size[1] * scale))
+    if (path, pixels) in _loaded:
+        return _loaded[(path, pixels)]
+    cached = cache_path(path, pixels, cache_dir)
+    try:
+        image = Image.open(cached)
+        image.load()
+    except OSError:
+        image = Image.open(path).convert('RGBA').resize(pixels, Image.LANCZOS)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            name = os.path.basename(cached).rsplit('-', 1)[0]
+            for old in glob.glob(os.path.join(glob.escape(cache_dir), f"{glob.escape(name)}-*.png")):
+                os.remove(old)
+            image.save(cached + '.tmp', 'PNG')
+            os.replace(cached + '.tmp', cached)
+        except OSError:
+            pass # no cache, the icon is decoded again next time
+    _loaded[(path, pixels)] = image
+    return image
@@ -0,0 +1,99 @@
+"""
+Sweep journal, so a sweep that dies halfway (DUT hang, laptop sleep, crash) can be resumed.
+
+Every sweep writes ./results/journals/<run>.jsonl, an append-only file of json lines:
+
+    {"type": "plan", "run": ..., "steps": [...], "fw": ..., "ips": [...], "worker": ..., ...}
+    {"type": "step", "index": 12, "step": {...}, "ip": ..., "status": "ok", "error": null, "elapsed": 1.02, "time": ...}
+    ...
+    {"type": "done", "aborted": false}
+
+The plan line holds the (ordered) steps and the settings of the sweep, a step line is written when a step is
+done. Every line is flushed and fsync'ed before the sweep goes on, so a line that is in the journal survives a
+crash or power loss. One write + fsync per step (a few ms at most) is nothing next to a DUT step. A line
+that was cut off by a crash is ignored when the journal is read.
+
+'sweep.py --resume [RUN]' runs the steps of a journal that have no step line, with the same run id and
+settings. The DUT is set up again through the control layer: the firmware is checked (and loaded if needed,
+see firmware.py) and the first Tx step sends all parameters (see DutState in dut.py). Results of journaled
+steps that had not reached the results store yet (it writes in batches) are added from the journal.
+"""
+
+import glob
+import json
+import os
+import threading
+import time
+
+JOURNAL_DIR = './results/journals'
+
+
+def journal_path(run, journal_dir=JOURNAL_DIR):
+    return os.path.join(journal_dir, f"{run}.jsonl")
+
+
+def read(path):
+    """ Returns (plan, {index: step line}, done line or None) """
+    plan, steps, done = None, {}, None
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue # cut off by a crash
+            if record.get('type') == 'plan':
+                plan = record
+            elif record.get('type') == 'step':
+                steps[record['index']] = record
+            elif record.get('type') == 'done':
+                done = record
+    if plan is None:
+        raise ValueError(f"{path}: no plan in the journal")
+    return plan, steps, done
+
+
+def latest(journal_dir=JOURNAL_DIR):
+    """ The newest journal of a sweep that did not finish, None if there is none """
+    for path in sorted(glob.glob(os.path.join(journal_dir, '*.jsonl')), key=os.path.getmtime, reverse=True):
+        try:
+            plan, steps, done = read(path)
+        except (OSError, ValueError):
+            continue
+        if done is None or done.get('aborted'):
+            return path
+    return None
+
+
+class Journal:
+
+    def __init__(self, path, plan=None):
+        """ A new journal with the plan (dict with 'run', 'steps' and the settings), or plan=None to append to one """
+        self.path = path
+        self.lock = threading.Lock() # steps are done by one thread per DUT in a pool sweep
+        if plan is not None:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            self.file = open(path, 'x')
+            self._write({'type': 'plan', **plan})
+            # make the new file itself survive a crash, not only its content
+            fd = os.open(os.path.dirname(path) or '.', os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        else:
+            self.file = open(path, 'a')
+
+    def _write(self, record):
+        self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def step(self, index, step, status, error=None, elapsed=None, ip=None):
+        with self.lock:
+            self._write({'type': 'step', 'index': index, 'step': step, 'ip': ip, 'status': status, 'error': error,
+                         'elapsed': None if elapsed is None else round(elapsed, 3), 'time': time.time()})
+
+    def close(self, aborted):
+        with self.lock:
+            self._write({'type': 'done', 'aborted': aborted})
+            self.file.close()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Link test: one DUT transmits, one or more other DUTs receive a fixed number of packets (conducted
+sensitivity and PER tests).
+
+A LinkTest is a small asyncio scheduler over the DUT Jobs (see dut.py):
+
+    1. arm: rx_start on all receivers at the same time, each within arm_timeout
+    2. tx_start on the transmitter. It must be confirmed within max_skew seconds after the last receiver
+       was armed, otherwise the test fails: a receiver that waits too long can time out or count noise
+    3. collect: the Rx counters of all receivers are followed concurrently (one RxMonitor each, see rx.py)
+       until every receiver has its packets
+    4. tx_stop and rx_stop on all DUTs at the same time, also after a failure, timeout or cancel
+
+The whole test has a deadline. The control script calls of the DUTs overlap instead of running one after
+the other, so the test takes as long as its slowest DUT.
+
+    python3 linktest.py --tx-ip 192.168.1.10 --rx-ip 192.168.1.11 --tx "band=5GHz bw=80MHz rate=MCS9" --packets 1000
+    python3 linktest.py --worker mock --tx "band=2.4GHz standard=11b rate=1Mbps" --packets 500
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import threading
+import time
+from collections import namedtuple
+
+import definition
+import results
+import rx
+import sweep
+from definition import LEVELS
+from dut import DutControl, WorkerControl
+
+logger = logging.getLogger('wltrx-gui')
+
+ARM_TIMEOUT = 30 # seconds for rx_start
+MAX_SKEW = 2.0 # seconds from the last receiver armed to the Tx confirmed
+STOP_TIMEOUT = 10 # seconds for tx_stop / rx_stop
+
+# status: 'ok', 'failed', 'timeout' or 'cancelled'. stats: {ip: RxStats}. skew: seconds, None if Tx never started
+LinkResult = namedtuple('LinkResult', ['status', 'error', 'stats', 'skew', 'elapsed'])
+
+
+async def result_of(job):
+    """ Wait for a Job without blocking the event loop """
+    return await asyncio.wrap_future(job.future)
+
+
+class LinkTest:
+
+    def __init__(self, tx, receivers, params, packets, rx_core=None, max_skew=MAX_SKEW, arm_timeout=ARM_TIMEOUT,
+                 deadline=None, interval=None):
+        """
+        tx, receivers: the DUT controls (DutControl or WorkerControl). params: the Tx combination {level: value}.
+        rx_core: the receiver core, the Tx core if not given. deadline: seconds for the whole test
+        interval: the counter poll interval, see rx.poll_interval()
+        """
+        self.tx = tx
+        self.receivers = list(receivers)
+        self.params = params
+        self.packets = packets
+        self.rx_core = rx_core or params['core']
+        self.max_skew = max_skew
+        self.arm_timeout = arm_timeout
+        self.deadline = deadline
+        self.interval = interval
+        self.monitors = {} # {ip: RxMonitor}, filled when the receivers are armed
+        self.skew = None
+        self.loop = None
+        self.task = None
+        self.cancelled = threading.Event() # cancel() before run() got its task
+
+    def stats(self):
+        return {ip: monitor.stats() for ip, monitor in self.monitors.items()}
+
+    async def run(self):
+        """ Run the test and return a LinkResult. Never raises for DUT failures """
+        self.loop = asyncio.get_running_loop()
+        self.task = asyncio.current_task()
+        start = time.monotonic()
+        status, error = 'ok', None
+        try:
+            if self.cancelled.is_set(): # cancel() came before the task was set
+                raise asyncio.CancelledError
+            error = await asyncio.wait_for(self._run(), self.deadline)
+            if error:
+                status = 'failed'
+        except asyncio.TimeoutError:
+            status, error = 'timeout', f"not done within the deadline of {self.deadline} s"
+        except asyncio.CancelledError:
+            status, error = 'cancelled', None
+        finally:
+            await self._stop()
+        return LinkResult(status, error, self.stats(), self.skew, time.monotonic() - start)
+
+    def run_sync(self):
+        return asyncio.run(self.run())
+
+    def cancel(self):
+        """ Stop the test from any thread, also before run() has started """
+        self.cancelled.set()
+        if self.loop and self.task:
+            self.loop.call_soon_threadsafe(self.task.cancel)
+
+    async def _run(self):
+        """ Returns an error string, None if the test passed """
+        band, channel = self.params['band'], self.params['channel']
+
+        # 1. arm all receivers concurrently
+        arming = {control.ip: control.rx_start(band, self.rx_core, channel, packets=self.packets, timeout=self.arm_timeout)
+                  for control in self.receivers}
+        armed = await asyncio.gather(*(result_of(job) for job in arming.values()))
+        failed = [ip for ip, result in zip(arming, armed) if result.returncode != 0]
+        if failed:
+            return f"rx_start failed on {', '.join(str(ip) for ip in failed)}"
+        armed = time.monotonic()
+        for control in self.receivers:
+            self.monitors[control.ip] = rx.RxMonitor(control, packets=self.packets, interval=self.interval).start()
+
+        # 2. start Tx within the skew bound
+        job = self.tx.tx_start(*(self.params[level] for level in LEVELS), timeout=self.arm_timeout)
+        try:
+            result = await asyncio.wait_for(asyncio.shield(result_of(job)), max(0.0, self.max_skew - (time.monotonic() - armed)))
+        except asyncio.TimeoutError:
+            job.cancel()
+            return f"tx_start was not confirmed within {self.max_skew} s of the receivers being armed"
+        self.skew = time.monotonic() - armed
+        if result.returncode != 0:
+            return "tx_start failed"
+        logger.debug(f"link test: Tx started {self.skew * 1000:.0f} ms after the receivers were armed")
+
+        # 3. follow all receivers until they have their packets
+        await asyncio.gather(*(self.loop.run_in_executor(None, monitor.wait) for monitor in self.monitors.values()))
+        errors = [f"{ip}: {monitor.error}" for ip, monitor in self.monitors.items() if monitor.error]
+        short = [ip for ip, monitor in self.monitors.items() if monitor.stats().packets < self.packets]
+        if errors:
+            return '; '.join(errors)
+        if short:
+            return f"not all packets received on {', '.join(str(ip) for ip in short)}"
+        return None
+
+    async def _stop(self):
+        """ Stop both ends concurrently. Stopping an idle DUT is harmless """
+        for monitor in self.monitors.values():
+            monitor.stop()
+        jobs = [self.tx.tx_stop(timeout=STOP_TIMEOUT)] + [control.rx_stop(timeout=STOP_TIMEOUT) for control in self.receivers]
+        stopped = await asyncio.gather(*(result_of(job) for job in jobs), return_exceptions=True)
+        for job, result in zip(jobs, stopped):
+            if isinstance(result, Exception) or result.returncode != 0:
+                logger.warning(f"link test: {job.name} failed")
+
+
+def store_result(store, test, result, run=None, fw=None):
+    """ One row per receiver in the results store (mode 'link', dut is the receiver) """
+    for ip, stats in result.stats.items():
+        store.add(run=run, dut=ip, fw=fw, mode='link', **test.params, status=result.status, error=result.error,
+                  elapsed=result.elapsed, packets=stats.packets, per=stats.per, rssi=stats.rssi_mean)
+    if not result.stats:
+        store.add(run=run, dut=test.tx.ip, fw=fw, mode='link', **test.params, status=result.status,
+                  error=result.error, elapsed=result.elapsed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Tx/Rx link test between two DUTs')
+    parser.add_argument('--tx-ip', help='IP of the transmitting DUT')
+    parser.add_argument('--rx-ip', help='IP of the receiving DUT, or a comma separated list')
+    parser.add_argument('--tx', metavar='FILTER', required=True, help="Tx combinations e.g. 'band=5GHz bw=80MHz rate=MCS9'")
+    parser.add_argument('--rx-core', help='receiver core (default: the Tx core)')
+    parser.add_argument('--packets', type=int, default=1000, help='packets to receive per combination (default 1000)')
+    parser.add_argument('--max-skew', type=float, default=MAX_SKEW, help=f'max seconds between Rx armed and Tx started (default {MAX_SKEW})')
+    parser.add_argument('--deadline', type=float, default=60, help='max seconds per combination (default 60)')
+    parser.add_argument('--worker', metavar='BACKEND', help="use persistent dut_worker.py processes with this backend ('mock' for fake DUTs)")
+    parser.add_argument('--definition', default='system-definition.json', help='system definition file')
+    parser.add_argument('--results', metavar='FILE', default=results.RESULTS_DB, help=f'results database (default {results.RESULTS_DB})')
+    parser.add_argument('--no-results', action='store_true', help='do not store the results')
+    parser.add_argument('--jsonl', metavar='FILE', help="write progress as json lines to FILE ('-' for stdout)")
+    parser.add_argument('-v', '--verbose', action='store_true', help='log the control script calls and output')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(format='%(asctime)-s - %(levelname)-8s - %(message)-s', stream=sys.stderr)
+    logger.setLevel(logging.DEBUG if args.verbose else logging.WARNING)
+
+    data = definition.load(args.definition)
+    try:
+        steps = list(sweep.tx_steps(data, args.tx, 0))
+    except (ValueError, KeyError) as e:
+        parser.error(str(e))
+
+    def control(ip):
+        return WorkerControl(ip, backend=args.worker) if args.worker else DutControl(ip)
+
+    tx = control(args.tx_ip)
+    receivers = [control(ip) for ip in sweep.parse_ips(args.rx_ip or '')] or [control(None)]
+    reporter = sweep.Reporter(args.jsonl)
+    store = None if args.no_results else results.ResultStore(args.results)
+    run = results.run_id()
+    failures = 0
+    try:
+        reporter.event('start', steps=len(steps), tx=args.tx_ip, rx=[c.ip for c in receivers])
+        for index, step in enumerate(steps):
+            params = {level: step[level] for level in LEVELS}
+            test = LinkTest(tx, receivers, params, args.packets, rx_core=args.rx_core, max_skew=args.max_skew,
+                            deadline=args.deadline)
+            result = test.run_sync()
+            failures += result.status != 'ok'
+            if store:
+                store_result(store, test, result, run)
+            reporter.event('step', index=index, total=len(steps), step=dict(mode='link', **params, packets=args.packets),
+                           status=result.status, error=result.error, elapsed=round(result.elapsed, 3),
+                           skew=None if result.skew is None else round(result.skew, 3),
+                           stats={ip: stats._asdict() for ip, stats in result.stats.items()})
+        reporter.event('done', failed=failures)
+    except KeyboardInterrupt:
+        reporter.event('done', aborted=True, failed=failures)
+        return 1
+    finally:
+        if store:
+            store.close()
+        reporter.close()
+        for c in [tx, *receivers]:
+            if isinstance(c, WorkerControl):
+                c.close()
+    return 0 if failures == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+Log files, written from a background thread.
+
+start() puts a QueueHandler on the logger: a log call only queues the record, a QueueListener thread formats
+it and writes it to the files, so a slow disk never blocks the Tk thread or a sweep. Two files can be written:
+
+    ./logs/log.txt      the text log, same lines as the debug window
+    ./logs/log.jsonl    optional, one compact json object per record with the structured fields
+
+    {"time":1718109005.123,"level":"DEBUG","thread":"dut_0","msg":"...","dut":"192.168.1.10",
+     "combination":{"band":"5GHz",...,"channel":"42"},"elapsed":1.021}
+
+The structured fields are passed with extra=fields(...) in the log call, e.g. for every sweep step.
+
+Every session starts a new file. A file is also rotated when it reaches MAX_BYTES or is ROTATE_INTERVAL old,
+the old files are renamed to <file>.<YYYYmmdd-HHMMSS> and the BACKUP_COUNT newest are kept, so an overnight
+sweep keeps its full history without filling the disk.
+"""
+
+import atexit
+import glob
+import json
+import logging
+import os
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from definition import LEVELS
+
+LOG_FILE = './logs/log.txt'
+FORMAT = '%(asctime)-s - %(levelname)-8s - %(message)-s'
+MAX_BYTES = 20 * 1024 * 1024 # per file
+ROTATE_INTERVAL = 24 * 3600 # seconds
+BACKUP_COUNT = 20 # rotated files kept per log
+
+# the structured fields of the json lines log, see fields()
+FIELDS = ('dut', 'combination', 'elapsed')
+
+
+def fields(dut=None, step=None, elapsed=None):
+    """ extra= for a log call: the DUT, the combination of a step (dict) and the step time in seconds """
+    combination = {level: step[level] for level in LEVELS if level in step} if step else None
+    return {'dut': dut, 'combination': combination, 'elapsed': None if elapsed is None else round(elapsed, 3)}
+
+
+def rotated(path=LOG_FILE):
+    """ The rotated files of a log, oldest first """
+    return sorted(glob.glob(glob.escape(path) + '.*'), key=os.path.getmtime)
+
+
+class RotatingHandler(RotatingFileHandler):
+    """ A file handler that rotates on size (max_bytes) and on age (interval seconds) """
+
+    def __init__(self, path, max_bytes=MAX_BYTES, interval=ROTATE_INTERVAL, backup_count=BACKUP_COUNT):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        super().__init__(path, 'a', max_bytes, backup_count, encoding='utf-8')
+        self.interval = interval
+        self.rollover_at = time.time() + interval
+
+    def shouldRollover(self, record):
+        return time.time() >= self.rollover_at or super().shouldRollover(record)
+
+    def doRollover(self):
+        """ Rename the file to <file>.<time> (if it is not empty) and start a new one """
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        if os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0:
+            name = f"{self.baseFilename}.{time.strftime('%Y%m%d-%H%M%S')}"
+            count = 1
+            while os.path.exists(name):
+                name = f"{self.baseFilename}.{time.strftime('%Y%m%d-%H%M%S')}-{count}"
+                count += 1
+            try:
+                os.replace(self.baseFilename, name)
+            except OSError: # on Windows while the log viewer has the file open, rotate at the next interval
+                pass
+            else:
+                for old in rotated(self.baseFilename)[:-self.backupCount or None]:
+                    os.remove(old)
+        self.stream = self._open()
+        self.rollover_at = time.time() + self.interval
+
+
+class JsonFormatter(logging.Formatter):
+    """ One compact json object per record, with the FIELDS that were given """
+
+    def format(self, record):
+        line = {'time': round(record.created, 3), 'level': record.levelname, 'thread': record.threadName,
+                'msg': record.getMessage()}
+        for field in FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                line[field] = value
+        return json.dumps(line, separators=(',', ':'), default=str)
+
+
+def start(logger, path=LOG_FILE, jsonl=None, level=logging.DEBUG, new_file=True):
+    """
+    Log the records of logger to path (text) and jsonl (json lines, None for no json log) from a background
+    thread. new_file: rotate the existing files first, so this session starts with empty files.
+    Returns the QueueListener, it is stopped (and the queue written out) at exit
+    """
+    handlers = []
+    for file, formatter in ((path, logging.Formatter(FORMAT)), (jsonl, JsonFormatter())):
+        if not file:
+            continue
+        handler = RotatingHandler(file)
+        if new_file:
+            handler.doRollover()
+        handler.setFormatter(formatter)
+        handlers.append(handler)
+
+    records = queue.SimpleQueue()
+    listener = QueueListener(records, *handlers)
+    queue_handler = QueueHandler(records)
+    queue_handler.setLevel(level)
+    logger.addHandler(queue_handler)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,173 @@
+"""
+Log file viewer core, used by the "Log files" tab of the debug window.
+
+A LogFile memory maps a (text) log file, see logfile.py, and indexes it: the offset of every newline and the
+level of every line. The index is built with numpy over the mapped bytes in CHUNK pieces and only for the new
+part when the file grows, so a log of a few hundred MB opens in a fraction of a second and a live log can be
+followed. The viewer then only reads (and decodes) the lines it shows.
+
+A line without a level (a traceback, a multi-line message) gets the level of the line before it. Search runs
+a regex over the mapped bytes, in CHUNK pieces so that it can be stopped, and returns the line numbers.
+
+    log = LogFile('./logs/log.txt')
+    log.refresh()
+    rows = log.rows({'WARNING', 'ERROR', 'CRITICAL'})
+    log.lines(rows[-20:])
+    log.search('timed out', rows)
+"""
+
+import mmap
+import os
+import re
+
+import numpy as np
+
+CHUNK = 16 * 1024 * 1024 # bytes per indexing / search step
+MAX_MATCHES = 100000 # lines returned by a search
+REGEX_CHARS = set('.^$*+?{}[]\\|()') # a search pattern without these is plain text
+
+# '2024-06-11 14:30:05,123 - WARNING  - ...': the level starts at this offset, see logfile.FORMAT
+LEVEL_OFFSET = 26
+LEVEL_NAMES = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+# a level is stored as the code of its first letter, 0 for unknown
+LEVEL_CODES = {name: ord(name[0]) for name in LEVEL_NAMES}
+_CODE_NAMES = {code: name for name, code in LEVEL_CODES.items()}
+
+
+class LogFile:
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.mm = None
+        # (bytes, newline offsets, level codes), replaced as a whole so another thread always sees a consistent index
+        self.view = (np.zeros(0, np.uint8), np.zeros(0, np.int64), np.zeros(0, np.uint8))
+
+    @property
+    def count(self):
+        """ The number of (complete) lines """
+        return len(self.view[1])
+
+    @property
+    def size(self):
+        return len(self.view[0])
+
+    def replaced(self):
+        """ True if the path is now another file (the log was rotated) """
+        try:
+            return os.stat(self.path).st_ino != os.fstat(self.file.fileno()).st_ino
+        except OSError:
+            return False
+
+    def refresh(self):
+        """ Index the lines added since the last refresh, returns the number of new lines """
+        size = os.fstat(self.file.fileno()).st_size
+        buf, newlines, levels = self.view
+        if size <= len(buf):
+            return 0
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = np.frombuffer(self.mm, np.uint8)
+
+        start = int(newlines[-1]) + 1 if len(newlines) else 0
+        last = int(levels[-1]) if len(levels) else 0
+        new_newlines, new_levels = [], []
+        for pos in range(start, len(buf), CHUNK):
+            found = np.flatnonzero(buf[pos:pos + CHUNK] == 10) + pos
+            if not len(found):
+                continue
+            codes = self._levels(buf, found, start)
+            if codes[0] == 0:
+                codes[0] = last
+            # lines without a level get the level of the line before
+            known = np.where(codes != 0, np.arange(len(codes)), 0)
+            np.maximum.accumulate(known, out=known)
+            codes = codes[known]
+            new_newlines.append(found)
+            new_levels.append(codes)
+            start, last = int(found[-1]) + 1, int(codes[-1])
+
+        self.view = (buf, np.concatenate([newlines, *new_newlines]), np.concatenate([levels, *new_levels]))
+        return sum(len(found) for found in new_newlines)
+
+    @staticmethod
+    def _levels(buf, ends, first):
+        """ The level codes of the lines that end at ends, the first one starts at first """
+        starts = np.empty_like(ends)
+        starts[0] = first
+        starts[1:] = ends[:-1] + 1
+        long = np.flatnonzero(ends - starts > LEVEL_OFFSET + 4)
+        codes = np.zeros(len(ends), np.uint8)
+        letters = buf[starts[long] + LEVEL_OFFSET]
+        ok = (buf[starts[long] + LEVEL_OFFSET - 2] == ord('-')) & np.isin(letters, list(LEVEL_CODES.values()))
+        codes[long[ok]] = letters[ok]
+        return codes
+
+    def rows(self, levels=None):
+        """ The line numbers with one of the levels (names), all lines if None. Lines of unknown level are included """
+        codes = self.view[2]
+        if levels is None:
+            return np.arange(len(codes))
+        wanted = [0] + [LEVEL_CODES[level] for level in levels]
+        return np.flatnonzero(np.isin(codes, wanted))
+
+    def level(self, row):
+        """ The level name of a line, '' if unknown """
+        return _CODE_NAMES.get(int(self.view[2][row]), '')
+
+    def span(self, row):
+        newlines = self.view[1]
+        return (int(newlines[row - 1]) + 1 if row > 0 else 0), int(newlines[row])
+
+    def lines(self, rows):
+        """ The text of the lines """
+        buf = self.view[0]
+        result = []
+        for row in rows:
+            start, end = self.span(row)
+            result.append(buf[start:end].tobytes().decode('utf-8', 'replace').rstrip('\r'))
+        return result
+
+    def search(self, pattern, rows=None, ignore_case=True, stop=None, max_matches=MAX_MATCHES):
+        """
+        The line numbers (sorted) that match the regex pattern, only those in rows if given.
+        stop: a threading.Event that ends the search early. Raises re.error for a bad pattern
+        """
+        # re.IGNORECASE makes re an order of magnitude slower: plain text is searched in the lower cased bytes
+        literal = ignore_case and not any(c in REGEX_CHARS for c in pattern)
+        if literal:
+            regex = re.compile(re.escape(pattern.lower()).encode())
+        else:
+            regex = re.compile(pattern.encode(), re.MULTILINE | (re.IGNORECASE if ignore_case else 0))
+        buf, newlines, levels = self.view
+        if not len(newlines):
+            return np.zeros(0, np.int64)
+        mm = self.mm # the search keeps the mapping alive, also if refresh() maps a grown file
+        end = int(newlines[-1])
+        matches = []
+        pos = 0
+        while pos < end and len(matches) < max_matches:
+            if stop is not None and stop.is_set():
+                break
+            # search up to a line end, so no match is cut in two
+            limit = int(newlines[min(np.searchsorted(newlines, pos + CHUNK), len(newlines) - 1)])
+            data, base = (mm[pos:limit].lower(), pos) if literal else (mm, 0)
+            at = pos
+            while len(matches) < max_matches:
+                match = regex.search(data, at - base, limit - base)
+                if match is None:
+                    break
+                row = int(np.searchsorted(newlines, base + match.start()))
+                matches.append(row)
+                at = int(newlines[row]) + 1 # the next line
+                if at > limit:
+                    break
+            pos = limit + 1
+        found = np.array(matches, np.int64)
+        if rows is not None:
+            found = found[np.isin(found, rows)]
+        return found
+
+    def close(self):
+        self.view = (np.zeros(0, np.uint8), np.zeros(0, np.int64), np.zeros(0, np.uint8))
+        self.mm = None # a search that is still running keeps its own reference
+        self.file.close()
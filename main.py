@@ -1,15 +1,33 @@
 #!/usr/bin/env python3
 
-import json
+import time
+launch = time.perf_counter() # startup timing, see startup.py
+
+import os
+import threading
 import tkinter
 import logging
-import re
-import os
+from collections import deque
 from tkinter import ttk
 import customtkinter as ctk
 from CTkMenuBar import *                 #pip install CTkMenuBar
 from CTkMessagebox import CTkMessagebox  #pip install CTkMessagebox
-from PIL import Image
+import numpy
+import definition
+import icons
+import logfile
+import logview
+import rx
+import startup
+import telemetry
+from constraints import ConstraintTable
+from definition import LEVELS
+from dutpool import DutPool, parse_ips
+from linktest import LinkTest, store_result
+from results import ResultStore
+from selection import AnySelection
+from viewmodel import ComboModel, ComboState, same
+from watch import DefinitionWatcher
 
 """
 Copyright (C) 2024 Karl Johansson xmoontool@protonmail.com
@@ -28,17 +46,73 @@ They are downloaded as 64x64 ico files
 An external json file ("system-definition.json") is used as a look-up table to validate and present valid combinations.
 """
 
+timer = startup.StartupTimer(launch)
+timer.mark('import')
+
 # System definitions
 fw = ['MFG', 'STD']
 
-# The system constraints not mentioned above are defined in a json file
-with open('system-definition.json') as json_file:
-    data = json.load(json_file)
+# The system constraints not mentioned above are defined in a json file. It is compiled to a shared index, see definition.py
+DEFINITION = 'system-definition.json'
+data = definition.load(DEFINITION)
+
+# The Tx and Rx options are looked up in any order in a constraint table, see constraints.py
+table = ConstraintTable(data)
+timer.mark('definition')
+
+# All control script calls run in the background, see dut.py. One session per DUT IP, see dutpool.py
+duts = DutPool()
+FW_TIMEOUT = 300 # seconds
+RX_REFRESH = 250 # ms between updates of the Rx statistics
+TELEMETRY_FRAME = 250 # ms between updates of the Tx telemetry chart
+CHART_POINTS = telemetry.POINTS # points per series, however long the Tx test runs
+LINK_DEADLINE = 600 # seconds for a link test
+NO_TX_DUT = "none" # Rx tab: no link test, all DUTs receive
+
+# The debug window is updated every DEBUG_TICK ms with all log records since the last update, see DebugHandler
+DEBUG_TICK = 50 # ms
+DEBUG_MAX_LINES = 5000 # older lines are removed from the debug window
+DEBUG_MAX_PENDING = 10000 # records waiting for the next update, more are dropped
+LOG_JSONL = None # e.g. './logs/log.jsonl' to also write a json lines log with the DUT, combination and step time
+LOG_VIEW_TICK = 100 # ms, the log viewer polls its thread
+LOG_VIEW_REFRESH = 1.0 # seconds, the log viewer reads the new lines of the current log
+DEFINITION_CHECK = 500 # ms, how often the GUI looks for a reloaded definition, see watch.py
+
+# Rx and link test results are kept in ./results/results.db, see results.py. Opened at the first result
+store = None
+
+
+def result_store():
+    global store
+    if store is None:
+        store = ResultStore()
+    return store
 
 
 logger = logging.getLogger('wltrx-gui')
 
 
+def when_done(widget, jobs, callback, interval=100):
+    """
+    Call callback(jobs) on the Tk thread when all background jobs ({ip: job}) are done.
+    The jobs are polled with after() so that no Tk call is ever made from the executor threads
+    """
+    def poll():
+        if all(job.done() for job in jobs.values()):
+            callback(jobs)
+        else:
+            widget.after(interval, poll)
+    widget.after(interval, poll)
+
+
+def run_on_duts(action, *args, **kwargs):
+    """ Start an action on all DUTs in the pool """
+    if not len(duts):
+        logger.warning("no DUT IP given, enter it in the General tab and load the FW first")
+        return {}
+    return duts.run(action, *args, **kwargs)
+
+
 class App(ctk.CTk):
     def __init__(self, title, size, className):
 
@@ -64,31 +138,63 @@ class App(ctk.CTk):
         self.titlebar_icon = tkinter.PhotoImage(file='./assets/wifi.png') # need to be png format
         self.wm_iconphoto(True, self.titlebar_icon)
         
-        # widgets
+        # The log handler of the debug window queues the log lines until the window is opened, see DebugHandler
+        self.log_handler = DebugHandler()
+        self.log_handler.setFormatter(logging.Formatter(fmt=logfile.FORMAT))
+        logger.addHandler(self.log_handler)
+
+        # The log files (./logs/log.txt). Can be useful to be able to send this log for support
+        # They are written from a background thread and rotated, see logfile.py
+        self.log_listener = logfile.start(logger, jsonl=LOG_JSONL)
+
+        # widgets. The Tx/Rx panels and the debug window are built when they are opened the first time
         self.left_frame = ctk.CTkFrame(master=self, corner_radius=0)
         self.left_frame.place(x=0, y=0, relwidth=0.30, relheight=1) # relwidth here must match the remainder of the Rightmenu relwidth
         self.create_left_widgets()
         self.menuRight = RightMenu(self)
-        self.debug = DebugWindow(self)
+        self.debug = None
 
         # initial state is with COM tab open and debug hidden
         self.callback_button1()
-        self.debug.hide()
         logger.debug("init")
+        timer.mark('widgets')
+
+        # An edited system definition is reloaded in the background, the menus keep their valid selections
+        self.watcher = DefinitionWatcher(DEFINITION, data, prepare=ConstraintTable).start()
+        self.after(DEFINITION_CHECK, self.check_definition)
 
         # Add a CTkMenuBar if clicking on the WiFi logo
         self.click_counter = 0
 
         # run 
+        self.after_idle(self.first_paint)
         self.mainloop()
 
+    def check_definition(self):
+        """ Switch to a reloaded definition (see watch.py) and update the panels that are built """
+        global data, table
+        update = self.watcher.pending()
+        if update:
+            data, table = update
+            for panel in self.menuRight.panels.values():
+                if hasattr(panel, 'reload_definition'):
+                    panel.reload_definition()
+        self.after(DEFINITION_CHECK, self.check_definition)
+
+    def first_paint(self):
+        """ Runs after the idle tasks that draw the window, the end of the startup """
+        self.update_idletasks()
+        timer.mark('first paint')
+        timer.report()
+
     def create_left_widgets(self):
-        # create images
-        self.logo_image = ctk.CTkImage(Image.open('./assets/wireless-64.ico'), size=(32, 32))
-        self.com_image= ctk.CTkImage(Image.open('./assets/settings.ico'), size=(20, 20))
-        self.tx_image= ctk.CTkImage(Image.open('./assets/data-transfer-upload-64.ico'), size=(20, 20))
-        self.rx_image= ctk.CTkImage(Image.open('./assets/data-transfer-download-64.ico'), size=(20, 20))
-        self.console_image= ctk.CTkImage(Image.open('./assets/console-64.ico'), size=(20, 20))
+        # create images. The icons are decoded and scaled once and then read from ./cache/icons, see icons.py
+        scale = ctk.ScalingTracker.get_window_scaling(self)
+        self.logo_image = ctk.CTkImage(icons.load('./assets/wireless-64.ico', (32, 32), scale), size=(32, 32))
+        self.com_image= ctk.CTkImage(icons.load('./assets/settings.ico', (20, 20), scale), size=(20, 20))
+        self.tx_image= ctk.CTkImage(icons.load('./assets/data-transfer-upload-64.ico', (20, 20), scale), size=(20, 20))
+        self.rx_image= ctk.CTkImage(icons.load('./assets/data-transfer-download-64.ico', (20, 20), scale), size=(20, 20))
+        self.console_image= ctk.CTkImage(icons.load('./assets/console-64.ico', (20, 20), scale), size=(20, 20))
 
         # create the top label
         self.logo_label = ctk.CTkLabel(self.left_frame, text='WTT', image=self.logo_image, 
@@ -164,17 +270,13 @@ class App(ctk.CTk):
 
     def callback_button1(self):
         """ General """
-        self.menuRight.COM.show_menu()
-        self.menuRight.TX.hide_menu()
-        self.menuRight.RX.hide_menu()
+        self.menuRight.show('COM')
         self.reset_button_style()
         self.menu_button1.configure(fg_color=['gray75', 'gray25'])
     
     def callback_button2(self):
         """ TX """
-        self.menuRight.COM.hide_menu()
-        self.menuRight.TX.show_menu()
-        self.menuRight.RX.hide_menu()
+        self.menuRight.show('TX')
         self.reset_button_style()
         self.menu_button2.configure(fg_color=['gray75', 'gray25'])
         #print(self.menu_button2.cget(attribute_name="fg_color")) #['#3B8ED0', '#1F6AA5']
@@ -182,14 +284,14 @@ class App(ctk.CTk):
     
     def callback_button3(self):
         """ RX """
-        self.menuRight.COM.hide_menu()
-        self.menuRight.TX.hide_menu()
-        self.menuRight.RX.show_menu()
+        self.menuRight.show('RX')
         self.reset_button_style()
         self.menu_button3.configure(fg_color=['gray75', 'gray25'])
     
     def callback_button4(self):
         """ DEBUG CONSOLE """
+        if self.debug is None:
+            self.debug = DebugWindow(self, self.log_handler)
         self.debug.show()
         
     
@@ -200,26 +302,47 @@ class App(ctk.CTk):
 
 
 class RightMenu(ctk.CTkFrame):
+    """ Holds the COM, TX and RX panels. A panel is built the first time it is used """
+
     def __init__(self, parent):
         super().__init__(master=parent)
         self.place(relx=0.30, y=0, relwidth=0.70, relheight=1)
-        self.COM = COMMenu(self)
-        self.TX = TxMenu(self)
-        self.RX = RxMenu(self)
+        self.panels = {}
+
+    def panel(self, name):
+        if name not in self.panels:
+            built = time.perf_counter()
+            self.panels[name] = {'COM': COMMenu, 'TX': TxMenu, 'RX': RxMenu}[name](self)
+            logger.debug(f"{name} panel built in {(time.perf_counter() - built) * 1000:.0f} ms")
+        return self.panels[name]
+
+    def show(self, name):
+        """ Show one panel, hide the others """
+        for other, panel in self.panels.items():
+            if other != name:
+                panel.hide_menu()
+        self.panel(name).show_menu()
+
+    @property
+    def COM(self):
+        return self.panel('COM')
+
+    @property
+    def TX(self):
+        return self.panel('TX')
+
+    @property
+    def RX(self):
+        return self.panel('RX')
 
 
 class TxMenu(ctk.CTkFrame):
     def __init__(self, parent):
         super().__init__(master=parent)
 
-        # Define variables that can keep track of choosen Tx values
-        self.band = [""]
-        self.standard = [""]
-        self.rate = [""]
-        self.bw = [""]
-        self.core = [""]
-        self.country = [""]
-        self.channel = [""]
+        # The selection engine keeps track of the choosen Tx values and the valid options for every combo.
+        # The values can be chosen in any order, every combo shows what is valid with the others (see selection.py)
+        self.selection = AnySelection(table)
 
         # define the labels
         label_band = ctk.CTkLabel(self, text="Frequency Band")
@@ -232,16 +355,17 @@ class TxMenu(ctk.CTkFrame):
         
         """
         Define the combo boxes
-        The 'band' combo box will always be populated with data.keys(). The rest of the boxes need to
-        be populated dynamically with an individual postcommand that parses the json constraints file.
+        They are populated from the options of the selection engine after every change, see update_view()
         """
-        self.combo_band = ctk.CTkComboBox(self, values=list(data.keys()), command=self.get_band)
-        self.combo_standard = ctk.CTkComboBox(self, values=self.standard, command=self.get_standard, state='disabled')
-        self.combo_rate = ctk.CTkComboBox(self, values=self.rate, command=self.get_rate, state='disabled')
-        self.combo_channel = ctk.CTkComboBox(self, values=self.channel, command=self.get_channel, state='disabled')
-        self.combo_bw = ctk.CTkComboBox(self, values=self.bw, command=self.get_bw, state='disabled')
-        self.combo_core = ctk.CTkComboBox(self, values=self.core, command=self.get_core, state='disabled')
-        self.combo_country = ctk.CTkComboBox(self, values=self.country, command=self.get_country, state='disabled')
+        self.combo_band = ctk.CTkComboBox(self, values=list(data.options()), command=self.get_band)
+        self.combo_standard = ctk.CTkComboBox(self, values=[""], command=self.get_standard, state='disabled')
+        self.combo_rate = ctk.CTkComboBox(self, values=[""], command=self.get_rate, state='disabled')
+        self.combo_channel = ctk.CTkComboBox(self, values=[""], command=self.get_channel, state='disabled')
+        self.combo_bw = ctk.CTkComboBox(self, values=[""], command=self.get_bw, state='disabled')
+        self.combo_core = ctk.CTkComboBox(self, values=[""], command=self.get_core, state='disabled')
+        self.combo_country = ctk.CTkComboBox(self, values=[""], command=self.get_country, state='disabled')
+        self.combos = {'band': self.combo_band, 'standard': self.combo_standard, 'rate': self.combo_rate, 'bw': self.combo_bw,
+                       'core': self.combo_core, 'country': self.combo_country, 'channel': self.combo_channel}
 
         # set all combos to NULL initially
         self.combo_band.set('')     
@@ -252,14 +376,24 @@ class TxMenu(ctk.CTkFrame):
         self.combo_core.set('')
         self.combo_country.set('')
 
+        # What the combos should show. Changes are applied to the widgets once per idle pass, see apply_view()
+        self.view = ComboModel(LEVELS, {'band': ComboState('normal', self.selection.options[0], '')})
+        self.view_pending = False
+
+        # The Tx telemetry of the running test {ip: TxMonitor} (see telemetry.py), shown in a window built on first use
+        self.monitors = {}
+        self.chart = None
+
         # define buttons
         button_start = ctk.CTkButton(self, text="Start", command=self.callback_start)
         button_stop = ctk.CTkButton(self, text="Stop", command=self.callback_stop)
+        button_clear = ctk.CTkButton(self, text="Clear", command=self.callback_clear)
+        button_chart = ctk.CTkButton(self, text="Telemetry", command=self.callback_chart)
 
         # place the widgets with grid technique
         # Order: band -> standard -> rate -> bw -> core -> country_code -> channel
         self.columnconfigure((0, 1), weight=1, uniform='a')
-        self.rowconfigure((0, 1, 2, 3, 4, 5, 6, 7), weight=1, uniform='a')
+        self.rowconfigure((0, 1, 2, 3, 4, 5, 6, 7, 8), weight=1, uniform='a')
         label_band.grid(row=0, column=0, sticky="e", padx=10)
         label_standard.grid(row=1, column=0, sticky="e", padx=10)
         label_rate.grid(row=2, column=0, sticky="e", padx=10)
@@ -278,69 +412,71 @@ class TxMenu(ctk.CTkFrame):
 
         button_stop.grid(row=7, column=0)
         button_start.grid(row=7, column=1)
+        button_clear.grid(row=8, column=0)
+        button_chart.grid(row=8, column=1)
+        self.update_view()
     
     def callback_start(self):
-        logger.debug("someone pressed start")
+        if not self.selection.is_complete():
+            logger.warning("Tx start: choose a valid combination first")
+            return
+        logger.debug(f"Tx start: {self.selection.get()}")
+        jobs = run_on_duts('tx_start', **self.selection.get())
+        if jobs:
+            when_done(self, jobs, self.tx_started)
+
+    def tx_started(self, jobs):
+        # a new test starts a new chart, the monitors of the last one are dropped
+        for monitor in self.monitors.values():
+            monitor.stop()
+        self.monitors = {}
+        for ip, job in jobs.items():
+            if job.result().returncode == 0:
+                self.monitors[ip] = telemetry.TxMonitor(duts[ip]).start()
+            else:
+                logger.error(f"{ip}: Tx start failed")
+        if self.chart:
+            self.chart.set_monitors(self.monitors)
     
     def callback_stop(self):
-        logger.debug("someone pressed stop")
-
-    # Reminder; order is: band -> standard -> rate -> bw -> core -> country_code -> channel
+        logger.debug("Tx stop")
+        # the chart keeps showing the samples of the stopped test
+        for monitor in self.monitors.values():
+            monitor.stop()
+        run_on_duts('tx_stop')
+
+    def callback_clear(self):
+        """ Clear all Tx values, every combo shows all its options again """
+        self.selection.reset()
+        self.update_view()
+
+    def callback_chart(self):
+        if self.chart is None:
+            self.chart = TelemetryWindow(self)
+            self.chart.set_monitors(self.monitors)
+        self.chart.show()
+
+    # One callback per combo. The values can be chosen in any order, see AnySelection
     def get_band(self, band):
-        self.band = band
-        self.standard = ''
-        self.rate = ''
-        self.bw = ''
-        self.core = ''
-        self.country = ''
-        self.channel = ''
-        logger.debug(f"band={band}")
-        self.validate()
+        self.validate('band', band)
     
     def get_standard(self, standard):
-        self.standard = standard
-        self.rate = ''
-        self.bw = ''
-        self.core = ''
-        self.country = ''
-        self.channel = ''
-        logger.debug(f"standard={standard}")
-        self.validate()
+        self.validate('standard', standard)
 
     def get_rate(self, rate):
-        self.rate = rate
-        self.bw = ''
-        self.core = ''
-        self.country = ''
-        self.channel = ''
-        logger.debug(f"rate={rate}")
-        self.validate()
+        self.validate('rate', rate)
     
     def get_bw(self, bw):
-        self.bw = bw
-        self.core = ''
-        self.country = ''
-        self.channel = ''
-        logger.debug(f"bw={bw}")
-        self.validate()
+        self.validate('bw', bw)
     
     def get_core(self, core):
-        self.core = core
-        self.country = ''
-        self.channel = ''
-        logger.debug(f"core={core}")
-        self.validate()
+        self.validate('core', core)
 
     def get_country(self, country):
-        self.country = country
-        self.channel = ''
-        logger.debug(f"country={country}")
-        self.validate()
+        self.validate('country', country)
     
     def get_channel(self, channel):
-        self.channel = channel
-        logger.debug(f"channel={channel}")
-        self.validate()
+        self.validate('channel', channel)
     
     def show_menu(self):
         self.pack(side='left', expand=True, fill='both')
@@ -348,218 +484,56 @@ class TxMenu(ctk.CTkFrame):
     def hide_menu(self):
         self.pack_forget()
 
-    def validate(self):
+    def validate(self, level, value):
         """
         Validation if choosen combination is valid. System is defined in system-definition.json
-        Need to enable / disable the correct buttons based on the validation result
-        Also need to erase the invalid value, even if it is disabled
+        The selection engine looks up the options of every combo with the other chosen values. The view model gets the wanted
+        state of every combo, only the ones that differ from what the widgets show are updated (in apply_view)
         """
-        logger.debug(f"band={self.band}, standard={self.standard}, rate={self.rate}, bw={self.bw}, core={self.core}, country={self.country}, channel={self.channel}")
-        
-        # we have a nested try/except because the data[self.band][self.standard][self.rate][self.bw][self.core][self.country] is not fully populated from the beginning
-        try:
-            if(self.channel in list(data[self.band][self.standard][self.rate][self.bw][self.core][self.country])):
-                self.check_channel_ok()
-            else:
-                self.check_country_ok()
-        
-        except:
-            try:
-                if(self.country in list(data[self.band][self.standard][self.rate][self.bw][self.core].keys())):
-                    self.check_country_ok()
-                else:
-                    self.check_core_ok()
-            except:
-                try:
-                    if(self.core in list(data[self.band][self.standard][self.rate][self.bw].keys())):
-                        self.check_core_ok()
-                    else:
-                        self.check_bw_ok()
-                except:
-                    try:
-                        if(self.bw in list(data[self.band][self.standard][self.rate].keys())):
-                            self.check_bw_ok()
-                        else:
-                            self.check_rate_ok()
-                    except:
-                        try:
-                            # list(data[self.band][self.standard].keys()) --> ['1Mbps', '2Mbps', '11Mbps', '5.5Mbps'] (if 2.4GHz 11b)
-                            if(self.rate in list(data[self.band][self.standard].keys())):
-                                self.check_rate_ok()
-                            else:
-                                self.check_standard_ok()
-                        except:
-                            try:
-                                #list(data[self.band].keys()) --> ['11b', '11g', '11n', '11ac'] if 2.4GHz
-                                if(self.standard in list(data[self.band].keys())):
-                                    self.check_standard_ok()
-                                else:
-                                    #Here we enter when we set band first time, the try is successfull, but since standard is empty we get into this else
-                                    self.check_band_ok()
-                            except:
-                                try:
-                                    #data.keys() --> ['2.4GHz', '5GHz']
-                                    if(self.band in list(data.keys())):
-                                        #Band ok!
-                                        self.check_band_ok()
-                                except:
-                                    pass
-    
-    def check_band_ok(self):
-        #data.keys() --> ['2.4GHz', '5GHz']
-        #Band ok!
-
-        self.enable_all_combos()
-
-        #Standard
-        self.standard = ''
-        self.combo_standard.set('')
-        self.combo_standard.configure(state='normal', values=list(data[self.band].keys()))
-
-        #Rate
-        self.rate = ''
-        self.combo_rate.set('')
-        self.combo_rate.configure(state='disabled')
-
-        #BW
-        self.bw = ''
-        self.combo_bw.set('')
-        self.combo_bw.configure(state='disabled')
-        
-        #Core
-        self.core = ''
-        self.combo_core.set('')
-        self.combo_core.configure(state='disabled')
-        
-        #Country
-        self.country = ''
-        self.combo_country.set('')
-        self.combo_country.configure(state='disabled')
-
-        #Channel
-        self.channel = ''
-        self.combo_channel.set('')
-        self.combo_channel.configure(state='disabled')
-
-    def check_standard_ok(self):
-        #Band ok!
-        #Standard ok!
-
-        self.enable_all_combos()
-
-        #Rate
-        self.rate = ''
-        self.combo_rate.set('')
-        self.combo_rate.configure(state='normal', values=list(data[self.band][self.standard].keys()))
-        
-        #BW
-        self.bw = ''
-        self.combo_bw.configure(state='disabled')
-
-        #Core
-        self.core = ''
-        self.combo_core.configure(state='disabled')
-
-        #Country
-        self.country = ''
-        self.combo_country.configure(state='disabled')
-
-        #Channel
-        self.channel = ''
-        self.combo_channel.configure(state='disabled')
-
-    def check_rate_ok(self):
-        #Band ok!
-        #Standard ok!
-        #Rate ok!
-
-        self.enable_all_combos()
-
-        #BW
-        self.bw = ''
-        self.combo_bw.set('')
-        self.combo_bw.configure(state='normal', values=list(data[self.band][self.standard][self.rate].keys()))
-        
-        #Core
-        self.core = ''
-        self.combo_core.configure(state='disabled')
-
-        #Country
-        self.country = ''
-        self.combo_country.configure(state='disabled')
-
-        #Channel
-        self.channel = ''
-        self.combo_channel.configure(state='disabled')
-
-    def check_bw_ok(self):
-        #Band ok!
-        #Standard ok!
-        #Rate ok!
-        #BW ok!
-        
-        self.enable_all_combos()
-
-        #Core
-        self.core = ''
-        self.combo_core.set('')
-        self.combo_core.configure(state='normal', values=list(data[self.band][self.standard][self.rate][self.bw].keys()))
-
-        #Country
-        self.country = ''
-        self.combo_country.configure(state='disabled')
-
-        #Channel
-        self.channel = ''
-        self.combo_channel.configure(state='disabled')
-
-    def check_core_ok(self):
-        #Band ok!
-        #Standard ok!
-        #Rate ok!
-        #BW ok!
-        #Core ok!
-
-        self.enable_all_combos()
-
-        #Country
-        self.country = ''
-        self.combo_country.set('')
-        self.combo_country.configure(state='normal', values=list(data[self.band][self.standard][self.rate][self.bw][self.core].keys()))
-        
-        #Channel
-        self.channel = ''
-        self.combo_channel.configure(state='disabled')
-
-    def check_country_ok(self):
-        #Band ok!
-        #Standard ok!
-        #Rate ok!
-        #BW ok!
-        #Core ok!
-        #Country ok!
-
-        self.enable_all_combos()
-        
-        #Channel
-        self.channel = ''
-        self.combo_channel.set('')
-        self.combo_channel.configure(state='normal', values=data[self.band][self.standard][self.rate][self.bw][self.core][self.country])
-
-    def check_channel_ok(self):
-        #if we get here, all is good
-        pass
-
-    def enable_all_combos(self):
-        # if the combo box is disabled and we try combo.set(''), it has not effect. So enabling all, before updating the values in them is safer than just assume they are enabled
-        self.combo_channel.configure(state='normal')
-        self.combo_standard.configure(state='normal')
-        self.combo_rate.configure(state='normal')
-        self.combo_bw.configure(state='normal')
-        self.combo_core.configure(state='normal')
-        self.combo_country.configure(state='normal')
-        self.combo_channel.configure(state='normal')
-    
+        logger.debug(f"{level}={value}")
+        self.selection.select(level, value)
+        self.view.shown(level, value)
+        logger.debug(", ".join(f"{name}={value}" for name, value in self.selection.get().items()))
+        self.update_view()
+
+    def reload_definition(self):
+        """ The definition was reloaded: keep the selection as far as it is still valid """
+        before = self.selection.get()
+        self.selection.rebase(table)
+        dropped = [f"{level}={value}" for level, value in before.items() if value and not self.selection[level]]
+        if dropped:
+            logger.warning(f"Tx selection no longer valid after the definition reload: {', '.join(dropped)}")
+        self.update_view()
+
+    def update_view(self):
+        """ Give the view model the wanted state of every combo, the widgets are updated when Tk is idle """
+        for i, name in enumerate(LEVELS):
+            options = self.selection.options[i]
+            # a level without options is disabled and keeps its old values in the drop down
+            self.view.want(name, 'normal' if options else 'disabled', options or None, self.selection.values[i])
+        if not self.view_pending:
+            self.view_pending = True
+            self.after_idle(self.apply_view)
+
+    def apply_view(self):
+        """ Update the combos that changed since the last update, one configure per combo where possible """
+        self.view_pending = False
+        for name, old, new in self.view.changes():
+            combo = self.combos[name]
+            options = {}
+            if not same(old.values, new.values):
+                options['values'] = list(new.values)
+            # if the combo box is disabled and we try combo.set(''), it has not effect. So enable it before updating
+            set_value = old.value != new.value
+            state = 'normal' if set_value else new.state
+            if state != old.state:
+                options['state'] = state
+            if options:
+                combo.configure(**options)
+            if set_value:
+                combo.set(new.value)
+                if new.state != state:
+                    combo.configure(state=new.state)
 
 class RxMenu(ctk.CTkFrame):
     def __init__(self, parent):
@@ -571,17 +545,31 @@ class RxMenu(ctk.CTkFrame):
         self.channel = [""]
         self.nbr_of_packets = [""]
 
+        # the running Rx tests {ip: RxMonitor}, see rx.py
+        self.monitors = {}
+        # the band, core and channel of the running Rx test, to store its results when it is done
+        self.rx_params = None
+        # the running link test (see linktest.py) and its future
+        self.link = None
+        self.link_future = None
+        # the after() id of the pending refresh, there is only one refresh chain (see schedule_refresh)
+        self.refresh_id = None
+
         # define the labels
         label_band = ctk.CTkLabel(self, text="Frequency Band")
         label_core = ctk.CTkLabel(self, text="Rx Core")
         label_channel = ctk.CTkLabel(self, text="Channel")
         label_packets = ctk.CTkLabel(self, text="Number of packets")
+        label_tx_dut = ctk.CTkLabel(self, text="Tx DUT")
+        self.label_stats = ctk.CTkLabel(self, text="", justify='left', anchor='w') # PER, RSSI and rate per DUT
 
         # define the combo boxes and entry box
-        self.combo_band = ctk.CTkComboBox(self, values=list(data.keys()), command=self.get_band)
+        self.combo_band = ctk.CTkComboBox(self, values=list(data.options()), command=self.get_band)
         self.combo_core = ctk.CTkComboBox(self, values=self.core, command=self.get_core, state='disabled')
         self.combo_channel = ctk.CTkComboBox(self, values=self.channel, command=self.get_channel, state='disabled')
         self.packet_entry = ctk.CTkEntry(self, placeholder_text="1000")
+        # a DUT from the pool that transmits the Tx tab settings to the other DUTs (link test), or none
+        self.combo_tx_dut = ctk.CTkComboBox(self, values=[NO_TX_DUT])
 
         # set all combos to NULL initially
         self.combo_band.set('')     
@@ -600,31 +588,186 @@ class RxMenu(ctk.CTkFrame):
         label_core.grid(row=1, column=0, sticky="e", padx=10)
         label_channel.grid(row=2, column=0, sticky="e", padx=10)
         label_packets.grid(row=3, column=0, sticky="e", padx=10)
+        label_tx_dut.grid(row=4, column=0, sticky="e", padx=10)
 
         self.combo_band.grid(row=0, column=1, sticky="ew", padx=10)
         self.combo_core.grid(row=1, column=1, sticky="ew", padx=10)
         self.combo_channel.grid(row=2, column=1, sticky="ew", padx=10)
         self.packet_entry.grid(row=3, column=1, sticky="ew", padx=10)
+        self.combo_tx_dut.grid(row=4, column=1, sticky="ew", padx=10)
+
+        self.label_stats.grid(row=5, column=0, columnspan=2, sticky="ew", padx=10)
 
         button_stop.grid(row=6, column=0)
         button_start.grid(row=6, column=1)
 
     def get_band(self, band):
-        pass
+        # the Rx cores are the cores of all Tx combinations in the band
+        self.core = list(table.remaining(band=band)['core'])
+        self.combo_core.configure(values=self.core, state='normal')
+        self.combo_core.set('')
+        self.combo_channel.configure(values=[""], state='disabled')
+        self.combo_channel.set('')
 
     def get_core(self, core):
-        pass
+        self.channel = list(table.remaining(band=self.combo_band.get(), core=core)['channel'])
+        self.combo_channel.configure(values=self.channel, state='normal')
+        self.combo_channel.set('')
 
     def get_channel(self, channel):
-        pass
+        logger.debug(f"Rx channel={channel}")
+
+    def reload_definition(self):
+        """ The definition was reloaded: update the options, keep the band, core and channel that are still valid """
+        band, core, channel = self.combo_band.get(), self.combo_core.get(), self.combo_channel.get()
+        bands = list(data.options())
+        if bands != self.combo_band.cget('values'):
+            self.combo_band.configure(values=bands)
+        cores = list(table.remaining(band=band)['core']) if band in bands else []
+        channels = list(table.remaining(band=band, core=core)['channel']) if core in cores else []
+        for combo, value, options in ((self.combo_band, band, bands), (self.combo_core, core, cores),
+                                      (self.combo_channel, channel, channels)):
+            if combo is not self.combo_band and options != combo.cget('values'):
+                combo.configure(values=options or [""], state='normal' if options else 'disabled')
+            if value and value not in options:
+                logger.warning(f"Rx {value} is no longer valid after the definition reload")
+                # a disabled combo ignores set()
+                state = combo.cget('state')
+                combo.configure(state='normal')
+                combo.set('')
+                combo.configure(state=state)
+        self.core, self.channel = cores or [""], channels or [""]
+
+    def get_packets(self):
+        """ The number of packets in the entry, the placeholder (1000) if it is empty. None if it is not a number """
+        text = self.packet_entry.get().strip() or "1000"
+        try:
+            packets = int(text)
+        except ValueError:
+            return None
+        return packets if packets > 0 else None
 
     def callback_start(self):
-        logger.debug("someone pressed start")
+        if self.combo_tx_dut.get() not in ('', NO_TX_DUT):
+            self.start_link_test(self.combo_tx_dut.get())
+            return
+        band, core, channel = self.combo_band.get(), self.combo_core.get(), self.combo_channel.get()
+        if not (band and core and channel):
+            logger.warning("Rx start: choose band, core and channel first")
+            return
+        packets = self.get_packets()
+        if packets is None:
+            logger.warning("Rx start: the number of packets must be a positive number")
+            return
+        self.stop_monitors()
+        logger.debug(f"Rx start: band={band}, core={core}, channel={channel}, packets={packets}")
+        jobs = run_on_duts('rx_start', band, core, channel, packets=packets)
+        self.rx_params = dict(band=band, core=core, channel=channel)
+        if jobs:
+            when_done(self, jobs, lambda jobs: self.rx_started(jobs, packets))
+
+    def rx_started(self, jobs, packets):
+        for ip, job in jobs.items():
+            if job.result().returncode == 0:
+                self.monitors[ip] = rx.RxMonitor(duts[ip], packets=packets).start()
+            else:
+                logger.error(f"{ip}: Rx start failed")
+        if self.monitors:
+            self.schedule_refresh()
+
+    def start_link_test(self, tx_ip):
+        """ tx_ip transmits with the settings of the Tx tab, all other DUTs receive on its band and channel """
+        selection = self.master.TX.selection
+        if not selection.is_complete():
+            logger.warning("link test: choose all Tx values in the Tx tab first")
+            return
+        receivers = [duts[ip] for ip in duts.ips() if ip != tx_ip]
+        packets = self.get_packets()
+        if tx_ip not in duts.ips() or not receivers or packets is None:
+            logger.warning("link test: load the FW on the Tx DUT and at least one Rx DUT, and give the number of packets")
+            return
+        if self.link_future and not self.link_future.done():
+            logger.warning("link test: a test is already running")
+            return
+        self.stop_monitors()
+        self.rx_params = None
+        self.link = LinkTest(duts[tx_ip], receivers, selection.get(), packets, rx_core=self.combo_core.get() or None,
+                             deadline=LINK_DEADLINE)
+        self.monitors = self.link.monitors # filled when the receivers are armed
+        logger.debug(f"link test: {tx_ip} --> {', '.join(control.ip for control in receivers)}")
+        self.link_future = duts.pool.submit(self.link.run_sync)
+        when_done(self, {tx_ip: self.link_future}, self.link_test_done)
+        self.schedule_refresh()
+
+    def link_test_done(self, futures):
+        result = self.link_future.result()
+        skew = "" if result.skew is None else f", Tx started {result.skew * 1000:.0f} ms after Rx"
+        store_result(result_store(), self.link, result)
+        result_store().flush()
+        if result.status == 'ok':
+            logger.info(f"link test passed in {result.elapsed:.1f} s{skew}")
+        else:
+            logger.error(f"link test {result.status}: {result.error}{skew}")
+
+    def schedule_refresh(self):
+        """ Refresh in RX_REFRESH ms. A pending refresh is cancelled, so a restarted test never runs two chains """
+        self.cancel_refresh()
+        self.refresh_id = self.after(RX_REFRESH, self.refresh)
+
+    def cancel_refresh(self):
+        if self.refresh_id is not None:
+            self.after_cancel(self.refresh_id)
+            self.refresh_id = None
+
+    def refresh(self):
+        """ Show the latest statistics. Runs every RX_REFRESH ms, however fast the counters come in """
+        self.refresh_id = None
+        lines = []
+        for ip, monitor in self.monitors.items():
+            stats = monitor.stats()
+            lines.append(f"{ip}: {stats.packets}/{monitor.packets} packets, PER {stats.per:.2%} "
+                         f"(now {stats.rolling_per:.2%}), RSSI {stats.rssi_mean:.1f} ± {stats.rssi_std:.1f} dBm, "
+                         f"{stats.rate:.0f} packets/s")
+        self.label_stats.configure(text='\n'.join(lines))
+        link_running = self.link_future is not None and not self.link_future.done()
+        if link_running or any(not monitor.done.is_set() for monitor in self.monitors.values()):
+            self.schedule_refresh()
+        elif self.rx_params:
+            self.store_rx_results()
+
+    def store_rx_results(self):
+        for ip, monitor in self.monitors.items():
+            stats = monitor.stats()
+            status = 'ok' if stats.packets >= monitor.packets else 'failed'
+            result_store().add(dut=ip, mode='rx', **self.rx_params, status=status,
+                               error=str(monitor.error) if monitor.error else None, packets=stats.packets,
+                               per=stats.per, rssi=stats.rssi_mean)
+        result_store().flush()
+        self.rx_params = None
+
+    def stop_monitors(self):
+        """ Drop the monitors of the last test before a new one starts """
+        self.cancel_refresh()
+        for monitor in self.monitors.values():
+            monitor.stop()
+        self.monitors = {}
     
     def callback_stop(self):
-        logger.debug("someone pressed stop")
+        logger.debug("Rx stop")
+        if self.link_future and not self.link_future.done():
+            self.link.cancel() # stops Tx and Rx on all its DUTs
+        else:
+            for monitor in self.monitors.values():
+                monitor.stop()
+            run_on_duts('rx_stop')
+        # the running chain is replaced by one that shows (and stores) the final statistics once the test has stopped
+        if self.monitors or self.link_future:
+            self.schedule_refresh()
 
     def show_menu(self):
+        self.combo_tx_dut.configure(values=[NO_TX_DUT] + duts.ips())
+        if self.combo_tx_dut.get() not in duts.ips():
+            self.combo_tx_dut.set(NO_TX_DUT)
         self.pack(side='left', expand=True, fill='both')
     
     def hide_menu(self):
@@ -638,9 +781,10 @@ class COMMenu(ctk.CTkFrame):
         # define the widgets
         label_ip = ctk.CTkLabel(self, text="IP")
         label_fw = ctk.CTkLabel(self, text="FW")
-        self.entry_ip = ctk.CTkEntry(self, placeholder_text="192.168.xx.xxx")
+        self.entry_ip = ctk.CTkEntry(self, placeholder_text="192.168.xx.xxx, ...") # one or more DUTs
         self.combo_fw = ctk.CTkComboBox(self, values=fw, command=self.get_fw) 
         self.button_load = ctk.CTkButton(self, text="Load FW", command=self.callback_load_fw)
+        self.check_force = ctk.CTkCheckBox(self, text="Force reload") # load even if the DUT already runs the FW
         
         # define the grid (use uniform='a' to avoid that empty cells takes up less space than cells with widgets)
         self.columnconfigure(0, weight=1, uniform='a')
@@ -655,13 +799,39 @@ class COMMenu(ctk.CTkFrame):
         self.combo_fw.grid(row=2, column=1, sticky='ew', padx=20)
 
         self.button_load.grid(row=3, column=1, sticky='ew', padx=20)
+        self.check_force.grid(row=4, column=1, sticky='w', padx=20)
+
+        # the running FW loads {ip: job}, the button cancels them while they run
+        self.jobs = {}
 
     def callback_load_fw(self):
+        if any(not job.done() for job in self.jobs.values()):
+            logger.debug("load FW cancelled")
+            for job in self.jobs.values():
+                job.cancel()
+            return
         ip = self.entry_ip.get()
         logger.debug(f"load FW, IP = {ip}")
         self.set_ip(ip)
-        #os.system("python3 ./dut-control/test.py")
-        os.system("python3 ./dut-control/load_mfg_fw.py")
+        # all DUTs load in parallel, a failing DUT does not stop the others. DUTs that already run the FW are skipped
+        if not len(duts):
+            logger.warning("no DUT IP given")
+            return
+        self.jobs = duts.ensure_fw(self.combo_fw.get(), force=bool(self.check_force.get()), timeout=FW_TIMEOUT)
+        if self.jobs:
+            self.button_load.configure(text="Cancel")
+            when_done(self, self.jobs, self.load_fw_done)
+
+    def load_fw_done(self, jobs):
+        self.button_load.configure(text="Load FW")
+        for ip, job in jobs.items():
+            result = job.result()
+            if result.returncode == 0 and job.skipped:
+                logger.info(f"{ip}: FW already running, load skipped")
+            elif result.returncode == 0:
+                logger.info(f"{ip}: FW loaded in {result.elapsed:.1f} s")
+            else:
+                logger.error(f"{ip}: FW load failed")
 
     def get_country(self, country):
         logger.debug(f"country={country}")
@@ -671,14 +841,9 @@ class COMMenu(ctk.CTkFrame):
 
     def set_ip(self, ip):
         """
-        The config.ini contains a line with 'IP =  10.8.17.121' that needs to be replaced with the new IP. Use regexp
+        ip can be a comma separated list. Every DUT gets its own config file, see dutpool.py
         """
-        with open ('./dut-control/config.ini', 'r+') as f:
-            file = f.read()
-            file = re.sub(r'(?<=IP = ).*$' , ip, file, flags=re.MULTILINE) # change everything after 'IP = ' to the new ip argument
-            f.seek(0)
-            f.write(file)
-            f.truncate()
+        duts.set_ips(parse_ips(ip))
 
     def show_menu(self):
         self.pack(side='left', expand=True, fill='both')
@@ -687,6 +852,132 @@ class COMMenu(ctk.CTkFrame):
         self.pack_forget()
 
 
+class TelemetryWindow(ctk.CTkToplevel):
+    """
+    Live chart of the Tx telemetry (output power, EVM and temperature) of one DUT. Every TELEMETRY_FRAME ms every
+    series is downsampled to CHART_POINTS points (see telemetry.py) and its canvas line is moved with coords(),
+    so a frame of an hours-long burn-in costs as much as one of a short test. Nothing is drawn while the window
+    is hidden or when no new samples came in
+    """
+
+    COLORS = {'power': '#3B8ED0', 'evm': 'orange', 'temp': 'tomato'}
+    MARGIN = 55 # px left of the plots for the scale
+
+    def __init__(self, master=None):
+        super().__init__(master=master)
+        self.geometry('700x450')
+        self.title("Tx telemetry")
+
+        # hide instead of destroy, same as the debug window
+        self.protocol("WM_DELETE_WINDOW", self.hide)
+
+        self.monitors = {} # {ip: TxMonitor}, see TxMenu
+        self.drawn = None # what the last frame showed, see draw()
+        self.running = False
+
+        self.combo_dut = ctk.CTkComboBox(self, values=[''], width=140, command=lambda ip: self.redraw())
+        self.combo_method = ctk.CTkComboBox(self, values=list(telemetry.DOWNSAMPLE), width=100,
+                                            command=lambda method: self.redraw())
+        self.combo_method.set('lttb')
+        self.label_status = ctk.CTkLabel(self, text="", anchor='w')
+        self.canvas = ctk.CTkCanvas(self, background='gray14', highlightthickness=0)
+        self.canvas.bind('<Configure>', lambda event: self.redraw())
+
+        self.columnconfigure(2, weight=1)
+        self.rowconfigure(1, weight=1)
+        self.combo_dut.grid(row=0, column=0, padx=(10, 5), pady=5)
+        self.combo_method.grid(row=0, column=1, padx=5, pady=5)
+        self.label_status.grid(row=0, column=2, sticky="ew", padx=5)
+        self.canvas.grid(row=1, column=0, columnspan=3, sticky="nswe", padx=10, pady=(0, 10))
+
+        # The canvas items are created once, every frame only moves them and changes their text
+        self.items = {}
+        for field in telemetry.FIELDS:
+            self.items[field] = {
+                'frame': self.canvas.create_rectangle(0, 0, 0, 0, outline='gray30'),
+                'line': self.canvas.create_line(0, 0, 0, 0, fill=self.COLORS[field], width=1.5, state='hidden'),
+                'title': self.canvas.create_text(0, 0, anchor='nw', fill=self.COLORS[field], font=('', 11)),
+                'high': self.canvas.create_text(0, 0, anchor='ne', fill='gray70', font=('', 10)),
+                'low': self.canvas.create_text(0, 0, anchor='se', fill='gray70', font=('', 10)),
+            }
+
+    def set_monitors(self, monitors):
+        self.monitors = monitors
+        ips = list(monitors) or ['']
+        self.combo_dut.configure(values=ips)
+        if self.combo_dut.get() not in ips:
+            self.combo_dut.set(ips[0])
+        self.redraw()
+
+    def show(self):
+        self.deiconify()
+        if not self.running:
+            self.running = True
+            self.after(TELEMETRY_FRAME, self.frame)
+
+    def hide(self):
+        self.withdraw() # the frames stop at the next tick
+
+    def redraw(self):
+        """ Draw the next frame even if there are no new samples """
+        self.drawn = None
+
+    def frame(self):
+        if self.state() == 'withdrawn':
+            self.running = False
+            return
+        self.draw()
+        self.after(TELEMETRY_FRAME, self.frame)
+
+    def draw(self):
+        ip, method = self.combo_dut.get(), self.combo_method.get()
+        monitor = self.monitors.get(ip)
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        shown = (ip, method, monitor.ring.end if monitor else 0, width, height)
+        if shown == self.drawn:
+            return
+        self.drawn = shown
+
+        latest = monitor.latest() if monitor else {}
+        series = monitor.series(CHART_POINTS, method) if monitor else {}
+        row_height = height / len(telemetry.FIELDS)
+        left, right = self.MARGIN, width - 10
+        for i, field in enumerate(telemetry.FIELDS):
+            items = self.items[field]
+            top, bottom = i * row_height + 18, (i + 1) * row_height - 6
+            self.canvas.coords(items['frame'], left, top, right, bottom)
+            self.canvas.coords(items['title'], left, i * row_height + 2)
+            self.canvas.coords(items['high'], left - 4, top)
+            self.canvas.coords(items['low'], left - 4, bottom)
+            value = latest.get(field, float('nan'))
+            self.canvas.itemconfigure(items['title'], text=f"{field}  " + (
+                "-" if numpy.isnan(value) else f"{value:.1f} {telemetry.UNITS[field]}"))
+
+            t, values = series.get(field, ((), ()))
+            if len(t) < 2:
+                self.canvas.itemconfigure(items['line'], state='hidden')
+                self.canvas.itemconfigure(items['high'], text="")
+                self.canvas.itemconfigure(items['low'], text="")
+                continue
+            low, high = float(values.min()), float(values.max())
+            if high - low < 0.1: # a flat line is drawn in the middle
+                low, high = low - 0.5, high + 0.5
+            xs = left + (t - t[0]) / max(t[-1] - t[0], 1e-9) * (right - left)
+            ys = bottom - (values - low) / (high - low) * (bottom - top)
+            self.canvas.coords(items['line'], *numpy.column_stack((xs, ys)).ravel().tolist())
+            self.canvas.itemconfigure(items['line'], state='normal')
+            self.canvas.itemconfigure(items['high'], text=f"{high:.1f}")
+            self.canvas.itemconfigure(items['low'], text=f"{low:.1f}")
+
+        if monitor is None:
+            self.label_status.configure(text="start a Tx test to see its telemetry")
+        else:
+            t = monitor.ring.last(len(monitor.ring))[0]
+            span = t[-1] - t[0] if t.size else 0.0
+            state = " (stopped)" if monitor.done.is_set() else ""
+            self.label_status.configure(text=f"{len(monitor.ring)} samples over {span / 60:.1f} min{state}")
+
+
 class DebugWindow(ctk.CTkToplevel):
     """ 
     This is the debug window that pops up when pressing on dbg. It is a ctk textbox that uses the custom
@@ -694,12 +985,12 @@ class DebugWindow(ctk.CTkToplevel):
     A lot of inspiration from https://github.com/beenje/tkinter-logging-text-widget/blob/master/main.py 
     """
      
-    def __init__(self, master=None): 
+    def __init__(self, master=None, log_handler=None): 
         super().__init__(master=master)
 
         #define window size
-        self.w = 800
-        self.h = 200
+        self.w = 900
+        self.h = 400
         
         #get center coordinates of the screen and place the window there
         self.ws = self.winfo_screenwidth() # width of the screen
@@ -722,8 +1013,18 @@ class DebugWindow(ctk.CTkToplevel):
         self.columnconfigure(0, weight=1, uniform='a')
         self.rowconfigure(0, weight=1, uniform='a')
 
-        # Create a textbox that takes up the full debug window
-        self.text_area = ctk.CTkTextbox(self, state='disabled') # Read-only
+        # Live: the last log lines of this session. Log files: the viewer for the full log of this and earlier sessions
+        self.tabs = ctk.CTkTabview(self)
+        self.tabs.grid(row=0, column=0, sticky="nswe")
+        live = self.tabs.add("Live")
+        files = self.tabs.add("Log files")
+        live.columnconfigure(0, weight=1)
+        live.rowconfigure(0, weight=1)
+        files.columnconfigure(0, weight=1)
+        files.rowconfigure(0, weight=1)
+
+        # Create a textbox that takes up the full live tab
+        self.text_area = ctk.CTkTextbox(live, state='disabled') # Read-only
         self.text_area.grid(row=0, column=0, sticky="nswe")
         self.text_area.configure(font=ctk.CTkFont(size=13, weight='normal'))
 
@@ -733,20 +1034,13 @@ class DebugWindow(ctk.CTkToplevel):
         self.text_area.tag_config('WARNING', foreground='orange')
         self.text_area.tag_config('ERROR', foreground='red')
         self.text_area.tag_config('CRITICAL', foreground='red', underline=1)
-        
-        # Create the custom log handler so that all logger messages are automatically shown in the log window
-        log_handler = DebugHandler(self.text_area)
 
-        # Create a file log handler. Can be useful to be able to send this log for support
-        file_handler = logging.FileHandler('./logs/log.txt', 'w') #overwrite old log
-        # create the formatter
-        formatter = logging.Formatter(fmt='%(asctime)-s - %(levelname)-8s - %(message)-s')
+        self.viewer = LogViewer(files)
+        self.viewer.grid(row=0, column=0, sticky="nswe")
         
-        # add formatter and handlers
-        log_handler.setFormatter(formatter)
-        file_handler.setFormatter(formatter)
-        logger.addHandler(log_handler)
-        logger.addHandler(file_handler)
+        # The custom log handler (see App) shows all logger messages in the text area from now on
+        if log_handler:
+            log_handler.attach(self.text_area)
 
     def show(self):
         self.deiconify()
@@ -755,27 +1049,277 @@ class DebugWindow(ctk.CTkToplevel):
         self.withdraw()
 
 
+class LogViewer(ctk.CTkFrame):
+    """
+    Shows a log file (this session or a rotated one) without loading it: the file is memory mapped and indexed
+    (see logview.py) and only the lines that fit in the textbox are read and inserted. Opening, following the
+    current log and searching run on a thread, the Tk thread polls them every LOG_VIEW_TICK ms.
+    The level menu hides the lower levels, search shows only the matching lines (regex, or plain text). The lines
+    that are logged after a search are shown after the next search or when the search is cleared
+    """
+
+    def __init__(self, parent):
+        super().__init__(parent, fg_color='transparent')
+        self.log = None # logview.LogFile
+        self.rows = None # the line numbers that are shown (level filter and search)
+        self.matches = None # line numbers of the search, None without a search
+        self.top = 0 # index in rows of the first line in the textbox
+        self.busy = None # the thread that opens/refreshes/searches
+        self.done = None # what the thread returns: ('open', LogFile) / ('refresh', lines) / ('search', matches) / ('error', text)
+        self.stop = threading.Event()
+        self.last_refresh = 0.0
+
+        self.columnconfigure(2, weight=1)
+        self.rowconfigure(1, weight=1)
+
+        self.combo_file = ctk.CTkComboBox(self, width=230, state='readonly', command=self.callback_file)
+        self.combo_file.grid(row=0, column=0, padx=(0, 5), pady=(0, 5))
+        self.combo_level = ctk.CTkComboBox(self, width=110, state='readonly', values=list(logview.LEVEL_NAMES),
+                                           command=lambda level: self.update_rows())
+        self.combo_level.set('DEBUG')
+        self.combo_level.grid(row=0, column=1, padx=5, pady=(0, 5))
+        self.entry_search = ctk.CTkEntry(self, placeholder_text='search (regex)')
+        self.entry_search.grid(row=0, column=2, padx=5, pady=(0, 5), sticky='we')
+        self.entry_search.bind('<Return>', lambda event: self.callback_search())
+        self.button_search = ctk.CTkButton(self, text='Search', width=70, command=self.callback_search)
+        self.button_search.grid(row=0, column=3, padx=5, pady=(0, 5))
+        self.button_clear = ctk.CTkButton(self, text='Clear', width=60, command=self.callback_clear)
+        self.button_clear.grid(row=0, column=4, padx=(5, 0), pady=(0, 5))
+
+        self.font = ctk.CTkFont(size=13, weight='normal')
+        self.text = ctk.CTkTextbox(self, state='disabled', wrap='none', activate_scrollbars=False, font=self.font)
+        self.text.grid(row=1, column=0, columnspan=5, sticky='nswe')
+        for level, options in (('INFO', {'foreground': 'white'}), ('DEBUG', {'foreground': 'gray'}),
+                               ('WARNING', {'foreground': 'orange'}), ('ERROR', {'foreground': 'red'}),
+                               ('CRITICAL', {'foreground': 'red', 'underline': 1})):
+            self.text.tag_config(level, **options)
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.callback_scroll)
+        self.scrollbar.grid(row=1, column=5, sticky='ns')
+        self.label_status = ctk.CTkLabel(self, text='', anchor='w')
+        self.label_status.grid(row=2, column=0, columnspan=5, sticky='we')
+
+        self.text.bind('<MouseWheel>', lambda event: self.scroll_by(-3 if event.delta > 0 else 3))
+        self.text.bind('<Button-4>', lambda event: self.scroll_by(-3))
+        self.text.bind('<Button-5>', lambda event: self.scroll_by(3))
+        self.text.bind('<Configure>', lambda event: self.render())
+
+        # the current log is opened when the tab is shown the first time
+        self.update_files()
+        self.after(LOG_VIEW_TICK, self.tick)
+
+    def update_files(self):
+        """ The current log first, then the rotated ones newest first """
+        self.files = [logfile.LOG_FILE] + logfile.rotated(logfile.LOG_FILE)[::-1]
+        self.combo_file.configure(values=[f"{os.path.basename(path)} (current)" if path == logfile.LOG_FILE
+                                          else os.path.basename(path) for path in self.files])
+
+    def run(self, kind, fn, *args):
+        """ Run fn on a thread, tick() picks up the result """
+        def target():
+            try:
+                self.done = (kind, fn(*args))
+            except Exception as e:
+                self.done = ('error', str(e))
+        self.busy = threading.Thread(target=target, daemon=True, name='log viewer')
+        self.busy.start()
+
+    def open(self, path):
+        def load():
+            log = logview.LogFile(path)
+            log.refresh()
+            return log
+        self.stop.set() # a search of the previous file
+        self.label_status.configure(text=f"opening {path} ...")
+        self.combo_file.set(f"{os.path.basename(path)} (current)" if path == logfile.LOG_FILE else os.path.basename(path))
+        self.started = time.monotonic()
+        self.run('open', load)
+
+    def callback_file(self, choice):
+        for path in self.files:
+            if choice.startswith(os.path.basename(path)):
+                self.stop.set()
+                if self.busy and self.busy.is_alive():
+                    self.busy.join()
+                self.busy, self.done = None, None
+                self.open(path)
+                return
+
+    def callback_search(self):
+        pattern = self.entry_search.get()
+        if not pattern:
+            self.callback_clear()
+            return
+        if self.log is None or (self.busy and self.busy.is_alive()):
+            return
+        self.stop = threading.Event()
+        self.label_status.configure(text=f"searching '{pattern}' ...")
+        self.started = time.monotonic()
+        self.run('search', self.log.search, pattern, None, True, self.stop)
+
+    def callback_clear(self):
+        self.stop.set()
+        self.entry_search.delete(0, 'end')
+        self.matches = None
+        self.update_rows(follow=True)
+
+    def tick(self):
+        """ Pick up the result of the thread, follow the current log """
+        if self.busy and not self.busy.is_alive() and self.done:
+            kind, result = self.done
+            self.busy, self.done = None, None
+            if kind == 'open':
+                if self.log:
+                    self.log.close()
+                self.log, self.matches = result, None
+                self.update_rows(follow=True, took=time.monotonic() - self.started)
+            elif kind == 'search' and not self.stop.is_set(): # not cleared while searching
+                self.matches, self.top = result, 0
+                self.update_rows(follow=False, took=time.monotonic() - self.started)
+            elif kind == 'refresh' and result:
+                self.update_rows()
+            elif kind == 'error':
+                self.label_status.configure(text=result)
+        elif self.busy is None and self.winfo_ismapped() and time.monotonic() - self.last_refresh > LOG_VIEW_REFRESH:
+            self.last_refresh = time.monotonic()
+            if self.log is None or (self.log.path == logfile.LOG_FILE and self.log.replaced()): # the current log was rotated
+                self.update_files()
+                self.open(logfile.LOG_FILE)
+            elif self.log.path == logfile.LOG_FILE:
+                self.run('refresh', self.log.refresh)
+        self.after(LOG_VIEW_TICK, self.tick)
+
+    def update_rows(self, follow=None, took=None):
+        """ Apply the level filter and the search. follow: show the last lines, default: if they were shown """
+        if self.log is None:
+            return
+        if follow is None:
+            follow = self.rows is None or self.top + self.visible() >= len(self.rows)
+        level = self.combo_level.get()
+        rows = self.log.rows(logview.LEVEL_NAMES[logview.LEVEL_NAMES.index(level):])
+        if self.matches is not None:
+            rows = self.matches[numpy.isin(self.matches, rows)]
+        self.rows = rows
+        if follow:
+            self.top = max(0, len(rows) - self.visible())
+        status = f"{len(rows):,} of {self.log.count:,} lines, {self.log.size / 1e6:.1f} MB"
+        if self.matches is not None:
+            status += f", {len(self.matches):,} matches"
+        if took is not None:
+            status += f" ({took * 1000:.0f} ms)"
+        self.label_status.configure(text=status)
+        self.render()
+
+    def visible(self):
+        """ The number of lines that fit in the textbox """
+        return max(1, self.text.winfo_height() // self.font.metrics('linespace'))
+
+    def scroll_by(self, lines):
+        self.top += lines
+        self.render()
+        return 'break'
+
+    def callback_scroll(self, action, *args):
+        """ Called by the scrollbar: ('moveto', fraction) or ('scroll', n, 'units'/'pages') """
+        if self.rows is None:
+            return
+        if action == 'moveto':
+            self.top = int(float(args[0]) * len(self.rows))
+        elif action == 'scroll':
+            self.top += int(args[0]) * (self.visible() if args[1] == 'pages' else 1)
+        self.render()
+
+    def render(self):
+        """ Insert the lines that are visible, nothing else """
+        if self.rows is None:
+            return
+        count = self.visible()
+        self.top = max(0, min(self.top, len(self.rows) - count))
+        rows = self.rows[self.top:self.top + count]
+        self.text.configure(state='normal')
+        self.text.delete('1.0', tkinter.END)
+        for row, line in zip(rows, self.log.lines(rows)):
+            self.text.insert(tkinter.END, line + '\n', self.log.level(row) or 'INFO')
+        self.text.configure(state='disabled')
+        if len(self.rows):
+            self.scrollbar.set(self.top / len(self.rows), (self.top + len(rows)) / len(self.rows))
+        else:
+            self.scrollbar.set(0, 1)
+
+
 class DebugHandler(logging.Handler):
     """
     This class allows you to log to a Tkinter Text or ScrolledText widget
     It is inspired by: https://gist.github.com/moshekaplan/c425f861de7bbf28ef06
+
+    emit() only queues the record, it can be called from any thread and never touches Tk. The queue is drained
+    on the Tk thread every DEBUG_TICK ms: all lines of a tick are inserted with one insert per run of lines with
+    the same level, the textbox is kept at DEBUG_MAX_LINES lines and scrolled once.
+    A message that repeats the previous one is counted instead of queued again (coalesced). If more than
+    DEBUG_MAX_PENDING lines wait for the next tick the oldest are dropped. Both are reported in the textbox
     """
 
-    def __init__(self, textWidget):
+    def __init__(self, textWidget=None):
         logging.Handler.__init__(self)
+        self.text = None
+        self.pending = deque() # [line, level, (level, message), repeats]
+        self.dropped = 0 # totals, for the report line
+        self.coalesced = 0
+        self.reported = (0, 0)
+        if textWidget is not None:
+            self.attach(textWidget)
+
+    def attach(self, textWidget):
+        """ Start showing the lines in textWidget. Until then they are queued (the last DEBUG_MAX_PENDING) """
         self.text = textWidget
+        self.text.after(DEBUG_TICK, self.drain)
 
     def emit(self, record):
-        msg = self.format(record)
-
-        def append():
+        # called with the handler lock held
+        key = (record.levelname, record.getMessage())
+        if self.pending and self.pending[-1][2] == key:
+            self.pending[-1][3] += 1
+            self.coalesced += 1
+            return
+        if len(self.pending) >= DEBUG_MAX_PENDING:
+            self.pending.popleft()
+            self.dropped += 1
+        self.pending.append([self.format(record), record.levelname, key, 0])
+
+    def drain(self):
+        """ Show the queued lines. Runs on the Tk thread and schedules itself again """
+        self.acquire()
+        try:
+            pending, self.pending = self.pending, deque()
+            dropped, coalesced = self.dropped, self.coalesced
+        finally:
+            self.release()
+
+        if (dropped, coalesced) != self.reported:
+            pending.append([f"log window: {dropped - self.reported[0]} records dropped, "
+                            f"{coalesced - self.reported[1]} repeats coalesced", 'WARNING', None, 0])
+            self.reported = (dropped, coalesced)
+
+        if pending:
+            # group the lines into runs with the same level, one insert per run
+            runs = []
+            for line, level, key, repeats in pending:
+                if repeats:
+                    line += f" (repeated {repeats} more times)"
+                if runs and runs[-1][1] == level:
+                    runs[-1][0].append(line)
+                else:
+                    runs.append(([line], level))
             self.text.configure(state='normal')
-            self.text.insert(tkinter.END, msg + '\n', record.levelname)
+            for lines, level in runs:
+                self.text.insert(tkinter.END, '\n'.join(lines) + '\n', level)
+            # keep the last DEBUG_MAX_LINES lines
+            count = int(self.text.index('end-1c').split('.')[0])
+            if count > DEBUG_MAX_LINES:
+                self.text.delete('1.0', f"{count - DEBUG_MAX_LINES}.0")
             self.text.configure(state='disabled')
             # Autoscroll to the bottom
             self.text.yview(tkinter.END)
-        # This is necessary because we can't modify the Text from other threads
-        self.text.after(0, append)
+        self.text.after(DEBUG_TICK, self.drain)
 
 
 if __name__ == "__main__":
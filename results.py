@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Results store: one row per measurement in an append-only SQLite database (./results/results.db).
+
+A row is keyed by the 7-tuple (band ... channel), the DUT, the firmware and the time, and holds the outcome:
+
+    time, run, dut, fw, fw_checksum, mode, band, standard, rate, bw, core, country, channel,
+    status, error, elapsed, packets, per, rssi
+
+Every sweep also records its run (runs table) with the system definition it used, stored once per content
+(definitions table, zlib compressed). An incremental campaign compares against them, see campaign.py.
+
+The database runs in WAL mode, so queries (e.g. from another process) do not block a running sweep and a
+sweep does not block queries. Rows are buffered and inserted in batches of BATCH_SIZE in one transaction,
+a commit per row would cost a disk sync per measurement. Indexes on time, DUT, channel, rate/bw and the full
+combination let the usual questions use an index range instead of a full scan:
+
+    store = ResultStore()
+    store.query(rate='MCS9', bw='80MHz', channel='42', since=time.time() - 7 * 86400)
+
+    python3 results.py --rate MCS9 --bw 80MHz --channel 42 --since 7d
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime
+
+from definition import LEVELS
+
+RESULTS_DB = './results/results.db'
+BATCH_SIZE = 500 # rows per insert transaction
+
+COLUMNS = ('time', 'run', 'dut', 'fw', 'fw_checksum', 'mode', *LEVELS, 'status', 'error', 'elapsed', 'packets',
+           'per', 'rssi')
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,
+    run TEXT,
+    dut TEXT,
+    fw TEXT,
+    fw_checksum TEXT,
+    mode TEXT NOT NULL,
+    {', '.join(f'{level} TEXT' for level in LEVELS)},
+    status TEXT NOT NULL,
+    error TEXT,
+    elapsed REAL,
+    packets INTEGER,
+    per REAL,
+    rssi REAL
+);
+CREATE INDEX IF NOT EXISTS results_time ON results (time);
+CREATE INDEX IF NOT EXISTS results_dut ON results (dut, time);
+CREATE INDEX IF NOT EXISTS results_channel ON results (channel, time);
+CREATE INDEX IF NOT EXISTS results_rate ON results (rate, bw, time);
+CREATE INDEX IF NOT EXISTS results_combination ON results ({', '.join(LEVELS)}, time);
+CREATE INDEX IF NOT EXISTS results_latest ON results (fw, mode, {', '.join(LEVELS)}, time);
+CREATE TABLE IF NOT EXISTS definitions (
+    digest TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    run TEXT PRIMARY KEY,
+    time REAL NOT NULL,
+    definition TEXT REFERENCES definitions (digest),
+    fw TEXT,
+    fw_checksum TEXT,
+    steps INTEGER
+);
+"""
+
+_COLUMN_SET = frozenset(COLUMNS)
+
+# the columns that can be filtered on in query()
+FILTERS = ('run', 'dut', 'fw', 'fw_checksum', 'mode', *LEVELS, 'status')
+
+
+def run_id():
+    """ An id for the rows of one sweep, e.g. '20240611-143005-12345' """
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+
+
+def parse_time(text):
+    """ '7d', '12h', '30m' (ago), an ISO date/time or unix seconds --> unix seconds """
+    units = {'d': 86400, 'h': 3600, 'm': 60, 's': 1}
+    if text[-1:] in units and text[:-1].replace('.', '', 1).isdigit():
+        return time.time() - float(text[:-1]) * units[text[-1]]
+    try:
+        return float(text)
+    except ValueError:
+        return datetime.fromisoformat(text).timestamp()
+
+
+class ResultStore:
+
+    def __init__(self, path=RESULTS_DB, batch_size=BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.pending = []
+        self.lock = threading.Lock() # rows come from one thread per DUT in a pool sweep
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL') # WAL + NORMAL: a crash can lose the last commit, never corrupt
+        self.db.executescript(SCHEMA)
+
+    def add(self, **row):
+        """ Buffer one result, see COLUMNS. time defaults to now. Unknown keys are an error """
+        unknown = row.keys() - _COLUMN_SET
+        if unknown:
+            raise KeyError(f"unknown result field(s) {', '.join(sorted(unknown))}")
+        row.setdefault('time', time.time())
+        values = tuple(row.get(column) for column in COLUMNS)
+        with self.lock:
+            self.pending.append(values)
+            if len(self.pending) >= self.batch_size:
+                self._flush()
+
+    def add_many(self, rows):
+        for row in rows:
+            self.add(**row)
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        if not self.pending:
+            return
+        with self.db:
+            self.db.executemany(f"INSERT INTO results ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                                self.pending)
+        self.pending = []
+
+    def _where(self, since, until, filters):
+        clauses, params = [], []
+        for field, value in filters.items():
+            if field not in FILTERS:
+                raise KeyError(field)
+            if value is None:
+                continue
+            if isinstance(value, (str, int, float)):
+                clauses.append(f"{field} = ?")
+                params.append(str(value) if field in LEVELS else value)
+            else:
+                value = list(value)
+                clauses.append(f"{field} IN ({', '.join('?' * len(value))})")
+                params += value
+        if since is not None:
+            clauses.append("time >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("time < ?")
+            params.append(until)
+        return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+    def query(self, since=None, until=None, limit=None, **filters):
+        """
+        Yield the matching rows (dicts) oldest first. A filter is a value or a list of values, e.g.
+        query(rate='MCS9', channel=['36', '40'], since=time.time() - 86400)
+        """
+        self.flush()
+        where, params = self._where(since, until, filters)
+        sql = f"SELECT {', '.join(COLUMNS)} FROM results{where} ORDER BY time"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        for row in self.db.execute(sql, params):
+            yield dict(row)
+
+    def count(self, since=None, until=None, **filters):
+        self.flush()
+        where, params = self._where(since, until, filters)
+        return self.db.execute(f"SELECT COUNT(*) FROM results{where}", params).fetchone()[0]
+
+    def latest(self, mode=None, fw=None, fw_checksum=None):
+        """
+        {(mode, band, ..., channel): (status, time)} of the newest result of every combination with this firmware.
+        fw/fw_checksum None: the results without a recorded firmware (checksum), not those of any firmware
+        """
+        self.flush()
+        where, params = self._where(None, None, {'mode': mode})
+        for field, value in (('fw', fw), ('fw_checksum', fw_checksum)):
+            where += (' AND ' if where else ' WHERE ') + (f"{field} IS NULL" if value is None else f"{field} = ?")
+            params += [] if value is None else [value]
+        key = ', '.join(('mode', *LEVELS))
+        # with MAX() sqlite takes the other columns from the row with the max
+        sql = f"SELECT {key}, status, MAX(time) FROM results{where} GROUP BY {key}"
+        return {tuple(row[:-2]): (row[-2], row[-1]) for row in self.db.execute(sql, params)}
+
+    def add_definition(self, definition_text):
+        """ Store a system definition (json text) once per content, returns its digest for record_run() """
+        data = definition_text.encode() if isinstance(definition_text, str) else definition_text
+        digest = hashlib.sha256(data).hexdigest()
+        with self.lock, self.db:
+            self.db.execute("INSERT OR IGNORE INTO definitions (digest, data) VALUES (?, ?)", (digest, zlib.compress(data)))
+        return digest
+
+    def record_run(self, run, definition, fw=None, fw_checksum=None, steps=None):
+        """ Remember a sweep and the system definition it used (the digest from add_definition()) """
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO runs (run, time, definition, fw, fw_checksum, steps) VALUES (?, ?, ?, ?, ?, ?)",
+                            (run, time.time(), definition, fw, fw_checksum, steps))
+
+    def last_definition(self, before=None):
+        """ The system definition (json text) of the newest run (before the run id 'before'), None if there is none """
+        sql = "SELECT d.data FROM runs r JOIN definitions d ON d.digest = r.definition"
+        params = []
+        if before:
+            sql += " WHERE r.run != ?"
+            params.append(before)
+        row = self.db.execute(sql + " ORDER BY r.time DESC LIMIT 1", params).fetchone()
+        return zlib.decompress(row[0]).decode() if row else None
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Query the measurement results')
+    parser.add_argument('--db', default=RESULTS_DB, help=f'results database (default {RESULTS_DB})')
+    for field in FILTERS:
+        parser.add_argument(f"--{field.replace('_', '-')}", dest=field, metavar='VALUE',
+                            help='comma separated for several values')
+    parser.add_argument('--since', help="'7d', '12h', an ISO date/time or unix seconds")
+    parser.add_argument('--until', help='same formats as --since')
+    parser.add_argument('--limit', type=int)
+    parser.add_argument('--count', action='store_true', help='only print the number of rows')
+    args = parser.parse_args(argv)
+
+    filters = {}
+    for field in FILTERS:
+        value = getattr(args, field)
+        if value is not None:
+            values = value.split(',')
+            filters[field] = values[0] if len(values) == 1 else values
+    try:
+        since = parse_time(args.since) if args.since else None
+        until = parse_time(args.until) if args.until else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    store = ResultStore(args.db)
+    try:
+        if args.count:
+            print(store.count(since, until, **filters))
+            return 0
+        for row in store.query(since, until, args.limit, **filters):
+            print(json.dumps(row))
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,45 @@
+"""
+Fixed-size numpy ring buffer for the samples that the monitors poll from the DUTs (Rx counters in rx.py, Tx
+telemetry in telemetry.py). It has one row per field (e.g. time, good, bad, rssi) and one column per sample:
+adding samples writes into the preallocated array, nothing is allocated per sample and the memory stays the
+same however long a test runs. The oldest samples are overwritten.
+"""
+
+import threading
+
+import numpy as np
+
+
+class Ring:
+
+    def __init__(self, size, rows):
+        self.size = size
+        self.data = np.full((rows, size), np.nan)
+        self.end = 0 # total number of samples ever added
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.end, self.size)
+
+    def extend(self, samples):
+        """ samples: an array with one row per field and one column per sample """
+        samples = np.asarray(samples, dtype=float)[:, -self.size:]
+        n = samples.shape[1]
+        with self.lock:
+            start = self.end % self.size
+            first = min(n, self.size - start)
+            self.data[:, start:start + first] = samples[:, :first]
+            self.data[:, :n - first] = samples[:, first:]
+            self.end += n
+
+    def last(self, n):
+        """ A copy of the last n samples (oldest first) """
+        with self.lock:
+            n = min(n, len(self))
+            index = np.arange(self.end - n, self.end) % self.size
+            return self.data[:, index]
+
+    def clear(self):
+        with self.lock:
+            self.data.fill(np.nan)
+            self.end = 0
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Rule based system definition: a compact source format that is compiled to the same index as the full tree
+(see definition.py), so the Tx/Rx menus, the sweeps and the results do not know which format was used.
+
+The full tree spells out every band -> standard -> rate -> bw -> core -> country -> [channels] leaf, a new
+country or core means copying it under every rate. The rule format states each fact once:
+
+    {
+      "rules": 1,
+      "cores": ["core0", "core1", "MIMO"],
+      "channels": {                                   channel sets per band, bw and country
+        "2.4GHz": {"20MHz": {"ALL": "1-13", "US": "1-11"}},
+        "5GHz":   {"20MHz": {"ALL": "32-64/4 68 96-144/4 149-165/4"}, ...}
+      },
+      "rates": {"ofdm": ["6Mbps", "9Mbps", ...], "vht": "MCS0-9"},     named rate tables
+      "standards": {                                  per band: the rate table, bandwidths and (optionally) cores
+        "5GHz": {"11ac": {"rates": "vht", "bw": ["20MHz", "40MHz", "80MHz"]}, ...}
+      },
+      "exclude": [{"band": "2.4GHz", "standard": "11ac", "rate": "MCS9"}]
+    }
+
+Channels and rates are lists or strings of space separated items, where "32-64/4" is 32, 36, ..., 64 and
+"MCS0-9" is MCS0 ... MCS9. The countries of a bandwidth are the keys of its channel sets. An exclusion is a
+{level: value or [values]} filter, the matching combinations are removed (a level that is left without options
+is removed too). definition.load() and definition.loads() accept both formats:
+
+    python3 rules.py system-definition.rules.json --check system-definition.json
+    python3 rules.py system-definition.rules.json --expand full.json
+"""
+
+import argparse
+import json
+import re
+import sys
+
+import definition
+from definition import LEVELS, DefinitionError
+
+_RANGE = re.compile(r'^(\D*)(\d+)-(\d+)(?:/(\d+))?$')
+
+
+def expand(items):
+    """ 'MCS0-3 MCS7' --> ['MCS0', 'MCS1', 'MCS2', 'MCS3', 'MCS7'], '36-48/4' --> ['36', '40', '44', '48']. Lists are kept """
+    if isinstance(items, list):
+        return [str(item) for item in items]
+    if not isinstance(items, str):
+        raise DefinitionError(f"expected a list or a string, not {items!r}")
+    result = []
+    for item in items.split():
+        match = _RANGE.match(item)
+        if match:
+            prefix, first, last, step = match.groups()
+            result += [f"{prefix}{n}" for n in range(int(first), int(last) + 1, int(step or 1))]
+        else:
+            result.append(item)
+    return result
+
+
+def _matcher(rule):
+    """ {level: value or [values]} --> function(level, prefix tuple) telling if the prefix is excluded at that level """
+    unknown = set(rule) - set(LEVELS)
+    if unknown:
+        raise DefinitionError(f"unknown level(s) in exclude: {', '.join(sorted(unknown))}")
+    wanted = [None if rule.get(level) is None else set(expand(rule[level]) if isinstance(rule[level], (str, list))
+                                                        else [str(rule[level])]) for level in LEVELS]
+    deepest = max(i for i, values in enumerate(wanted) if values is not None)
+
+    def excluded(prefix):
+        return len(prefix) == deepest + 1 and all(values is None or name in values
+                                                  for name, values in zip(prefix, wanted))
+    return excluded
+
+
+def compile_rules(rules):
+    """ Compile a parsed rule definition (dict) to a SystemDefinition """
+    if rules.get('rules') != 1:
+        raise DefinitionError("not a rule definition (version 1)")
+    try:
+        cores = expand(rules['cores'])
+        channels = {band: {bw: {country: expand(chans) for country, chans in countries.items()}
+                           for bw, countries in bws.items()} for band, bws in rules['channels'].items()}
+        rates = {name: expand(table) for name, table in rules.get('rates', {}).items()}
+        standards = rules['standards']
+    except (KeyError, AttributeError) as e:
+        raise DefinitionError(f"bad rule definition: {e}")
+    exclusions = [_matcher(rule) for rule in rules.get('exclude', [])]
+    builder = definition._Builder()
+
+    def excluded(prefix):
+        return any(rule(prefix) for rule in exclusions)
+
+    def node(prefix, names, kid):
+        """ The node with the names that are not excluded, None if there are none left """
+        keys, kids = [], []
+        for name in names:
+            path = prefix + (name,)
+            if excluded(path):
+                continue
+            child = kid(path)
+            if child is not None:
+                keys.append(name)
+                kids.append(child)
+        return builder.object_pairs_hook(list(zip(keys, kids))) if keys else None
+
+    def channel_node(prefix):
+        band, _, _, bw, _, country = prefix
+        chans = [c for c in channels[band][bw][country] if not excluded(prefix + (c,))]
+        return builder.leaf(chans) if chans else None
+
+    def standard_node(prefix):
+        band, standard = prefix
+        rule = standards[band][standard]
+        table = rule.get('rates')
+        names = rates[table] if isinstance(table, str) and table in rates else expand(table or [])
+        bws = expand(rule.get('bw', []))
+        missing = [bw for bw in bws if bw not in channels.get(band, {})]
+        if missing:
+            raise DefinitionError(f"{band} {standard}: no channels for {', '.join(missing)}")
+        standard_cores = expand(rule['cores']) if 'cores' in rule else cores
+        # rate -> bw -> core -> country -> channels
+        return node(prefix, names, lambda path: node(path, bws, lambda path: node(
+            path, standard_cores, lambda path: node(path, list(channels[band][path[3]]), channel_node))))
+
+    try:
+        root = node((), list(standards), lambda band: node(band, list(standards[band[0]]), standard_node))
+    except (KeyError, TypeError) as e:
+        raise DefinitionError(f"bad rule definition: {e}")
+    if root is None:
+        raise DefinitionError("the rule definition has no combinations")
+    return builder.build(root)
+
+
+def loads(text):
+    return compile_rules(json.loads(text))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compile a rule based system definition')
+    parser.add_argument('rules', help='rule definition (json)')
+    parser.add_argument('--check', metavar='JSON', help='check that it gives the same combinations as this full definition')
+    parser.add_argument('--expand', metavar='JSON', help='write the full tree to this file')
+    args = parser.parse_args(argv)
+
+    with open(args.rules, 'rb') as f:
+        data = loads(f.read())
+    print(f"{args.rules}: {data.count()} combinations, {data.stats()['unique_nodes']} unique nodes")
+    if args.expand:
+        with open(args.expand, 'w') as f:
+            json.dump(data.to_dict(), f, indent=4)
+    if args.check:
+        full = definition.load(args.check, cache_dir=None)
+        if list(full.combinations()) != list(data.combinations()): # also the order of the options
+            expected, got = set(full.combinations()), set(data.combinations())
+            print(f"differs from {args.check}: {len(expected - got)} combinations missing, {len(got - expected)} extra")
+            for combination in sorted(expected - got)[:10]:
+                print(f"  missing {' '.join(combination)}")
+            for combination in sorted(got - expected)[:10]:
+                print(f"  extra   {' '.join(combination)}")
+            return 1
+        print(f"same as {args.check}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
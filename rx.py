@@ -0,0 +1,151 @@
+"""
+Rx PER measurement. While an Rx test runs, the DUT packet counters are polled with the rx_counters action:
+the rx_counters.py control script (or rx_counters() of a worker backend) prints one json object with the
+cumulative counters since rx_start, or a list of them if the DUT buffers samples:
+
+    {"good": 9871, "bad": 129, "rssi": -52.5}
+    [{"t": 12.10, "good": 9871, "bad": 129, "rssi": -52.5}, ...]
+
+'t' (seconds, any origin) is the DUT time of the sample, the poll time is used when it is missing.
+The samples go into a fixed-size numpy ring buffer (ring.Ring with the rows time, good, bad, rssi) and the
+statistics are computed on the last 'window' samples with vectorized numpy math, see rx_stats(). Nothing is
+allocated per sample.
+
+RxMonitor polls one DUT on its own thread and stops the Rx test (rx_stop) when the requested number of
+packets has been received. It polls every POLL_INTERVAL through a dut_worker.py process (WorkerControl), but
+only every SCRIPT_POLL_INTERVAL with the control scripts (DutControl), where every poll starts a process.
+A poll that takes longer is followed by at least as long a pause. The GUI reads monitor.stats() at its own,
+throttled, rate: a fast counter stream only costs the monitor thread, never the Tk event loop.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from dut import DutError, WorkerControl
+from ring import Ring
+
+logger = logging.getLogger('wltrx-gui')
+
+RING_SIZE = 4096 # samples
+WINDOW = 50 # samples for the rolling statistics
+POLL_INTERVAL = 0.1 # seconds, through a persistent worker
+SCRIPT_POLL_INTERVAL = 1.0 # seconds, every poll runs rx_counters.py
+
+# per: over the whole test, rolling_per and the rssi/rate: over the window. nan when not known (yet)
+RxStats = namedtuple('RxStats', ['packets', 'good', 'bad', 'per', 'rolling_per', 'rssi_mean', 'rssi_std', 'rate'])
+
+EMPTY_STATS = RxStats(0, 0, 0, float('nan'), float('nan'), float('nan'), float('nan'), 0.0)
+
+
+def rx_stats(ring, window=WINDOW):
+    """ Statistics of the ring buffer. The rolling values are over the last window samples """
+    if not len(ring):
+        return EMPTY_STATS
+    t, good, bad, rssi = ring.last(window + 1) # one more sample for the counter deltas
+    packets = int(good[-1] + bad[-1])
+    per = bad[-1] / packets if packets else float('nan')
+
+    received = (good[-1] - good[0]) + (bad[-1] - bad[0])
+    rolling_per = (bad[-1] - bad[0]) / received if received > 0 else per
+    duration = t[-1] - t[0]
+    rate = received / duration if duration > 0 else 0.0
+
+    rssi = rssi[-window:]
+    rssi = rssi[~np.isnan(rssi)]
+    rssi_mean = float(rssi.mean()) if rssi.size else float('nan')
+    rssi_std = float(rssi.std()) if rssi.size > 1 else float('nan')
+    return RxStats(packets, int(good[-1]), int(bad[-1]), float(per), float(rolling_per), rssi_mean, rssi_std,
+                   float(rate))
+
+
+def parse_counters(output, now):
+    """ rx_counters output --> array of samples (see Ring.extend), None if it has no counters """
+    try:
+        counters = json.loads(output.strip().splitlines()[-1])
+    except (ValueError, IndexError):
+        return None
+    if isinstance(counters, dict):
+        counters = [counters]
+    if not isinstance(counters, list):
+        return None
+    # a sample without the packet counters is skipped, like output that can not be parsed
+    samples = [[sample.get('t', now), sample['good'], sample['bad'], np.nan if sample.get('rssi') is None else sample['rssi']]
+               for sample in counters
+               if isinstance(sample, dict) and sample.get('good') is not None and sample.get('bad') is not None]
+    if not samples:
+        return None
+    try:
+        return np.array(samples, dtype=float).T
+    except (TypeError, ValueError):
+        return None
+
+
+def poll_interval(control, interval=None):
+    """ interval if given, else the default for control: fast only through a worker """
+    if interval is not None:
+        return interval
+    return POLL_INTERVAL if isinstance(control, WorkerControl) else SCRIPT_POLL_INTERVAL
+
+
+class RxMonitor:
+    """ Polls the Rx counters of one DUT until stop() or until packets packets have been received """
+
+    def __init__(self, control, packets=None, interval=None, size=RING_SIZE, window=WINDOW, timeout=None):
+        self.control = control
+        self.packets = packets
+        self.interval = poll_interval(control, interval)
+        self.window = window
+        self.timeout = timeout
+        self.ring = Ring(size, rows=4)
+        self.stopped = threading.Event()
+        self.done = threading.Event()
+        self.error = None
+        self._stats = EMPTY_STATS
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='rx-monitor', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def stats(self):
+        """ The statistics of the last poll, cheap enough for every GUI refresh """
+        return self._stats
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+    def _run(self):
+        start = time.monotonic()
+        try:
+            while not self.stopped.is_set():
+                polled = time.monotonic()
+                result = self.control.rx_counters(timeout=self.interval * 10 + 1).result()
+                if result.returncode != 0:
+                    raise DutError(f"rx_counters failed: {result.output}")
+                samples = parse_counters(result.output, polled - start)
+                if samples is not None:
+                    self.ring.extend(samples)
+                    self._stats = rx_stats(self.ring, self.window)
+                if self.packets and self._stats.packets >= self.packets:
+                    logger.info(f"{self.control.ip or 'DUT'}: {self._stats.packets} packets received, Rx stopped")
+                    self.control.rx_stop().result()
+                    break
+                if self.timeout and polled - start > self.timeout:
+                    logger.warning(f"{self.control.ip or 'DUT'}: Rx timed out after {self.timeout} s")
+                    break
+                busy = time.monotonic() - polled
+                self.stopped.wait(max(self.interval - busy, busy))
+        except Exception as e:
+            self.error = e
+            logger.error(f"{self.control.ip or 'DUT'}: Rx monitor stopped: {e}")
+        finally:
+            self.done.set()
@@ -0,0 +1,103 @@
+"""
+Retune-cost-aware ordering of sweep steps.
+
+Reprogramming the DUT costs time and the cost depends on what changes: a band or bandwidth change is
+much slower than a rate change. A cost model gives the (estimated) seconds to change a field:
+
+    DEFAULT_COSTS: band > bw > channel > core > standard/country > rate
+
+order() sorts the steps so that the expensive fields change as seldom as possible: the steps are grouped on
+the most expensive field, inside every group on the next one and so on. At every level the group that
+continues with the value the DUT already has is taken first (greedy), so e.g. the channel is kept when the
+bandwidth changes if the next bandwidth has that channel too. It is O(n log n), fine for big matrices.
+
+estimate() adds up the transition costs and the Tx durations of a plan, so the sweep runner can report
+the estimated against the actual time.
+"""
+
+import json
+
+# seconds to change a field on the DUT. Switching between Tx and Rx steps is a field too ('mode')
+DEFAULT_COSTS = {
+    'mode': 10.0,
+    'band': 5.0,
+    'bw': 2.0,
+    'channel': 1.0,
+    'core': 0.5,
+    'standard': 0.2,
+    'country': 0.2,
+    'rate': 0.1,
+}
+
+
+def load_costs(path):
+    """ A json object {field: seconds}, fields that are not given keep their default cost """
+    with open(path) as f:
+        costs = json.load(f)
+    unknown = set(costs) - set(DEFAULT_COSTS)
+    if unknown:
+        raise ValueError(f"{path}: unknown field(s) {', '.join(sorted(unknown))}")
+    return {**DEFAULT_COSTS, **{field: float(cost) for field, cost in costs.items()}}
+
+
+def changed(previous, step, costs=DEFAULT_COSTS):
+    """ The fields that have to be reprogrammed to go from previous to step (all of them if previous is None) """
+    if previous is None:
+        return [field for field in costs if step.get(field) is not None]
+    return [field for field in costs if step.get(field) is not None and step.get(field) != previous.get(field)]
+
+
+def transition(previous, step, costs=DEFAULT_COSTS):
+    return sum(costs[field] for field in changed(previous, step, costs))
+
+
+def estimate(steps, costs=DEFAULT_COSTS, start=None):
+    """ Estimated seconds for the steps in this order: reprogramming plus Tx time """
+    total = 0.0
+    previous = start
+    for step in steps:
+        total += transition(previous, step, costs) + float(step.get('duration') or 0)
+        previous = step
+    return total
+
+
+def order(steps, costs=DEFAULT_COSTS, start=None):
+    """ The steps in an order with a low total reprogramming cost. start is the current DUT state, if known """
+    fields = sorted(costs, key=costs.get, reverse=True)
+    out = []
+
+    def arrange(group, level, previous):
+        if level == len(fields) or len(group) < 2:
+            out.extend(group)
+            return
+        field = fields[level]
+        groups = {}
+        for step in group:
+            groups.setdefault(step.get(field), []).append(step)
+        keep = previous.get(field) if previous else None
+        values = sorted(groups, key=lambda value: (value != keep, _sort_key(value)))
+        for value in values:
+            arrange(groups[value], level + 1, out[-1] if out else previous)
+
+    arrange(list(steps), 0, start)
+    return out
+
+
+def _sort_key(value):
+    """ Natural order: channels and rates as numbers where possible ('6' < '36', 'MCS2' < 'MCS10') """
+    if value is None:
+        return ((0, ''),)
+    text = str(value)
+    key = []
+    number = ''
+    for c in text:
+        if c.isdigit():
+            number += c
+            continue
+        if number:
+            key.append((1, int(number)))
+            number = ''
+        key.append((2, c))
+    if number:
+        key.append((1, int(number)))
+    return tuple(key)
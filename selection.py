@@ -0,0 +1,90 @@
+"""
+Selection state for the Tx combo boxes, independent of Tk so that it can be tested and benchmarked alone.
+
+The fields can be chosen in any order (e.g. the channel first). Every field shows the options that are valid
+with the other chosen fields, looked up in a constraint table (see constraints.py). A value that conflicts with
+earlier choices (e.g. set from a sweep or a reloaded definition) clears those. A change costs one
+table.remaining() call (one per chosen field after a conflict). That does not depend on which field changed,
+but it grows with the number of table rows that match two or more chosen values, see bench/bench_selection.py.
+"""
+
+from collections import namedtuple
+
+from definition import LEVELS
+
+# options: {level: tuple} for the levels that got new options. An empty tuple means the level is disabled
+# values:  {level: value} for the levels where the selected value changed (cleared levels get '')
+Diff = namedtuple('Diff', ['options', 'values'])
+
+
+class AnySelection:
+
+    def __init__(self, table):
+        self.table = table
+        self.values = [''] * len(LEVELS)
+        self.options = [()] * len(LEVELS)
+        self._update(Diff({}, {}))
+
+    def __getitem__(self, level):
+        return self.values[LEVELS.index(level)]
+
+    def get(self):
+        """ The selection as a dict, e.g. {'band': '5GHz', 'standard': '', ..., 'channel': '36'} """
+        return dict(zip(LEVELS, self.values))
+
+    def is_complete(self):
+        """ True when every field has a valid value, i.e. a full valid combination """
+        return all(value and value in options for value, options in zip(self.values, self.options))
+
+    def _update(self, diff):
+        """ Look up the options of all fields and add the ones that changed to diff """
+        remaining = self.table.remaining(**self.get())
+        for i, level in enumerate(LEVELS):
+            options = remaining[level]
+            if options != self.options[i]:
+                self.options[i] = options
+                diff.options[level] = options
+        return diff
+
+    def _keep_valid(self, diff, first=None):
+        """
+        Keep the chosen values that go together: first (a level) and then the others in LEVELS order, each one if it
+        is valid with the ones kept before it. The others are cleared. Returns diff with the new options
+        """
+        kept = {first: self[first]} if first else {}
+        for i, level in enumerate(LEVELS):
+            value = self.values[i]
+            if not value or level == first:
+                continue
+            if value in self.table.remaining(**kept)[level]:
+                kept[level] = value
+            else:
+                self.values[i] = ''
+                diff.values[level] = ''
+        return self._update(diff)
+
+    def select(self, level, value):
+        """
+        Choose value on level and return a Diff with the options and values that changed. The earlier choices that do
+        not go with it are cleared. A value that is not in the definition at all is kept and leaves the other fields
+        without options
+        """
+        i = LEVELS.index(level)
+        diff = Diff({}, {})
+        if self.values[i] != value:
+            self.values[i] = value
+            diff.values[level] = value
+        if value and value not in self.options[i] and value in self.table.values[level]:
+            return self._keep_valid(diff, first=level)
+        return self._update(diff)
+
+    def rebase(self, table):
+        """ Switch to the constraint table of another (reloaded) definition, the values that are not valid are cleared """
+        self.table = table
+        return self._keep_valid(Diff({}, {}))
+
+    def reset(self):
+        """ Clear everything, every field shows all its options """
+        diff = Diff({}, {level: '' for level, value in self.get().items() if value})
+        self.values = [''] * len(LEVELS)
+        return self._update(diff)
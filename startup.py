@@ -0,0 +1,46 @@
+"""
+Startup timing of the GUI: the time from the start of main.py to the first paint of the main window, split in
+phases (import, definition load, widget build, first paint). Every start is logged and appended as a json line
+to ./logs/startup.jsonl, so the time-to-interactive can be compared between releases:
+
+    {"time": 1718109005.1, "import": 0.412, "definition": 0.051, "widgets": 0.118, "first paint": 0.083, "total": 0.664}
+"""
+
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger('wltrx-gui')
+
+STARTUP_LOG = './logs/startup.jsonl'
+
+
+class StartupTimer:
+
+    def __init__(self, start=None):
+        """ start: a time.perf_counter() value taken before the imports, now if not given """
+        self.start = time.perf_counter() if start is None else start
+        self.last = self.start
+        self.phases = {}
+
+    def mark(self, phase):
+        """ End a phase: its time is the time since the last mark """
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self.last
+        self.last = now
+
+    def report(self, path=STARTUP_LOG):
+        total = self.last - self.start
+        logger.info("startup: " + ', '.join(f"{phase} {seconds:.3f} s" for phase, seconds in self.phases.items())
+                    + f", total {total:.3f} s")
+        record = {'time': round(time.time(), 1), **{phase: round(seconds, 3) for phase, seconds in self.phases.items()},
+                  'total': round(total, 3)}
+        try:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+        except OSError as e:
+            logger.warning(f"could not write {path}: {e}")
+        return record
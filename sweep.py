@@ -0,0 +1,553 @@
+#!/usr/bin/env python3
+"""
+Headless sweep runner. Runs Tx/Rx steps through the DUT control scripts without loading any GUI module,
+so it starts fast and runs on machines without a display (CI, rack PCs, overnight sweeps).
+
+A sweep plan is either a json file or a filter expression over the system definition:
+
+    python3 sweep.py --ip 192.168.1.10 --tx "band=5GHz bw=80MHz core=MIMO country=ALL" --duration 2
+    python3 sweep.py --ip 192.168.1.10 --rx "band=2.4GHz channel=1,6,11" --packets 1000
+    python3 sweep.py plan.json --jsonl results.jsonl
+    python3 sweep.py --worker mock --tx "band=2.4GHz standard=11b" --duration 0
+    python3 sweep.py --ip 192.168.1.10,192.168.1.11,192.168.1.12 --fw MFG --tx "band=5GHz"
+
+With several IPs the steps are shared over the DUTs, which run in parallel (see PoolSweep).
+--order cost reorders the plan to minimize the DUT reprogramming time (see schedule.py), the estimated time
+is reported at the start and next to the actual time at the end.
+
+--worker sends the commands to a persistent dut_worker.py instead of starting a control script per command.
+
+Every step that runs is stored in the results database (see results.py), --no-results turns that off.
+Every sweep is journaled, an interrupted sweep goes on with --resume (see journal.py).
+--incremental only runs the steps that are new, changed, failed or stale since the last run (see campaign.py).
+
+--fw skips the load on a DUT that already runs that firmware (see firmware.py), --force-fw always loads it.
+
+The json plan is a list of steps, or an object {"ip": ..., "fw": ..., "steps": [...]}. A step is
+    {"mode": "tx", "band": "5GHz", "standard": "11ac", "rate": "MCS9", "bw": "80MHz", "core": "MIMO",
+     "country": "ALL", "channel": "42", "duration": 2}
+    {"mode": "rx", "band": "5GHz", "core": "core0", "channel": "36", "packets": 1000}
+
+Progress is printed to stdout, --jsonl writes one json object per event to a file ('-' for stdout).
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import wait
+
+import campaign
+import definition
+import firmware
+import journal
+import logfile
+import results
+import schedule
+from definition import LEVELS
+from dut import DutControl, WorkerControl
+from dutpool import DutPool, parse_ips
+
+logger = logging.getLogger('wltrx-gui')
+
+RX_FIELDS = ('band', 'core', 'channel')
+
+# a DUT in a pool sweep that fails this many steps in a row is taken out of the sweep
+MAX_CONSECUTIVE_FAILURES = 3
+
+
+def parse_filter(expression):
+    """ 'band=5GHz bw=80MHz country=US,ALL' --> {'band': '5GHz', 'bw': '80MHz', 'country': {'US', 'ALL'}} """
+    filters = {}
+    for token in expression.split():
+        level, sep, value = token.partition('=')
+        if not sep or level not in LEVELS or not value:
+            raise ValueError(f"bad filter '{token}', use <level>=<value>[,<value>...] with level one of {', '.join(LEVELS)}")
+        values = value.split(',')
+        filters[level] = values[0] if len(values) == 1 else set(values)
+    return filters
+
+
+def tx_steps(data, expression, duration):
+    for combination in data.combinations(**parse_filter(expression)):
+        yield dict(mode='tx', **dict(zip(LEVELS, combination)), duration=duration)
+
+
+def rx_steps(data, expression, packets):
+    seen = set()
+    for combination in data.combinations(**parse_filter(expression)):
+        key = tuple(combination[LEVELS.index(field)] for field in RX_FIELDS)
+        if key not in seen:
+            seen.add(key)
+            yield dict(mode='rx', **dict(zip(RX_FIELDS, key)), packets=packets)
+
+
+def load_plan(path):
+    with open(path) as f:
+        plan = json.load(f)
+    if isinstance(plan, list):
+        plan = {'steps': plan}
+    if not isinstance(plan.get('steps'), list):
+        raise ValueError(f"{path}: the plan must be a list of steps or an object with a 'steps' list")
+    return plan
+
+
+def check_step(data, step):
+    """ Returns an error string if the step is not valid, otherwise None """
+    mode = step.get('mode')
+    if mode == 'tx':
+        missing = [level for level in LEVELS if not step.get(level)]
+        if missing:
+            return f"missing {', '.join(missing)}"
+        if not data.is_valid(*(step[level] for level in LEVELS)):
+            return "not a valid combination in the system definition"
+    elif mode == 'rx':
+        missing = [field for field in RX_FIELDS if not step.get(field)]
+        if missing:
+            return f"missing {', '.join(missing)}"
+        if not data.count(**{field: step[field] for field in RX_FIELDS}):
+            return "not a valid band/core/channel in the system definition"
+    else:
+        return f"unknown mode {mode!r}"
+    return None
+
+
+class Reporter:
+    """ Human readable progress on stdout and (optionally) one json object per event """
+
+    def __init__(self, jsonl=None, quiet=False):
+        self.lock = threading.Lock() # events come from one thread per DUT in a pool sweep
+        self.quiet = quiet
+        self.jsonl = None
+        if jsonl == '-':
+            self.jsonl = sys.stdout
+            self.quiet = True
+        elif jsonl:
+            self.jsonl = open(jsonl, 'a')
+
+    def event(self, event, **fields):
+        with self.lock:
+            if self.jsonl:
+                self.jsonl.write(json.dumps({'event': event, 'time': time.time(), **fields}) + '\n')
+                self.jsonl.flush()
+            if not self.quiet:
+                print(self.format(event, fields), flush=True)
+
+    def format(self, event, fields):
+        if event == 'step':
+            step = fields['step']
+            what = ' '.join(str(step[key]) for key in (LEVELS if step.get('mode') in ('tx', 'link') else RX_FIELDS) if key in step)
+            line = f"[{fields['index'] + 1}/{fields['total']}] {step.get('mode')} {what}: {fields['status']} ({fields['elapsed']:.2f} s)"
+            if fields.get('ip'):
+                line = f"{fields['ip']} {line}"
+            if fields.get('error'):
+                line += f" - {fields['error']}"
+            return line
+        return f"{event}: " + ', '.join(f"{key}={value}" for key, value in fields.items())
+
+    def close(self):
+        if self.jsonl and self.jsonl is not sys.stdout:
+            self.jsonl.close()
+
+
+class SweepRunner:
+
+    def __init__(self, dut, data, reporter, timeout=None, force_fw=False, store=None, run=None, journal=None):
+        """ store: a results.ResultStore for the measurements, run: the run id of the rows, journal: see journal.py """
+        self.dut = dut
+        self.data = data
+        self.reporter = reporter
+        self.timeout = timeout
+        self.force_fw = force_fw
+        self.store = store
+        self.journal = journal
+        self.run_id = run or results.run_id()
+        self.fw = None # the firmware of the sweep and the checksum of its image, if given
+        self.fw_checksum = None
+        self.previous = None # the last step that was sent to the DUT
+        self.aborted = False
+
+    def run(self, steps, fw=None, checksum=None, estimated=None, indices=None):
+        """
+        fw, checksum: the firmware of the sweep (loaded unless the DUT runs it) and its image checksum, both stored
+        with every result. None: the results have no firmware, whatever the DUT runs.
+        estimated: the estimated time of the plan (see schedule.py), reported next to the actual time.
+        indices: only run these steps (a resumed sweep), default all
+        """
+        steps = list(steps)
+        indices = range(len(steps)) if indices is None else indices
+        counts = {'ok': 0, 'failed': 0, 'invalid': 0}
+        start = time.monotonic()
+        self.fw, self.fw_checksum = fw, checksum
+        self.reporter.event('start', steps=len(indices), ip=self.dut.ip, run=self.run_id)
+        self.dut.connect()
+        if fw:
+            job = firmware.ensure_fw(self.dut, fw, force=self.force_fw, timeout=self.timeout)
+            result = job.result()
+            self.reporter.event('load_fw', fw=fw, returncode=result.returncode, elapsed=round(result.elapsed, 3),
+                                skipped=job.skipped)
+            if result.returncode != 0:
+                self.aborted = True
+                self.reporter.event('done', aborted=True, elapsed=round(time.monotonic() - start, 3), **counts)
+                return False
+        try:
+            for index in indices:
+                step = steps[index]
+                changed = schedule.changed(self.previous, step)
+                status, error, elapsed = self.run_step(step)
+                self.record(index, step, status, error, elapsed)
+                counts[status] += 1
+                self.reporter.event('step', index=index, total=len(steps), step=step, status=status,
+                                    error=error, elapsed=round(elapsed, 3), changed=changed)
+        except KeyboardInterrupt:
+            self.dut.tx_stop(timeout=self.timeout).result()
+            self.aborted = True
+            self.reporter.event('done', aborted=True, elapsed=round(time.monotonic() - start, 3), **counts)
+            return False
+        self.reporter.event('done', aborted=False, elapsed=round(time.monotonic() - start, 3), estimated=estimated,
+                            **counts)
+        return counts['failed'] == 0 and counts['invalid'] == 0
+
+    def record(self, index, step, status, error, elapsed):
+        """ Journal the step and store its result if it was run on the DUT """
+        logger.debug(f"{self.dut.ip or 'DUT'}: step {index} {status} in {elapsed:.2f} s",
+                     extra=logfile.fields(self.dut.ip, step, elapsed))
+        if self.journal:
+            self.journal.step(index, step, status, error, elapsed, ip=self.dut.ip)
+        if self.store is None or status == 'invalid':
+            return
+        # the same firmware key as the lookup of an incremental run (ResultStore.latest) and backfill()
+        self.store.add(run=self.run_id, dut=self.dut.ip, fw=self.fw, fw_checksum=self.fw_checksum, mode=step.get('mode'),
+                       **{level: step.get(level) for level in LEVELS}, status=status, error=error, elapsed=elapsed,
+                       packets=step.get('packets'))
+
+    def run_step(self, step):
+        """ Returns (status, error, elapsed) """
+        start = time.monotonic()
+        error = check_step(self.data, step)
+        if error:
+            return 'invalid', error, 0.0
+        self.previous = step
+
+        if step['mode'] == 'tx':
+            result = self.dut.tx_start(*(step[level] for level in LEVELS), timeout=self.timeout).result()
+            if result.returncode == 0:
+                time.sleep(float(step.get('duration') or 0))
+            stop = self.dut.tx_stop(timeout=self.timeout).result()
+        else:
+            result = self.dut.rx_start(step['band'], step['core'], step['channel'], packets=step.get('packets'),
+                                       timeout=self.timeout).result()
+            stop = self.dut.rx_stop(timeout=self.timeout).result()
+
+        elapsed = time.monotonic() - start
+        for command in (result, stop):
+            if command.returncode is None:
+                return 'failed', 'timeout', elapsed
+            if command.returncode != 0:
+                return 'failed', f"exit status {command.returncode}", elapsed
+        return 'ok', None, elapsed
+
+
+class PoolSweep:
+    """
+    Runs one plan on all DUTs of a DutPool. The steps are shared: every DUT takes the next step when it is
+    free, so the wall time is divided by the number of boards. A DUT that fails its firmware load or
+    MAX_CONSECUTIVE_FAILURES steps in a row leaves the sweep, the other DUTs continue with the rest.
+    Every DUT starts with its own contiguous part of the plan, so an ordered plan (see schedule.py) keeps its
+    order per DUT. A DUT that is done takes steps from the end of the biggest part that is left.
+    """
+
+    def __init__(self, pool, data, reporter, timeout=None, force_fw=False, store=None, run=None, journal=None):
+        self.pool = pool
+        self.data = data
+        self.reporter = reporter
+        self.timeout = timeout
+        self.force_fw = force_fw
+        self.store = store
+        self.journal = journal
+        self.run_id = run or results.run_id()
+        self.stopped = False
+        self.aborted = False
+
+    def run(self, steps, fw=None, checksum=None, estimated=None, indices=None):
+        """ fw, checksum: see SweepRunner.run(). indices: only run these steps (a resumed sweep), default all """
+        steps = list(steps)
+        indices = list(range(len(steps)) if indices is None else indices)
+        size = -(-len(indices) // max(1, len(self.pool)))
+        queues = {ip: deque((index, steps[index]) for index in indices[n * size:(n + 1) * size])
+                  for n, ip in enumerate(self.pool.ips())}
+        lock = threading.Lock()
+        counts = {'ok': 0, 'failed': 0, 'invalid': 0}
+        start = time.monotonic()
+        self.reporter.event('start', steps=len(indices), ips=self.pool.ips(), run=self.run_id)
+
+        def work(control):
+            runner = SweepRunner(control, self.data, self.reporter, timeout=self.timeout, store=self.store, run=self.run_id,
+                                 journal=self.journal)
+            runner.fw, runner.fw_checksum = fw, checksum
+            control.connect()
+            if fw:
+                job = firmware.ensure_fw(control, fw, force=self.force_fw, timeout=self.timeout)
+                result = job.result()
+                self.reporter.event('load_fw', ip=control.ip, fw=fw, returncode=result.returncode,
+                                    elapsed=round(result.elapsed, 3), skipped=job.skipped)
+                if result.returncode != 0:
+                    return 'load_fw failed'
+            failures = 0
+            own = queues[control.ip]
+            while not self.stopped:
+                with lock:
+                    if own:
+                        index, step = own.popleft()
+                    else:
+                        donor = max(queues.values(), key=len)
+                        if not donor:
+                            return 'done'
+                        index, step = donor.pop()
+                changed = schedule.changed(runner.previous, step)
+                status, error, elapsed = runner.run_step(step)
+                runner.record(index, step, status, error, elapsed)
+                with lock:
+                    counts[status] += 1
+                self.reporter.event('step', ip=control.ip, index=index, total=len(steps), step=step, status=status,
+                                    error=error, elapsed=round(elapsed, 3), changed=changed)
+                failures = failures + 1 if status == 'failed' else 0
+                if failures >= MAX_CONSECUTIVE_FAILURES:
+                    self.reporter.event('retired', ip=control.ip, reason=f"{failures} failed steps in a row")
+                    return 'retired'
+            control.tx_stop(timeout=self.timeout).result()
+            return 'stopped'
+
+        futures = self.pool.map(work)
+        try:
+            wait(futures.values())
+        except KeyboardInterrupt:
+            self.stopped = True
+            wait(futures.values())
+
+        duts = {}
+        for ip, future in futures.items():
+            error = future.exception()
+            duts[ip] = f"error: {error}" if error else future.result()
+        skipped = sum(len(queue) for queue in queues.values())
+        aborted = self.aborted = self.stopped or skipped > 0
+        self.reporter.event('done', aborted=aborted, elapsed=round(time.monotonic() - start, 3), skipped=skipped,
+                            estimated=estimated, duts=duts, **counts)
+        return not aborted and counts['failed'] == 0 and counts['invalid'] == 0
+
+
+def record_run(store, run, digest, fw, checksum, steps):
+    """
+    Remember the run with its definition (stored when the sweep started, see main()), the baseline of the next
+    --incremental run. Only done for runs that were not aborted: a step that was skipped must still show up as
+    changed next time
+    """
+    if store:
+        store.record_run(run, digest, fw, checksum, steps)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Headless Tx/Rx sweep runner for the WLAN test tool')
+    parser.add_argument('plan', nargs='?', help='json sweep plan')
+    parser.add_argument('--tx', metavar='FILTER', help="Tx steps for all valid combinations matching e.g. 'band=5GHz bw=80MHz'")
+    parser.add_argument('--rx', metavar='FILTER', help='Rx steps for all valid band/core/channel matching the filter')
+    parser.add_argument('--ip', help='DUT IP, or a comma separated list to share the sweep over several DUTs')
+    parser.add_argument('--fw', choices=['MFG', 'STD'], help='load this firmware before the sweep, unless the DUT already runs it')
+    parser.add_argument('--force-fw', action='store_true', help='load the --fw firmware even if the DUT already runs it')
+    parser.add_argument('--duration', type=float, default=1.0, help='Tx time per step in seconds (default 1)')
+    parser.add_argument('--packets', type=int, default=1000, help='Rx packets per step (default 1000)')
+    parser.add_argument('--worker', metavar='BACKEND', help="send the commands to a persistent dut_worker.py with this backend ('mock' for a fake DUT)")
+    parser.add_argument('--order', choices=['plan', 'cost'], default='plan',
+                        help='plan: run the steps as given, cost: reorder them to minimize DUT reprogramming (schedule.py)')
+    parser.add_argument('--costs', metavar='FILE', help='json {field: seconds} reprogramming cost model for --order cost')
+    parser.add_argument('--timeout', type=float, help='timeout in seconds for every control script call')
+    parser.add_argument('--definition', default='system-definition.json', help='system definition file')
+    parser.add_argument('--results', metavar='FILE', default=results.RESULTS_DB,
+                        help=f'store the results in this database (default {results.RESULTS_DB}), see results.py')
+    parser.add_argument('--no-results', action='store_true', help='do not store the results')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only run the steps that are new, changed, failed or stale since the last run (see campaign.py)')
+    parser.add_argument('--max-age', metavar='AGE', help="with --incremental: re-run passed results older than AGE, e.g. '30d'")
+    parser.add_argument('--jsonl', metavar='FILE', help="write progress as json lines to FILE ('-' for stdout)")
+    parser.add_argument('--dry-run', action='store_true', help='only check and list the steps')
+    parser.add_argument('--resume', nargs='?', const='latest', metavar='RUN',
+                        help='resume an interrupted sweep (run id or journal file, default the last one), see journal.py')
+    parser.add_argument('--log', metavar='FILE', help='also write the full (debug) log to FILE, rotated, see logfile.py')
+    parser.add_argument('--log-jsonl', metavar='FILE', help='also write the full log as json lines with the DUT, combination and step time')
+    parser.add_argument('-v', '--verbose', action='store_true', help='log the control script calls and output')
+    args = parser.parse_args(argv)
+
+    stderr = logging.StreamHandler(sys.stderr)
+    stderr.setLevel(logging.DEBUG if args.verbose else logging.WARNING)
+    logging.basicConfig(format=logfile.FORMAT, handlers=[stderr])
+    if args.log or args.log_jsonl:
+        logfile.start(logger, args.log, args.log_jsonl)
+        logger.setLevel(logging.DEBUG)
+    else:
+        logger.setLevel(logging.DEBUG if args.verbose else logging.WARNING)
+
+    if args.resume:
+        return resume(parser, args)
+    if not (args.plan or args.tx or args.rx):
+        parser.error('give a plan file, --tx or --rx')
+    if args.incremental and args.no_results:
+        parser.error('--incremental needs the results store')
+
+    # the definition as it is when the sweep starts is the baseline of the next incremental run, even if it is
+    # edited while the sweep runs
+    with open(args.definition, 'rb') as f:
+        definition_text = f.read()
+    data = definition.load(args.definition)
+    plan = {'steps': []}
+    try:
+        if args.plan:
+            plan = load_plan(args.plan)
+        if args.tx:
+            plan['steps'] += list(tx_steps(data, args.tx, args.duration))
+        if args.rx:
+            plan['steps'] += list(rx_steps(data, args.rx, args.packets))
+        costs = schedule.load_costs(args.costs) if args.costs else schedule.DEFAULT_COSTS
+        max_age = time.time() - results.parse_time(args.max_age) if args.max_age else None
+    except (ValueError, KeyError, OSError) as e:
+        parser.error(str(e))
+
+    fw = args.fw or plan.get('fw')
+    checksum = firmware.image_checksum(fw) if fw else None
+    run = results.run_id()
+    store = None
+    if not args.no_results and (args.incremental or not args.dry_run):
+        store = results.ResultStore(args.results)
+    reused = None
+    if args.incremental:
+        text = store.last_definition()
+        previous = definition.loads(text) if text else None
+        selected = campaign.Campaign(data, store.latest(fw=fw, fw_checksum=checksum), previous, max_age)
+        plan['steps'], reused = selected.select(plan['steps'])
+
+    ips = parse_ips(args.ip or plan.get('ip') or '')
+    estimated = schedule.estimate(plan['steps'], costs)
+    if args.order == 'cost':
+        plan['steps'] = schedule.order(plan['steps'], costs)
+        ordered = schedule.estimate(plan['steps'], costs)
+        logger.debug(f"reordered the plan: estimated {estimated:.1f} s --> {ordered:.1f} s")
+        estimated = ordered
+    # with several DUTs the work is shared, the estimate is per DUT
+    estimated = round(estimated / max(1, len(ips)), 1)
+
+    reporter = Reporter(args.jsonl)
+    try:
+        reporter.event('plan', steps=len(plan['steps']), order=args.order, estimated=estimated)
+        if reused is not None:
+            reporter.event('incremental', **{reason: reused[reason] for reason in (*campaign.REASONS, 'reused')})
+        if args.dry_run:
+            for index, step in enumerate(plan['steps']):
+                error = check_step(data, step)
+                reporter.event('step', index=index, total=len(plan['steps']), step=step,
+                               status='invalid' if error else 'planned', error=error, elapsed=0.0)
+            return 0
+        digest = store.add_definition(definition_text) if store else None
+        if args.incremental and not plan['steps']:
+            record_run(store, run, digest, fw, checksum, 0)
+            return 0
+        settings = {'run': run, 'steps': plan['steps'], 'ips': ips, 'fw': fw, 'fw_checksum': checksum,
+                    'worker': args.worker, 'timeout': args.timeout, 'definition': args.definition,
+                    'definition_digest': digest, 'results': None if args.no_results else args.results}
+        checkpoint = journal.Journal(journal.journal_path(run), settings)
+        return execute(data, settings, range(len(plan['steps'])), reporter, store, checkpoint, args.force_fw, estimated)
+    finally:
+        if store:
+            store.close()
+        reporter.close()
+
+
+def resume(parser, args):
+    """ Run the steps of a journal that were not done yet, with the settings of the journal """
+    path = args.resume
+    if path == 'latest':
+        path = journal.latest()
+        if path is None:
+            parser.error('there is no unfinished sweep to resume')
+    elif not os.path.exists(path):
+        path = journal.journal_path(path)
+    try:
+        settings, done, finished = journal.read(path)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    if finished and not finished.get('aborted'):
+        print(f"{settings['run']} is complete, nothing to resume")
+        return 0
+    # the DUTs and the worker may be given again, e.g. if a board was replaced
+    settings['ips'] = parse_ips(args.ip) if args.ip else settings['ips']
+    settings['worker'] = args.worker or settings['worker']
+    data = definition.load(settings['definition'])
+    indices = [index for index in range(len(settings['steps'])) if index not in done]
+
+    reporter = Reporter(args.jsonl)
+    store = results.ResultStore(settings['results']) if settings['results'] else None
+    try:
+        if store:
+            backfill(store, settings, done)
+        reporter.event('resume', run=settings['run'], done=len(done), steps=len(indices))
+        return execute(data, settings, indices, reporter, store, journal.Journal(path), args.force_fw)
+    finally:
+        if store:
+            store.close()
+        reporter.close()
+
+
+def backfill(store, settings, done):
+    """ Store the results of journaled steps that were still in the store's buffer when the sweep died """
+    stored = Counter(campaign.step_key(row) for row in store.query(run=settings['run']))
+    for record in done.values():
+        key = campaign.step_key(record['step'])
+        if record['status'] == 'invalid':
+            continue
+        if stored[key]:
+            stored[key] -= 1
+            continue
+        step = record['step']
+        store.add(time=record.get('time'), run=settings['run'], dut=record.get('ip'), fw=settings['fw'],
+                  fw_checksum=settings['fw_checksum'], mode=step.get('mode'), **{level: step.get(level) for level in LEVELS},
+                  status=record['status'], error=record['error'], elapsed=record['elapsed'], packets=step.get('packets'))
+    store.flush()
+
+
+def execute(data, settings, indices, reporter, store, checkpoint, force_fw=False, estimated=None):
+    """ Run the steps with these indices of a new or resumed sweep (settings as in the journal) """
+    run, steps, ips, fw = settings['run'], settings['steps'], settings['ips'], settings['fw']
+    aborted = True
+    try:
+        if len(ips) > 1:
+            pool = DutPool(worker=settings['worker'])
+            try:
+                pool.set_ips(ips)
+                runner = PoolSweep(pool, data, reporter, timeout=settings['timeout'], force_fw=force_fw, store=store,
+                                   run=run, journal=checkpoint)
+                ok = runner.run(steps, fw=fw, checksum=settings['fw_checksum'], estimated=estimated, indices=indices)
+            finally:
+                pool.close()
+        else:
+            if settings['worker']:
+                dut = WorkerControl(ips[0] if ips else None, backend=settings['worker'])
+            else:
+                dut = DutControl(ips[0] if ips else None)
+            runner = SweepRunner(dut, data, reporter, timeout=settings['timeout'], force_fw=force_fw, store=store,
+                                 run=run, journal=checkpoint)
+            try:
+                ok = runner.run(steps, fw=fw, checksum=settings['fw_checksum'], estimated=estimated, indices=indices)
+            finally:
+                if settings['worker']:
+                    dut.close()
+        aborted = runner.aborted
+        if not aborted:
+            record_run(store, run, settings['definition_digest'], fw, settings['fw_checksum'], len(steps))
+        return 0 if ok else 1
+    finally:
+        checkpoint.close(aborted)
+
+if __name__ == '__main__':
+    sys.exit(main())
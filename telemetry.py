@@ -0,0 +1,164 @@
+"""
+Tx telemetry. While a Tx test runs, the output power, EVM and temperature that the DUT reads back are polled
+with the tx_telemetry action: the tx_telemetry.py control script (or tx_telemetry() of a worker backend) prints
+one json object, or a list of them if the DUT buffers samples. A missing value is null:
+
+    {"power": 17.9, "evm": -34.2, "temp": 48.5}
+    [{"t": 12.10, "power": 17.9, "evm": -34.2, "temp": 48.5}, ...]
+
+'t' (seconds, any origin) is the DUT time of the sample, the poll time is used when it is missing.
+The samples go into a fixed-size ring buffer (ring.Ring with the rows time, power, evm and temp), so an
+hours-long burn-in keeps the last RING_SIZE samples (9 hours through a worker, longer with the control script)
+and nothing more.
+
+A chart never draws the ring itself: series() downsamples it to a fixed number of points, with LTTB (largest
+triangle three buckets, keeps the shape of the curve) or min/max bucketing (keeps every spike). The cost of a
+chart update depends on the number of points on the screen, not on how long the test has run.
+"""
+
+import json
+import logging
+import threading
+import time
+
+import numpy as np
+
+from dut import DutError, WorkerControl
+from ring import Ring
+
+logger = logging.getLogger('wltrx-gui')
+
+FIELDS = ('power', 'evm', 'temp')
+UNITS = {'power': 'dBm', 'evm': 'dB', 'temp': '°C'}
+RING_SIZE = 65536 # samples
+POLL_INTERVAL = 0.5 # seconds, through a persistent worker
+SCRIPT_POLL_INTERVAL = 2.0 # seconds, every poll runs tx_telemetry.py
+POINTS = 300 # points per series on the chart
+
+
+def parse_telemetry(output, now):
+    """ tx_telemetry output --> array of samples (rows time, power, evm, temp), None if it has no samples """
+    try:
+        samples = json.loads(output.strip().splitlines()[-1])
+    except (ValueError, IndexError):
+        return None
+    if isinstance(samples, dict):
+        samples = [samples]
+    if not isinstance(samples, list) or not samples or not all(isinstance(sample, dict) for sample in samples):
+        return None
+    return np.array([[sample.get('t', now)] + [np.nan if sample.get(field) is None else sample[field] for field in FIELDS]
+                     for sample in samples], dtype=float).T
+
+
+def lttb(x, y, points):
+    """ Largest triangle three buckets: the points (first and last included) that keep the visual shape of y(x) """
+    n = len(x)
+    if points >= n or points < 3:
+        return x, y
+    # the first and last point are kept, the others are split in points - 2 buckets
+    edges = np.linspace(1, n - 1, points - 1).astype(int)
+    index = np.empty(points, dtype=int)
+    index[0], index[-1] = 0, n - 1
+    # the average of every bucket, the third corner of the triangles of the previous bucket
+    counts = np.diff(edges)
+    avg_x = np.append(np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / counts, x[-1])
+    avg_y = np.append(np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / counts, y[-1])
+    a = 0
+    for i in range(points - 2):
+        start, end = edges[i], edges[i + 1]
+        # twice the area of the triangle (point a, a point in this bucket, average of the next bucket)
+        area = np.abs((x[a] - avg_x[i + 1]) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y[i + 1] - y[a]))
+        a = start + int(area.argmax())
+        index[i + 1] = a
+    return x[index], y[index]
+
+
+def minmax(x, y, points):
+    """ The lowest and highest point of every bucket (points // 2 buckets), in time order """
+    n = len(x)
+    buckets = points // 2
+    if points >= n or buckets < 1:
+        return x, y
+    edges = np.linspace(0, n, buckets + 1).astype(int)
+    index = np.empty(2 * buckets, dtype=int)
+    for i, (start, end) in enumerate(zip(edges[:-1], edges[1:])):
+        low = start + int(y[start:end].argmin())
+        high = start + int(y[start:end].argmax())
+        index[2 * i], index[2 * i + 1] = min(low, high), max(low, high)
+    return x[index], y[index]
+
+
+DOWNSAMPLE = {'lttb': lttb, 'minmax': minmax}
+
+
+class TxMonitor:
+    """ Polls the Tx telemetry of one DUT until stop() """
+
+    def __init__(self, control, interval=None, size=RING_SIZE):
+        self.control = control
+        # like the Rx counters (see rx.py): fast only through a worker, a control script is a process per poll
+        if interval is None:
+            interval = POLL_INTERVAL if isinstance(control, WorkerControl) else SCRIPT_POLL_INTERVAL
+        self.interval = interval
+        self.ring = Ring(size, rows=1 + len(FIELDS))
+        self.stopped = threading.Event()
+        self.done = threading.Event()
+        self.error = None
+        self.thread = None
+        self.wanted = None # (points, method) of the last series() call, computed ahead on the monitor thread
+        self._series = None # ((ring end, points, method), {field: (t, values)})
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='tx-monitor', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def latest(self):
+        """ {field: the last value} (nan if not known), cheap enough for every GUI refresh """
+        return dict(zip(FIELDS, (float(value) for value in self.ring.last(1)[1:, -1]))) if len(self.ring) else \
+            dict.fromkeys(FIELDS, float('nan'))
+
+    def series(self, points=POINTS, method='lttb'):
+        """
+        {field: (t, values)} downsampled to at most points points, the samples without a value are left out.
+        Computed on the monitor thread after every poll: while it runs this returns the last computed series
+        """
+        self.wanted = (points, method)
+        cached = self._series
+        polling = self.thread is not None and not self.done.is_set()
+        if cached is None or cached[0][1:] != self.wanted or (cached[0][0] != self.ring.end and not polling):
+            cached = self._series = ((self.ring.end, points, method), self._downsample(points, method))
+        return cached[1]
+
+    def _downsample(self, points, method):
+        t, *columns = self.ring.last(self.ring.size)
+        series = {}
+        for field, values in zip(FIELDS, columns):
+            known = ~np.isnan(values)
+            series[field] = DOWNSAMPLE[method](t[known], values[known], points)
+        return series
+
+    def _run(self):
+        start = time.monotonic()
+        try:
+            while not self.stopped.is_set():
+                polled = time.monotonic()
+                result = self.control.tx_telemetry(timeout=self.interval * 10 + 1).result()
+                if result.returncode != 0:
+                    raise DutError(f"tx_telemetry failed: {result.output}")
+                samples = parse_telemetry(result.output, polled - start)
+                if samples is not None:
+                    self.ring.extend(samples)
+                    if self.wanted:
+                        points, method = self.wanted
+                        self._series = ((self.ring.end, points, method), self._downsample(points, method))
+                busy = time.monotonic() - polled
+                self.stopped.wait(max(self.interval - busy, busy))
+        except Exception as e:
+            self.error = e
+            logger.warning(f"{self.control.ip or 'DUT'}: no Tx telemetry: {e}")
+        finally:
+            self.done.set()
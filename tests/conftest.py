@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+# the modules live in the repo root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import definition  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def data():
+    """ The shipped system definition, compiled without a cache file """
+    return definition.load(os.path.join(ROOT, 'system-definition.json'), cache_dir=None)
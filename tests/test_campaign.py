@@ -0,0 +1,55 @@
+import definition
+from campaign import Campaign, step_key
+
+NOW = 1_000_000.0
+DAY = 86400
+
+TREE = {'5GHz': {'11a': {'6Mbps': {'20MHz': {'core0': {'US': ['36', '40'], 'ALL': ['36']}}}}}}
+
+
+def step(country, channel):
+    return {'mode': 'tx', 'band': '5GHz', 'standard': '11a', 'rate': '6Mbps', 'bw': '20MHz', 'core': 'core0',
+            'country': country, 'channel': channel}
+
+
+def test_reasons():
+    previous = definition.from_dict(TREE)
+    tree = {'5GHz': {'11a': {'6Mbps': {'20MHz': {'core0': {'US': ['36', '40'], 'ALL': ['36', '40'], 'JP': ['36']}}}}}}
+    latest = {
+        step_key(step('US', '36')): ('ok', NOW - DAY),
+        step_key(step('US', '40')): ('failed', NOW - DAY),
+        step_key(step('ALL', '36')): ('ok', NOW - DAY),
+    }
+    campaign = Campaign(definition.from_dict(tree), latest, previous, max_age=7 * DAY, now=NOW)
+    assert campaign.reason(step('US', '36')) is None
+    assert campaign.reason(step('US', '40')) == 'failed'
+    assert campaign.reason(step('ALL', '36')) == 'changed' # the ALL channel list got 40
+    assert campaign.reason(step('ALL', '40')) == 'new'
+    assert campaign.reason(step('JP', '36')) == 'new'
+
+
+def test_untested_and_stale():
+    data = definition.from_dict(TREE)
+    latest = {step_key(step('US', '36')): ('ok', NOW - 30 * DAY)}
+    campaign = Campaign(data, latest, data, max_age=7 * DAY, now=NOW)
+    assert campaign.reason(step('US', '36')) == 'stale'
+    assert campaign.reason(step('US', '40')) == 'untested'
+    # no max_age: an old pass is reused
+    assert Campaign(data, latest, data, now=NOW).reason(step('US', '36')) is None
+
+
+def test_without_a_previous_definition_only_results_count():
+    data = definition.from_dict(TREE)
+    latest = {step_key(step('US', '36')): ('ok', NOW)}
+    campaign = Campaign(data, latest, None, now=NOW)
+    assert campaign.reason(step('US', '36')) is None
+    assert campaign.reason(step('ALL', '36')) == 'untested'
+
+
+def test_select_counts_the_reasons():
+    data = definition.from_dict(TREE)
+    steps = [step('US', '36'), step('US', '40'), step('ALL', '36')]
+    latest = {step_key(steps[0]): ('ok', NOW), step_key(steps[1]): ('failed', NOW)}
+    selected, reasons = Campaign(data, latest, data, now=NOW).select(steps)
+    assert selected == steps[1:]
+    assert reasons == {'reused': 1, 'failed': 1, 'untested': 1}
@@ -0,0 +1,41 @@
+import pytest
+
+import journal
+
+
+def test_read_back_after_a_cut_off_line(tmp_path):
+    path = str(tmp_path / 'journals' / 'run.jsonl')
+    plan = {'run': 'run', 'steps': [{'mode': 'tx'}, {'mode': 'rx'}]}
+    log = journal.Journal(path, plan)
+    log.step(0, plan['steps'][0], 'ok', elapsed=1.23456, ip='192.168.1.10')
+    log.file.close()
+    # a crash in the middle of the second step line
+    with open(path, 'a') as f:
+        f.write('{"type": "step", "index": 1, "st')
+
+    read_plan, steps, done = journal.read(path)
+    assert read_plan['steps'] == plan['steps']
+    assert list(steps) == [0]
+    assert steps[0]['status'] == 'ok' and steps[0]['elapsed'] == 1.235 and steps[0]['ip'] == '192.168.1.10'
+    assert done is None
+    assert journal.latest(str(tmp_path / 'journals')) == path
+
+
+def test_resume_appends_and_done_is_read(tmp_path):
+    path = str(tmp_path / 'run.jsonl')
+    journal.Journal(path, {'run': 'run', 'steps': [{}]}).close(aborted=True)
+    log = journal.Journal(path)
+    log.step(0, {}, 'failed', error='timeout')
+    log.close(aborted=False)
+    _, steps, done = journal.read(path)
+    assert steps[0]['error'] == 'timeout'
+    assert done == {'type': 'done', 'aborted': False}
+    assert journal.latest(str(tmp_path)) is None
+
+
+def test_no_plan(tmp_path):
+    path = tmp_path / 'run.jsonl'
+    path.write_text('{"type": "pl')
+    with pytest.raises(ValueError):
+        journal.read(str(path))
+    assert journal.latest(str(tmp_path)) is None
@@ -0,0 +1,55 @@
+import pytest
+
+from definition import LEVELS
+from results import ResultStore
+
+COMBINATION = dict(zip(LEVELS, ('5GHz', '11ac', 'MCS9', '80MHz', 'MIMO', 'ALL', '42')))
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultStore(str(tmp_path / 'results.db'), batch_size=2)
+    yield store
+    store.close()
+
+
+def test_latest_keeps_null_firmware_apart(store):
+    key = ('tx', *COMBINATION.values())
+    store.add(time=1.0, mode='tx', status='ok', **COMBINATION)
+    store.add(time=2.0, mode='tx', fw='MFG', fw_checksum='abc', status='failed', **COMBINATION)
+    store.add(time=3.0, mode='tx', fw='MFG', status='ok', **COMBINATION)
+    # None matches the rows without a firmware (checksum), not those of any firmware
+    assert store.latest(mode='tx') == {key: ('ok', 1.0)}
+    assert store.latest(mode='tx', fw='MFG', fw_checksum='abc') == {key: ('failed', 2.0)}
+    assert store.latest(mode='tx', fw='MFG') == {key: ('ok', 3.0)}
+    assert store.latest(mode='rx') == {}
+
+
+def test_latest_is_the_newest_result(store):
+    key = ('tx', *COMBINATION.values())
+    store.add(time=5.0, mode='tx', status='ok', **COMBINATION)
+    store.add(time=4.0, mode='tx', status='failed', **COMBINATION)
+    store.add(time=6.0, mode='tx', status='failed', **dict(COMBINATION, channel='58'))
+    latest = store.latest(mode='tx')
+    assert latest[key] == ('ok', 5.0)
+    assert len(latest) == 2
+
+
+def test_query_and_count(store):
+    store.add(time=1.0, mode='tx', status='ok', **COMBINATION)
+    store.add(time=2.0, mode='tx', status='ok', **dict(COMBINATION, channel='58'))
+    store.add(time=3.0, mode='rx', status='ok', packets=1000, per=0.01, **COMBINATION)
+    assert [row['time'] for row in store.query(channel=['42', '58'], mode='tx')] == [1.0, 2.0]
+    assert store.count(channel=42) == 2
+    assert store.count(since=2.0, until=3.0) == 1
+    with pytest.raises(KeyError):
+        store.add(mode='tx', status='ok', colour='red')
+
+
+def test_definitions_are_stored_once(store):
+    digest = store.add_definition('{"5GHz": {}}')
+    assert store.add_definition(b'{"5GHz": {}}') == digest
+    assert store.db.execute("SELECT COUNT(*) FROM definitions").fetchone()[0] == 1
+    store.record_run('run1', digest, fw='MFG', steps=3)
+    store.record_run('run2', store.add_definition('{"2.4GHz": {}}'))
+    assert store.last_definition(before='run2') == '{"5GHz": {}}'
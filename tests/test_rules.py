@@ -0,0 +1,54 @@
+import json
+import os
+
+import pytest
+
+import definition
+import rules
+from definition import DefinitionError
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_rules_give_the_same_combinations_as_the_full_tree(data):
+    compiled = definition.load(os.path.join(ROOT, 'system-definition.rules.json'), cache_dir=None)
+    # also the order of the options, like rules.py --check
+    assert list(compiled.combinations()) == list(data.combinations())
+
+
+def test_expanded_tree_round_trips(tmp_path):
+    source = os.path.join(ROOT, 'system-definition.rules.json')
+    expanded = tmp_path / 'full.json'
+    assert rules.main([source, '--expand', str(expanded)]) == 0
+    assert rules.main([source, '--check', str(expanded)]) == 0
+    with open(source, 'rb') as f:
+        compiled = rules.loads(f.read())
+    assert list(definition.load(str(expanded), cache_dir=None).combinations()) == list(compiled.combinations())
+
+
+def test_expand():
+    assert rules.expand('MCS0-3 MCS7') == ['MCS0', 'MCS1', 'MCS2', 'MCS3', 'MCS7']
+    assert rules.expand('36-48/4') == ['36', '40', '44', '48']
+    assert rules.expand([1, '6']) == ['1', '6']
+
+
+def test_exclusions():
+    rule = {
+        'rules': 1,
+        'cores': 'core0 MIMO',
+        'channels': {'2.4GHz': {'20MHz': {'ALL': '1-13', 'US': '1-11'}}},
+        'standards': {'2.4GHz': {'11n': {'rates': 'MCS0-7', 'bw': ['20MHz']}}},
+        'exclude': [{'rate': 'MCS7', 'core': 'core0'}, {'country': 'US', 'channel': '1-3'}],
+    }
+    data = rules.loads(json.dumps(rule))
+    assert data.options('2.4GHz', '11n', 'MCS7', '20MHz') == ('MIMO',)
+    assert data.options('2.4GHz', '11n', 'MCS0', '20MHz', 'core0', 'US')[0] == '4'
+    assert data.count() == 8 * 2 * (13 + 8) - (13 + 8)
+
+
+def test_bad_rules():
+    with pytest.raises(DefinitionError):
+        rules.loads('{"rules": 2}')
+    with pytest.raises(DefinitionError):
+        rules.loads(json.dumps({'rules': 1, 'cores': 'core0', 'channels': {},
+                                'standards': {'5GHz': {'11a': {'rates': 'MCS0', 'bw': ['20MHz']}}}}))
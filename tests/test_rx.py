@@ -0,0 +1,33 @@
+import math
+
+from ring import Ring
+from rx import parse_counters, rx_stats
+
+
+def test_parse_counters():
+    samples = parse_counters('noise\n{"good": 90, "bad": 10, "rssi": -50.5}\n', 2.0)
+    assert samples.tolist() == [[2.0], [90.0], [10.0], [-50.5]]
+    samples = parse_counters('[{"t": 1, "good": 1, "bad": 0}, {"t": 2, "good": 5, "bad": 1, "rssi": null}]', 9.0)
+    assert samples[0].tolist() == [1.0, 2.0]
+    assert math.isnan(samples[3][0])
+
+
+def test_samples_without_counters_are_skipped():
+    assert parse_counters('{"rssi": -50}', 0.0) is None
+    assert parse_counters('[{"good": 1}, 3, {"good": 2, "bad": 0}]', 1.0)[1].tolist() == [2.0]
+    # a counter that is not a number: the output can not be used
+    assert parse_counters('[{"good": 2, "bad": 0}, {"good": "x", "bad": 0}]', 1.0) is None
+    assert parse_counters('[{"good": 2, "bad": 0}, {"good": null, "bad": 0}]', 1.0)[1].tolist() == [2.0]
+    assert parse_counters('', 0.0) is None
+    assert parse_counters('not json', 0.0) is None
+
+
+def test_rx_stats():
+    ring = Ring(16, rows=4)
+    assert rx_stats(ring).packets == 0
+    ring.extend(parse_counters('[{"t": 0, "good": 0, "bad": 0, "rssi": -50}, {"t": 2, "good": 90, "bad": 10, "rssi": -52}]', 0.0))
+    stats = rx_stats(ring)
+    assert (stats.packets, stats.good, stats.bad) == (100, 90, 10)
+    assert stats.per == stats.rolling_per == 0.1
+    assert stats.rate == 50.0
+    assert stats.rssi_mean == -51.0
@@ -0,0 +1,80 @@
+import pytest
+
+import definition
+from constraints import ConstraintTable
+from definition import LEVELS
+from selection import AnySelection
+
+
+@pytest.fixture(scope='module')
+def table(data):
+    return ConstraintTable(data)
+
+
+@pytest.fixture(scope='module')
+def combinations(data):
+    return list(data.combinations())
+
+
+def expected(combinations, chosen):
+    """ The options of every level given the other chosen values, from the full list of combinations """
+    out = {}
+    for i, level in enumerate(LEVELS):
+        others = {LEVELS.index(other): value for other, value in chosen.items() if other != level}
+        out[level] = {combination[i] for combination in combinations
+                      if all(combination[j] == value for j, value in others.items())}
+    return out
+
+
+def test_table_counts_every_combination(data, table):
+    assert table.count() == data.count()
+
+
+@pytest.mark.parametrize('chosen', [
+    {},
+    {'channel': '36'},
+    {'band': '5GHz', 'bw': '80MHz'},
+    {'rate': 'MCS9', 'channel': '42'},
+    {'band': '2.4GHz', 'standard': '11n', 'core': 'MIMO', 'country': 'ALL'},
+])
+def test_remaining_matches_the_definition(table, combinations, chosen):
+    remaining = table.remaining(**chosen)
+    for level, options in expected(combinations, chosen).items():
+        assert set(remaining[level]) == options, level
+
+
+def test_any_order_selection_ends_in_a_valid_combination(data, table):
+    selection = AnySelection(table)
+    # channel first, then the other fields from the last one up, always the first option left
+    for level in ('channel', *reversed(LEVELS[:-1])):
+        options = selection.options[LEVELS.index(level)]
+        assert options
+        selection.select(level, options[0])
+    assert selection.is_complete()
+    assert data.is_valid(*selection.values)
+
+
+def test_conflicting_value_clears_the_earlier_choices(table, combinations):
+    selection = AnySelection(table)
+    selection.select('band', '2.4GHz')
+    channel = next(c[-1] for c in combinations if c[0] == '5GHz')
+    diff = selection.select('channel', channel)
+    assert selection['channel'] == channel
+    assert selection['band'] == ''
+    assert diff.values == {'channel': channel, 'band': ''}
+    assert selection.options[0] == ('5GHz',)
+
+
+def test_reset_and_rebase(data, table):
+    selection = AnySelection(table)
+    selection.select('band', '5GHz')
+    diff = selection.reset()
+    assert diff.values == {'band': ''}
+    assert selection.get() == dict.fromkeys(LEVELS, '')
+    selection.select('band', '5GHz')
+    # a definition without 5GHz clears the band
+    tree = data.to_dict()
+    del tree['5GHz']
+    diff = selection.rebase(ConstraintTable(definition.from_dict(tree)))
+    assert selection['band'] == ''
+    assert diff.values == {'band': ''}
@@ -0,0 +1,27 @@
+from definition import LEVELS
+from viewmodel import ComboModel, ComboState
+
+
+def test_only_changed_combos_are_returned():
+    model = ComboModel(LEVELS)
+    options = ('MCS0', 'MCS1')
+    model.want('rate', 'normal', options, '')
+    assert [(name, new) for name, old, new in model.changes()] == [('rate', ComboState('normal', options, ''))]
+    # the same state again, also with an equal but not identical tuple, is not a change
+    model.want('rate', 'normal', tuple(list(options)), '')
+    model.want('band', 'disabled', (), '')
+    assert model.changes() == []
+
+
+def test_want_keeps_the_fields_that_are_not_given():
+    model = ComboModel(LEVELS, {'band': ComboState('normal', ('2.4GHz', '5GHz'), '')})
+    model.want('band', value='5GHz')
+    [(name, old, new)] = model.changes()
+    assert (name, old.value, new) == ('band', '', ComboState('normal', ('2.4GHz', '5GHz'), '5GHz'))
+
+
+def test_shown_value_is_not_applied_again():
+    model = ComboModel(LEVELS, {'bw': ComboState('normal', ('20MHz', '40MHz'), '')})
+    model.shown('bw', '40MHz')
+    model.want('bw', value='40MHz')
+    assert model.changes() == []
@@ -0,0 +1,54 @@
+"""
+View model of a chain of combo boxes, independent of Tk so that it can be tested and benchmarked alone.
+
+Every combo box has a desired state (state, values, value) and the state that was last applied to the widget.
+The menu sets the desired state of all combos after every selection, changes() returns only the fields that
+differ from what the widget shows. The menu applies them in one batch per idle pass of the Tk loop, so
+several quick selections cost one widget update, and a combo that did not change is not touched at all (every
+configure/set of a CustomTkinter widget redraws it).
+
+    model = ComboModel(LEVELS)
+    model.want('rate', 'normal', ('MCS0', 'MCS1'), '')
+    for level, old, new in model.changes():
+        ...  # configure the widget
+"""
+
+from collections import namedtuple
+
+# state: 'normal' or 'disabled'. values: tuple of the options. value: the text in the combo
+ComboState = namedtuple('ComboState', ['state', 'values', 'value'])
+
+
+def same(a, b):
+    # the option tuples are interned in the definition (see definition.py), 'is' catches almost all unchanged ones
+    return a is b or a == b
+
+
+class ComboModel:
+
+    def __init__(self, names, initial=None):
+        """ names: the combos. initial: {name: ComboState} as the widgets were created, disabled and empty if not given """
+        initial = initial or {}
+        self.applied = {name: initial.get(name, ComboState('disabled', (), '')) for name in names}
+        self.desired = dict(self.applied)
+
+    def want(self, name, state=None, values=None, value=None):
+        """ Set the desired state of a combo, None keeps a field as it is """
+        current = self.desired[name]
+        self.desired[name] = ComboState(current.state if state is None else state,
+                                        current.values if values is None else values,
+                                        current.value if value is None else value)
+
+    def shown(self, name, value):
+        """ The user chose value in the combo, the widget already shows it """
+        self.applied[name] = self.applied[name]._replace(value=value)
+
+    def changes(self):
+        """ [(name, applied ComboState, desired ComboState)] of the combos that differ, they count as applied after this """
+        result = []
+        for name, desired in self.desired.items():
+            applied = self.applied[name]
+            if applied.state != desired.state or applied.value != desired.value or not same(applied.values, desired.values):
+                result.append((name, applied, desired))
+                self.applied[name] = desired
+        return result
@@ -0,0 +1,102 @@
+"""
+Hot reload of the system definition: the GUI picks up an edited system-definition.json without a restart.
+
+A DefinitionWatcher polls the mtime and size of the file on its own thread (a stat per POLL_INTERVAL, no extra
+dependency and the same on every OS). A change is loaded once the file has not changed for one more interval,
+so a file that is still being written is not read. The load (compile + cache, see definition.py), the
+structural diff against the current definition (definition.diff) and an optional prepare(definition) step
+all run on the watcher thread. The diff only decides if anything changed and what is logged: the GUI picks up
+the new definition with pending() and rebuilds the options of its menus from it.
+
+A file that does not load (e.g. a json syntax error halfway through an edit) or any other error of a reload
+is logged and the current definition stays in use until the next change.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+
+import definition
+from definition import DefinitionError
+
+logger = logging.getLogger('wltrx-gui')
+
+POLL_INTERVAL = 1.0 # seconds
+
+
+class DefinitionWatcher:
+
+    def __init__(self, path, current, interval=POLL_INTERVAL, prepare=None):
+        """
+        current: the loaded definition of path. prepare(definition): extra work for a new definition that should not
+        run on the Tk thread, its result is returned by pending() (e.g. the Rx constraint table)
+        """
+        self.path = path
+        self.current = current
+        self.interval = interval
+        self.prepare = prepare
+        self.stat = self._stat()
+        self.updates = queue.SimpleQueue()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True, name='definition watcher')
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            stat = self._stat()
+            if stat is None or stat == self.stat:
+                continue
+            # wait until the file stays the same for one interval, an editor may still be writing it
+            if self.stopped.wait(self.interval) or self._stat() != stat:
+                continue
+            self.stat = stat
+            try:
+                self.check()
+            except Exception:
+                # e.g. a rules file that compiles but breaks prepare(): keep the current definition and keep watching
+                logger.exception(f"{self.path} changed but could not be reloaded, keeping the current definition")
+
+    def check(self):
+        """ Load the file and queue it if it differs from the current definition """
+        start = time.perf_counter()
+        try:
+            new = definition.load(self.path)
+        except (OSError, ValueError, DefinitionError) as e:
+            logger.warning(f"{self.path} changed but could not be loaded, keeping the current definition: {e}")
+            return
+        changes = definition.diff(self.current, new)
+        if not changes:
+            logger.debug(f"{self.path} changed on disk, the combinations are the same")
+            return
+        extra = self.prepare(new) if self.prepare else None
+        self.current = new
+        logger.info(f"{self.path} reloaded in {(time.perf_counter() - start) * 1000:.0f} ms, "
+                    f"{len(changes)} option list(s) changed")
+        for change in changes[:10]:
+            logger.debug(f"  {' / '.join(change.path) or 'bands'}: added {list(change.added)}, removed {list(change.removed)}")
+        self.updates.put((new, extra))
+
+    def pending(self):
+        """ (definition, prepared) of the newest reload, None if there is none. Older reloads are skipped """
+        update = None
+        while True:
+            try:
+                update = self.updates.get_nowait()
+            except queue.Empty:
+                return update